@@ -2,6 +2,12 @@
 ASGI config for clothing_erp project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The dashboard and reports views are async and run their independent queries
+concurrently, and the live dashboard streams (server-sent events) hold a
+connection open for minutes. Serve the project through ASGI so neither ties
+up a worker thread (under WSGI a stream is buffered until it ends), e.g.:
+
+    gunicorn clothing_erp.asgi:application -k uvicorn.workers.UvicornWorker
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
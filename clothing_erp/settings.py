@@ -25,6 +25,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'erp.middleware.RequestTimingMiddleware',
+    'erp.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -38,7 +40,9 @@ ROOT_URLCONF = 'clothing_erp.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's backend, timing renders for erp.middleware.RequestTimingMiddleware.
+        'BACKEND': 'erp.templating.DjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -58,8 +62,56 @@ WSGI_APPLICATION = 'clothing_erp.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        # Keep connections open between requests instead of reconnecting
+        # (and re-running the pragmas below) on every one.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'OPTIONS': {
+            # Take the write lock at BEGIN: a deferred transaction that
+            # reads first and then writes fails with "database is locked"
+            # without waiting for busy_timeout when another writer got in.
+            'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+        },
+    },
+    # Read-only snapshot for the reports, dashboard and exports, refreshed
+    # with `manage.py refresh_reporting_snapshot` (SQLite online backup).
+    'reporting': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'file:%s?mode=ro' % os.environ.get('REPORTING_SQLITE_PATH', BASE_DIR / 'db.reporting.sqlite3'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'OPTIONS': {
+            'uri': True,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['erp.routers.ReportingRouter']
+
+# Reporting reads fall back to the primary once the snapshot is older than
+# this many seconds (or missing)
+ERP_REPORTING_MAX_STALENESS = int(os.environ.get('REPORTING_MAX_STALENESS', '900'))
+
+# Threads (and so connections per database) the async views use to run
+# independent queries concurrently (erp.concurrency)
+ERP_QUERY_WORKERS = int(os.environ.get('ERP_QUERY_WORKERS', '4'))
+
+# Journal mode of the SQLite database file. It is stored in the file, so it
+# is set once, as a deploy step, by ``manage.py set_sqlite_journal_mode``
+# rather than by every connection
+ERP_SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+
+# Applied to every new SQLite connection (erp.sqlite); empty disables one
+ERP_SQLITE_PRAGMAS = {
+    'busy_timeout': os.environ.get('SQLITE_BUSY_TIMEOUT', '5000'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'mmap_size': os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+    'cache_size': os.environ.get('SQLITE_CACHE_SIZE', '-65536'),
+    'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
 }
 
 # Password validation
@@ -101,4 +153,66 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Login URLs
 LOGIN_URL = '/admin/login/'
 LOGIN_REDIRECT_URL = '/'
-LOGOUT_REDIRECT_URL = '/admin/login/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/admin/login/'
+# Rendered list tables (erp.fragments). ERP_FRAGMENT_CACHE picks the
+# backend: locmem (per process), file or db (both shared by every worker;
+# run `manage.py createcachetable` once for db)
+FRAGMENT_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'erp-fragments',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('ERP_FRAGMENT_CACHE_DIR', str(BASE_DIR / 'cache' / 'fragments')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'erp_fragment_cache',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragments': {
+        **FRAGMENT_CACHE_BACKENDS[os.environ.get('ERP_FRAGMENT_CACHE', 'locmem')],
+        'TIMEOUT': int(os.environ.get('ERP_FRAGMENT_CACHE_TIMEOUT', '3600')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('ERP_FRAGMENT_CACHE_MAX_ENTRIES', '5000'))},
+    },
+}
+
+# Server-sent event streams (erp.events): how often the shared poller
+# checks for committed changes (updates within one interval are sent as
+# one), and how long one connection lasts before the browser reconnects
+ERP_SSE_POLL_SECONDS = float(os.environ.get('ERP_SSE_POLL_SECONDS', '2'))
+ERP_SSE_MAX_SECONDS = int(os.environ.get('ERP_SSE_MAX_SECONDS', '300'))
+
+# Response compression (erp.compression): bodies smaller than this are sent
+# as is; brotli is used when the optional brotli package is installed
+ERP_COMPRESS_MIN_BYTES = int(os.environ.get('ERP_COMPRESS_MIN_BYTES', '1024'))
+ERP_BROTLI_QUALITY = int(os.environ.get('ERP_BROTLI_QUALITY', '5'))
+
+# Part of the list views' ETags; defaults to the newest template/code mtime
+ERP_RELEASE = os.environ.get('ERP_RELEASE', '')
+
+# Request timing: queries slower than this (ms) go to the slow-query log
+ERP_SLOW_QUERY_MS = float(os.environ.get('ERP_SLOW_QUERY_MS', '100'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'erp.performance': {
+            'handlers': ['console'],
+            'level': os.environ.get('ERP_PERFORMANCE_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
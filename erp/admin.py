@@ -1,5 +1,24 @@
-from django.contrib import admin
+import io
+
+from django import forms
+from django.core.exceptions import PermissionDenied
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from .models import *
+from .pagination import EstimatedCountPaginator
+from . import imports, stock
+
+
+class CatalogImportForm(forms.Form):
+    kind = forms.ChoiceField(choices=[
+        ('products', 'Products (sku, name, category, brand, price, cost_price[, description, is_active])'),
+        ('variants', 'Variants (sku, size, color, stock_quantity[, min_stock_level])'),
+        ('stock', 'Stock take (sku, size, color, stock_quantity)'),
+    ])
+    file = forms.FileField(help_text='UTF-8 CSV with a header row')
+    dry_run = forms.BooleanField(required=False, initial=True, help_text='Only validate; write nothing')
 
 
 @admin.register(Category)
@@ -20,6 +39,7 @@ class BrandAdmin(admin.ModelAdmin):
 class SizeAdmin(admin.ModelAdmin):
     list_display = ['name', 'sort_order']
     list_editable = ['sort_order']
+    search_fields = ['name']
     ordering = ['sort_order']
 
 
@@ -29,31 +49,147 @@ class ColorAdmin(admin.ModelAdmin):
     search_fields = ['name']
 
 
+class ProductVariantForm(forms.ModelForm):
+    """
+    Renders the stock quantity the user is looking at in a hidden input
+    (Django's ``show_hidden_initial``), so an edit can be applied as a delta
+    against what was on screen rather than against the row as it is when
+    the POST arrives.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'stock_quantity' in self.fields:
+            self.fields['stock_quantity'].show_hidden_initial = True
+
+    def shown_stock_quantity(self):
+        bound = self['stock_quantity']
+        if bound.html_initial_name in self.data:
+            return self.fields['stock_quantity'].to_python(self.data[bound.html_initial_name])
+        return self.initial.get('stock_quantity')
+
+
+STOCK_COLUMNS = {'stock_quantity', 'reserved_quantity'}
+
+
+def save_variant(request, obj, form):
+    """
+    Save an edited variant without overwriting stock that changed since the
+    form was rendered: a stock edit becomes an F() adjustment by the
+    difference from the shown quantity, and every other changed field is
+    saved with update_fields that leave the stock columns alone.
+    """
+    other_fields = [name for name in form.changed_data if name not in STOCK_COLUMNS]
+    if other_fields:
+        obj.save(update_fields=other_fields)
+    if 'stock_quantity' in form.changed_data:
+        delta = obj.stock_quantity - form.shown_stock_quantity()
+        try:
+            stock.adjust(obj.pk, delta)
+        except stock.InsufficientStock:
+            messages.error(request, f"{obj}: stock cannot drop below the quantity reserved for open orders.")
+    obj.refresh_from_db(fields=['stock_quantity', 'reserved_quantity'])
+
+
 class ProductVariantInline(admin.TabularInline):
     model = ProductVariant
+    form = ProductVariantForm
     extra = 1
     fields = ['size', 'color', 'stock_quantity', 'min_stock_level']
+    autocomplete_fields = ['size', 'color']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product', 'size', 'color')
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'sku', 'category', 'brand', 'price', 'is_active']
+    list_display = ['name', 'sku', 'category', 'brand', 'price', 'total_stock', 'variant_count', 'is_active']
     list_filter = ['category', 'brand', 'is_active', 'created_at']
     search_fields = ['name', 'sku']
     list_editable = ['price', 'is_active']
     inlines = [ProductVariantInline]
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['total_stock', 'variant_count', 'created_at', 'updated_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/erp/product/change_list.html'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('category', 'brand')
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not ProductVariant:
+            return super().save_formset(request, form, formset, change)
+        formset.save(commit=False)
+        for obj in formset.deleted_objects:
+            obj.delete()
+        changed = {obj.pk for obj, _ in formset.changed_objects}
+        for variant_form in formset.initial_forms:
+            if variant_form.instance.pk in changed:
+                save_variant(request, variant_form.instance, variant_form)
+        for obj in formset.new_objects:
+            obj.save()
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='erp_product_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            raise PermissionDenied
+        result = None
+        form = CatalogImportForm(request.POST or None, request.FILES or None)
+        if form.is_valid():
+            stream = io.TextIOWrapper(form.cleaned_data['file'], encoding='utf-8-sig', newline='')
+            try:
+                result = imports.import_file(stream, form.cleaned_data['kind'], form.cleaned_data['dry_run'])
+            except (imports.StockTakeConflict, UnicodeDecodeError) as error:
+                messages.error(request, f'Nothing imported: {error}')
+            else:
+                if not result.ok:
+                    messages.error(request, f'Nothing imported. {result}')
+                elif result.dry_run:
+                    messages.info(request, f'Dry run: {result}')
+                else:
+                    messages.success(request, str(result))
+                    return redirect('admin:erp_product_changelist')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import catalog',
+            'form': form,
+            'result': result,
+            'errors': result.errors[:200] if result else [],
+        }
+        return TemplateResponse(request, 'admin/erp/product/import.html', context)
 
 
 @admin.register(ProductVariant)
 class ProductVariantAdmin(admin.ModelAdmin):
-    list_display = ['product', 'size', 'color', 'stock_quantity', 'min_stock_level', 'low_stock_status']
-    list_filter = ['product__category', 'size', 'color']
+    list_display = ['product', 'size', 'color', 'stock_quantity', 'reserved_quantity', 'min_stock_level', 'low_stock_status']
+    list_filter = ['low_stock', 'product__category', 'size', 'color']
     search_fields = ['product__name', 'product__sku']
     list_editable = ['stock_quantity', 'min_stock_level']
+    readonly_fields = ['reserved_quantity']
+    form = ProductVariantForm
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product', 'size', 'color')
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', ProductVariantForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        save_variant(request, obj, form)
 
     def low_stock_status(self, obj):
-        if obj.is_low_stock():
+        if obj.low_stock:
             return "⚠️ Low Stock"
         return "✅ In Stock"
 
@@ -63,36 +199,84 @@ class ProductVariantAdmin(admin.ModelAdmin):
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
     list_display = ['full_name', 'email', 'phone', 'city', 'get_order_count', 'get_total_spent_display', 'is_active']
-    list_filter = ['gender', 'city', 'is_active', 'created_at']
+    list_filter = ['rfm_segment', 'gender', 'city', 'is_active', 'created_at']
     search_fields = ['first_name', 'last_name', 'email', 'phone']
     list_editable = ['is_active']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['order_count', 'total_spent', 'first_order_at', 'last_order_at',
+                       'rfm_recency', 'rfm_frequency', 'rfm_monetary', 'rfm_segment', 'created_at', 'updated_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def get_order_count(self, obj):
-        return obj.get_total_orders()
+        return obj.order_count
 
     get_order_count.short_description = "Total Orders"
+    get_order_count.admin_order_field = 'order_count'
 
     def get_total_spent_display(self, obj):
-        return f"${obj.get_total_spent():.2f}"
+        return f"${obj.total_spent:.2f}"
 
     get_total_spent_display.short_description = "Total Spent"
+    get_total_spent_display.admin_order_field = 'total_spent'
 
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
     readonly_fields = ['total_price']
+    autocomplete_fields = ['product_variant']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'product_variant__product', 'product_variant__size', 'product_variant__color'
+        )
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ['order_number', 'customer', 'status', 'payment_status', 'total_amount', 'created_at']
-    list_filter = ['status', 'payment_status', 'created_at']
+    list_display = ['order_number', 'customer', 'status', 'payment_status', 'stock_status', 'total_amount', 'created_at']
+    list_filter = ['status', 'payment_status', 'stock_status', 'created_at']
     search_fields = ['order_number', 'customer__first_name', 'customer__last_name', 'customer__email']
     list_editable = ['status', 'payment_status']
     inlines = [OrderItemInline]
-    readonly_fields = ['order_number', 'created_at', 'updated_at']
+    readonly_fields = ['order_number', 'stock_status', 'created_at', 'updated_at']
+    actions = ['reserve_stock', 'commit_stock', 'release_stock']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('customer')
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        items_changed = any(formset.has_changed() for formset in formsets)
+        try:
+            stock.sync_order(form.instance, items_changed=items_changed)
+        except stock.StockError as exc:
+            messages.warning(request, f"{form.instance}: {exc}")
+
+    def _apply_stock_action(self, request, queryset, operation, verb):
+        done = 0
+        for order in queryset:
+            try:
+                operation(order)
+                done += 1
+            except stock.StockError as exc:
+                messages.error(request, f"{order}: {exc}")
+        if done:
+            messages.success(request, f"{verb} stock for {done} order(s).")
+
+    @admin.action(description="Reserve stock for selected orders")
+    def reserve_stock(self, request, queryset):
+        self._apply_stock_action(request, queryset, stock.reserve, "Reserved")
+
+    @admin.action(description="Commit stock for selected orders")
+    def commit_stock(self, request, queryset):
+        self._apply_stock_action(request, queryset, stock.commit, "Committed")
+
+    @admin.action(description="Release stock for selected orders")
+    def release_stock(self, request, queryset):
+        self._apply_stock_action(request, queryset, stock.release, "Released")
 
 
 @admin.register(Supplier)
@@ -109,4 +293,33 @@ class TransactionAdmin(admin.ModelAdmin):
     list_display = ['transaction_type', 'amount', 'description', 'reference', 'order', 'created_at']
     list_filter = ['transaction_type', 'created_at']
     search_fields = ['description', 'reference', 'order__order_number']
-    readonly_fields = ['created_at']
\ No newline at end of file
+    readonly_fields = ['created_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('order')
+
+
+@admin.register(StockAlert)
+class StockAlertAdmin(admin.ModelAdmin):
+    list_display = ['product_variant', 'event', 'stock_quantity', 'min_stock_level', 'created_at']
+    list_filter = ['event', 'created_at']
+    search_fields = ['product_variant__product__name', 'product_variant__product__sku']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Joining the variants into the page query lets SQLite drive it from a
+    # scan of the products; page the alerts alone by id and fetch the
+    # page's variants afterwards.
+    list_select_related = ()
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            'product_variant__product', 'product_variant__size', 'product_variant__color',
+        )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
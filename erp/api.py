@@ -0,0 +1,280 @@
+from functools import wraps
+
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from .filters import filter_customers, filter_inventory, filter_orders, filter_products, filter_transactions
+from .models import Customer, Order, OrderItem, Product, ProductVariant, Transaction, chunked
+from .pagination import InvalidCursor, KeysetPaginator
+
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class ApiError(ValueError):
+    pass
+
+
+class Include:
+    """
+    A related resource embedded in each row: ``key`` is the lookup on the
+    row holding the join value, ``related_key`` the lookup on the related
+    rows that matches it. ``many`` embeds a list, otherwise one object.
+    """
+
+    def __init__(self, resource, key, related_key, many):
+        self.resource = resource
+        self.key = key
+        self.related_key = related_key
+        self.many = many
+
+
+class Resource:
+    """
+    A read-only collection. ``fields`` maps public names to ORM lookups;
+    rows are fetched with ``values()`` over just the lookups asked for (plus
+    the sort and join keys), so a field that is not requested is neither
+    selected nor joined nor serialised.
+    """
+
+    def __init__(self, model, fields, default_fields, ordering=('id',), filter=None, includes=None):
+        self.model = model
+        self.fields = fields
+        self.default_fields = default_fields
+        self.ordering = list(ordering)
+        self.filter = filter
+        self.includes = includes or {}
+
+    def selected(self, value):
+        if not value:
+            return list(self.default_fields)
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"unknown field(s): {', '.join(unknown)}; available: {', '.join(self.fields)}")
+        return names
+
+    def values(self, queryset, names, extra=()):
+        lookups = dict.fromkeys([self.fields[name] for name in names] + list(extra))
+        return queryset.values(*lookups)
+
+    def output(self, row, names):
+        return {name: row[self.fields[name]] for name in names}
+
+
+RESOURCES = {
+    'products': Resource(
+        Product,
+        fields={
+            'id': 'id',
+            'sku': 'sku',
+            'name': 'name',
+            'description': 'description',
+            'category_id': 'category_id',
+            'category': 'category__name',
+            'brand_id': 'brand_id',
+            'brand': 'brand__name',
+            'price': 'price',
+            'cost_price': 'cost_price',
+            'total_stock': 'total_stock',
+            'variant_count': 'variant_count',
+            'is_active': 'is_active',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        default_fields=['id', 'sku', 'name', 'category', 'brand', 'price', 'total_stock', 'is_active'],
+        filter=filter_products,
+        includes={'variants': Include('variants', 'id', 'product_id', many=True)},
+    ),
+    'variants': Resource(
+        ProductVariant,
+        fields={
+            'id': 'id',
+            'product_id': 'product_id',
+            'sku': 'product__sku',
+            'product': 'product__name',
+            'size': 'size__name',
+            'color': 'color__name',
+            'stock_quantity': 'stock_quantity',
+            'reserved_quantity': 'reserved_quantity',
+            'min_stock_level': 'min_stock_level',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        default_fields=['id', 'product_id', 'sku', 'size', 'color', 'stock_quantity', 'reserved_quantity'],
+        filter=filter_inventory,
+        includes={'product': Include('products', 'product_id', 'id', many=False)},
+    ),
+    'orders': Resource(
+        Order,
+        fields={
+            'id': 'id',
+            'order_number': 'order_number',
+            'customer_id': 'customer_id',
+            'status': 'status',
+            'payment_status': 'payment_status',
+            'subtotal': 'subtotal',
+            'tax_amount': 'tax_amount',
+            'discount_amount': 'discount_amount',
+            'total_amount': 'total_amount',
+            'notes': 'notes',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        default_fields=['id', 'order_number', 'customer_id', 'status', 'payment_status', 'total_amount', 'created_at'],
+        ordering=('-created_at', '-id'),
+        filter=filter_orders,
+        includes={
+            'items': Include('order_items', 'id', 'order_id', many=True),
+            'customer': Include('customers', 'customer_id', 'id', many=False),
+        },
+    ),
+    'order_items': Resource(
+        OrderItem,
+        fields={
+            'id': 'id',
+            'order_id': 'order_id',
+            'variant_id': 'product_variant_id',
+            'sku': 'product_variant__product__sku',
+            'product': 'product_variant__product__name',
+            'size': 'product_variant__size__name',
+            'color': 'product_variant__color__name',
+            'quantity': 'quantity',
+            'unit_price': 'unit_price',
+            'total_price': 'total_price',
+        },
+        default_fields=['id', 'variant_id', 'sku', 'product', 'size', 'color', 'quantity', 'unit_price', 'total_price'],
+    ),
+    'customers': Resource(
+        Customer,
+        fields={
+            'id': 'id',
+            'first_name': 'first_name',
+            'last_name': 'last_name',
+            'email': 'email',
+            'phone': 'phone',
+            'gender': 'gender',
+            'date_of_birth': 'date_of_birth',
+            'address': 'address',
+            'city': 'city',
+            'postal_code': 'postal_code',
+            'is_active': 'is_active',
+            'order_count': 'order_count',
+            'total_spent': 'total_spent',
+            'first_order_at': 'first_order_at',
+            'last_order_at': 'last_order_at',
+            'rfm_recency': 'rfm_recency',
+            'rfm_frequency': 'rfm_frequency',
+            'rfm_monetary': 'rfm_monetary',
+            'rfm_segment': 'rfm_segment',
+            'created_at': 'created_at',
+            'updated_at': 'updated_at',
+        },
+        default_fields=['id', 'first_name', 'last_name', 'email', 'phone', 'city', 'is_active'],
+        filter=filter_customers,
+    ),
+    'transactions': Resource(
+        Transaction,
+        fields={
+            'id': 'id',
+            'transaction_type': 'transaction_type',
+            'amount': 'amount',
+            'description': 'description',
+            'reference': 'reference',
+            'order_id': 'order_id',
+            'order_number': 'order__order_number',
+            'created_at': 'created_at',
+        },
+        default_fields=['id', 'transaction_type', 'amount', 'description', 'reference', 'order_id', 'created_at'],
+        ordering=('-created_at', '-id'),
+        filter=filter_transactions,
+        includes={'order': Include('orders', 'order_id', 'id', many=False)},
+    ),
+}
+
+
+def page_size(value):
+    try:
+        return min(max(int(value or PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        raise ApiError(f'limit {value!r} is not a number')
+
+
+def requested_includes(resource, value):
+    names = [name.strip() for name in (value or '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in resource.includes]
+    if unknown:
+        raise ApiError(f"unknown include(s): {', '.join(unknown)}; available: {', '.join(resource.includes) or 'none'}")
+    return names
+
+
+def embed(rows, include, names):
+    """Fetch the related rows of a whole page in bulk and attach them to each result."""
+    related = RESOURCES[include.resource]
+    keys = {row[include.key] for row in rows if row[include.key] is not None}
+    grouped = {}
+    for batch in chunked(keys):
+        queryset = related.model._default_manager.filter(**{f'{include.related_key}__in': batch})
+        queryset = related.values(queryset.order_by(*related.ordering), names, [include.related_key])
+        for row in queryset:
+            item = related.output(row, names)
+            if include.many:
+                grouped.setdefault(row[include.related_key], []).append(item)
+            else:
+                grouped[row[include.related_key]] = item
+    return grouped
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'authentication required'}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+@require_GET
+@api_login_required
+def resource_list(request, resource):
+    """
+    ``GET /api/<resource>/`` with the list page's filters plus:
+
+    - ``fields=a,b`` (and ``fields[<include>]=...``): sparse fieldsets;
+    - ``include=a,b``: embed related objects, fetched in one bulk query each;
+    - ``limit`` and ``cursor``: keyset pagination (``next`` / ``previous``).
+    """
+    resource = RESOURCES[resource]
+    try:
+        names = resource.selected(request.GET.get('fields'))
+        includes = requested_includes(resource, request.GET.get('include'))
+        include_fields = {
+            name: RESOURCES[resource.includes[name].resource].selected(request.GET.get(f'fields[{name}]'))
+            for name in includes
+        }
+        queryset = resource.model._default_manager.all()
+        if resource.filter:
+            queryset = resource.filter(queryset, request.GET)
+        join_keys = [resource.includes[name].key for name in includes]
+        queryset = resource.values(queryset, names, [field.lstrip('-') for field in resource.ordering] + join_keys)
+        paginator = KeysetPaginator(queryset, resource.ordering, per_page=page_size(request.GET.get('limit')))
+        page = paginator.page(request.GET.get('cursor'))
+        rows = page.object_list
+    except InvalidCursor:
+        return JsonResponse({'error': 'invalid cursor'}, status=400)
+    except ApiError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    results = [resource.output(row, names) for row in rows]
+    for name in includes:
+        include = resource.includes[name]
+        grouped = embed(rows, include, include_fields[name])
+        for row, result in zip(rows, results):
+            result[name] = grouped.get(row[include.key], [] if include.many else None)
+
+    return JsonResponse({
+        'results': results,
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
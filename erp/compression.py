@@ -0,0 +1,97 @@
+import re
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+# Compressors buffer, which would hold server-sent events back.
+NEVER_COMPRESS = ('text/event-stream',)
+CODING_RE = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$')
+
+
+def accepted_codings(header):
+    codings = set()
+    for part in header.split(','):
+        match = CODING_RE.match(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2) or 1)
+        except ValueError:
+            continue
+        if quality > 0:
+            codings.add(match.group(1).lower())
+    return codings
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress text responses: brotli when the client accepts it and the
+    optional ``brotli`` package is installed, gzip otherwise (Django's
+    GZipMiddleware, with its BREACH padding). Bodies below
+    ERP_COMPRESS_MIN_BYTES are left alone; streaming responses (CSV exports)
+    are compressed as they stream, except event streams.
+    """
+
+    def process_response(self, request, response):
+        if not self.should_compress(response):
+            return response
+        codings = accepted_codings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in codings:
+            return self.compress_brotli(response)
+        if 'gzip' in codings:
+            return super().process_response(request, response)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def should_compress(self, response):
+        if response.has_header('Content-Encoding'):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type in NEVER_COMPRESS or not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        min_bytes = getattr(settings, 'ERP_COMPRESS_MIN_BYTES', 1024)
+        return response.streaming or len(response.content) >= min_bytes
+
+    def compress_brotli(self, response):
+        patch_vary_headers(response, ('Accept-Encoding',))
+        quality = getattr(settings, 'ERP_BROTLI_QUALITY', 5)
+        if response.streaming:
+            original = response.streaming_content
+            if response.is_async:
+                async def compressed():
+                    compressor = brotli.Compressor(quality=quality)
+                    async for chunk in original:
+                        data = compressor.process(chunk)
+                        if data:
+                            yield data
+                    yield compressor.finish()
+            else:
+                def compressed():
+                    compressor = brotli.Compressor(quality=quality)
+                    for chunk in original:
+                        data = compressor.process(chunk)
+                        if data:
+                            yield data
+                    yield compressor.finish()
+            response.streaming_content = compressed()
+            del response.headers['Content-Length']
+        else:
+            content = brotli.compress(response.content, quality=quality)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
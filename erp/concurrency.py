@@ -0,0 +1,57 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import reporting
+
+
+# Django's async ORM hands every query to the one thread-sensitive thread,
+# so independent queries of an async view still run one after another.
+# This pool gives each worker its own database connection instead, which
+# lets SQLite (and any other backend) serve them at the same time. The
+# pool is shared by the whole process, so it also bounds how many extra
+# connections the process opens: ERP_QUERY_WORKERS per database.
+_executor = None
+_lock = threading.Lock()
+
+
+def executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ERP_QUERY_WORKERS', 4), thread_name_prefix='erp-query',
+            )
+        return _executor
+
+
+def _call(func, args):
+    # Workers live across requests, so they get the same connection
+    # housekeeping (CONN_MAX_AGE, health checks) as a request thread.
+    close_old_connections()
+    reporting.reopen_if_replaced()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run(func, *args):
+    """
+    Run ``func(*args)`` on the query pool. The caller's context variables
+    (the reporting alias, the request's query timer) are copied over.
+    Return materialised results: a lazy queryset would be evaluated later,
+    on the caller's thread.
+    """
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor(), context.run, _call, func, args)
+
+
+async def gather(*calls):
+    """Run each ``(func, *args)`` of ``calls`` concurrently on the query pool; results in order."""
+    return await asyncio.gather(*[run(*call) for call in calls])
@@ -0,0 +1,57 @@
+import hashlib
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .versions import model_key, version_state
+
+
+def release():
+    """
+    Part of every ETag, so a deploy that changes the templates or code does
+    not keep serving 304s for the old markup: ERP_RELEASE when set,
+    otherwise the newest template / erp module modification time, which is
+    the same in every worker process.
+    """
+    if getattr(settings, 'ERP_RELEASE', ''):
+        return settings.ERP_RELEASE
+    roots = [Path(settings.BASE_DIR) / 'templates', Path(__file__).parent]
+    mtimes = [path.stat().st_mtime for root in roots for path in root.rglob('*') if path.suffix in ('.html', '.py')]
+    return str(max(mtimes, default=0))
+
+
+RELEASE = release()
+
+
+def list_conditional(*models):
+    """
+    Conditional GET for a list view over ``models``. The validators come
+    from the cache versions of those models (one query; the same versions
+    the table fragments are keyed on), plus the query string, the user and
+    the release, so an unchanged page is answered with 304 before the view
+    runs. Responses are private and revalidated on every use.
+    """
+    names = [model_key(model) for model in models]
+
+    def state(request):
+        if not hasattr(request, '_erp_version_state'):
+            request._erp_version_state = version_state(*names)
+        return request._erp_version_state
+
+    def etag(request, *args, **kwargs):
+        token, _ = state(request)
+        parts = [RELEASE, request.path, sorted(request.GET.lists()), request.user.pk, token]
+        return hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return state(request)[1]
+
+    def decorator(view):
+        conditional_view = cache_control(private=True, no_cache=True)(
+            condition(etag_func=etag, last_modified_func=last_modified)(view)
+        )
+        return wraps(view)(conditional_view)
+    return decorator
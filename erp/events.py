@@ -0,0 +1,222 @@
+import asyncio
+import contextvars
+import json
+import logging
+import time
+import weakref
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from . import concurrency
+from .metrics import SNAPSHOT_MODELS, aget_dashboard_metrics, month_start
+from .models import StockAlert
+from .versions import version_token
+
+
+# Server-sent events. The streams are async generators: served through
+# ASGI each open connection is a coroutine, not a worker thread.
+RETRY_MS = 5000
+HEARTBEAT_SECONDS = 15
+ALERT_BUFFER = 500
+
+logger = logging.getLogger(__name__)
+
+
+def format_event(data, event=None, id=None):
+    lines = []
+    if id is not None:
+        lines.append(f'id: {id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.extend(f'data: {line}' for line in json.dumps(data, cls=DjangoJSONEncoder).splitlines())
+    return '\n'.join(lines) + '\n\n'
+
+
+def event_stream(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def last_event_id(request):
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def latest_alert_id():
+    return StockAlert.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def alerts_after(last_id, limit=100):
+    """Alerts newer than ``last_id``, oldest first, with what the dashboard shows."""
+    return list(
+        StockAlert.objects.filter(id__gt=last_id).order_by('id')
+        .values('id', 'event', 'stock_quantity', 'min_stock_level', 'created_at', 'product_variant_id',
+                'product_variant__product__name', 'product_variant__size__name', 'product_variant__color__name')[:limit]
+    )
+
+
+def alert_payload(alert):
+    return {
+        'variant_id': alert['product_variant_id'],
+        'product': alert['product_variant__product__name'],
+        'variant': f"{alert['product_variant__size__name']} - {alert['product_variant__color__name']}",
+        'stock_quantity': alert['stock_quantity'],
+        'min_stock_level': alert['min_stock_level'],
+        'created_at': alert['created_at'],
+    }
+
+
+def metrics_state():
+    return month_start(), version_token(*SNAPSHOT_MODELS)
+
+
+def metrics_delta(sent, metrics):
+    """The counters of ``metrics`` that differ from what a client was last sent."""
+    return {name: value for name, value in metrics.items() if sent.get(name) != value}
+
+
+class Broadcaster:
+    """
+    The one poller behind every open dashboard stream of an event loop.
+
+    Each tick it reads the metric versions and any new stock alerts (two
+    indexed queries), and only when the versions moved rebuilds the
+    counters, once, through the shared snapshot cache. Streams wait on the
+    result instead of querying, so a hundred open dashboards cost the same
+    as one. Commits landing within one tick coalesce into one update, and a
+    stream that falls behind skips straight to the newest counters.
+    """
+
+    def __init__(self, poll):
+        self.poll = poll
+        self.state = None
+        self.metrics = None
+        self.alert_id = None
+        self.alerts = []
+        # Streams resuming from an alert older than the buffer catch up
+        # with their own query.
+        self.alert_floor = None
+        self.seq = 0
+        self.clients = 0
+        self.changed = asyncio.Condition()
+        self.task = None
+
+    async def refresh(self):
+        if self.alert_id is None:
+            self.alert_id = self.alert_floor = await concurrency.run(latest_alert_id)
+        state, alerts = await concurrency.gather((metrics_state,), (alerts_after, self.alert_id))
+        metrics = self.metrics
+        if state != self.state:
+            metrics = await aget_dashboard_metrics(state[1])
+            self.state = state
+        if not alerts and metrics == self.metrics:
+            return
+        async with self.changed:
+            if alerts:
+                self.alert_id = alerts[-1]['id']
+                self.alerts.extend(alerts)
+                if len(self.alerts) > ALERT_BUFFER:
+                    dropped = self.alerts[:-ALERT_BUFFER]
+                    self.alerts = self.alerts[-ALERT_BUFFER:]
+                    self.alert_floor = dropped[-1]['id']
+            self.metrics = metrics
+            self.seq += 1
+            self.changed.notify_all()
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception('Dashboard event refresh failed')
+            await asyncio.sleep(self.poll)
+
+    def subscribe(self):
+        self.clients += 1
+        if self.task is None:
+            # A fresh context: the poller outlives the request that started
+            # it and must not inherit its reporting alias or query timer.
+            self.task = asyncio.get_running_loop().create_task(self.run(), context=contextvars.Context())
+
+    def unsubscribe(self):
+        self.clients -= 1
+        if not self.clients and self.task is not None:
+            self.task.cancel()
+            self.task = None
+            self.state = self.metrics = self.alert_id = self.alert_floor = None
+            self.alerts = []
+
+    async def wait(self, seq, timeout):
+        """Wait until there is something newer than ``seq``; False on timeout."""
+        async with self.changed:
+            try:
+                await asyncio.wait_for(self.changed.wait_for(lambda: self.seq > seq), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def alerts_since(self, last_id):
+        if last_id < self.alert_floor:
+            return await concurrency.run(alerts_after, last_id, ALERT_BUFFER)
+        return [alert for alert in self.alerts if alert['id'] > last_id]
+
+
+# Asyncio primitives belong to one event loop: under ASGI there is one per
+# process, but keep a broadcaster per loop so nothing is shared across them.
+_broadcasters = weakref.WeakKeyDictionary()
+
+
+def broadcaster():
+    loop = asyncio.get_running_loop()
+    if loop not in _broadcasters:
+        _broadcasters[loop] = Broadcaster(getattr(settings, 'ERP_SSE_POLL_SECONDS', 2))
+    return _broadcasters[loop]
+
+
+async def dashboard_events(last_id=None, metrics=True):
+    """
+    Yield the dashboard's live updates as SSE: a ``metrics`` event with the
+    counters that changed since this client's last one (all of them on
+    connect), and an ``enter`` / ``leave`` event per low-stock alert. Only
+    alerts carry an id, so a reconnect (Last-Event-ID) resumes the alerts
+    where it left off and gets fresh counters. The stream ends after
+    ERP_SSE_MAX_SECONDS.
+    """
+    hub = broadcaster()
+    deadline = time.monotonic() + getattr(settings, 'ERP_SSE_MAX_SECONDS', 300)
+    if last_id is None:
+        last_id = await concurrency.run(latest_alert_id)
+    yield f'retry: {RETRY_MS}\n\n'
+    hub.subscribe()
+    try:
+        seq = 0
+        sent = {}
+        while time.monotonic() < deadline:
+            timeout = min(HEARTBEAT_SECONDS, max(deadline - time.monotonic(), 0))
+            if not await hub.wait(seq, timeout):
+                yield ': keep-alive\n\n'
+                continue
+            seq = hub.seq
+            for alert in await hub.alerts_since(last_id):
+                last_id = alert['id']
+                yield format_event(alert_payload(alert), event=alert['event'], id=alert['id'])
+            if metrics:
+                delta = metrics_delta(sent, hub.metrics)
+                if delta:
+                    sent = hub.metrics
+                    yield format_event(delta, event='metrics')
+    finally:
+        hub.unsubscribe()
+
+
+def stock_alert_events(last_id=None):
+    """Just the low-stock enter/leave alerts of dashboard_events."""
+    return dashboard_events(last_id, metrics=False)
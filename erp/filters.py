@@ -0,0 +1,122 @@
+from django.db.models import Q
+
+from . import search as search_index
+
+
+# Each function applies a list view's GET filters to a queryset, so the
+# HTML views and the CSV exports select exactly the same rows.
+
+
+def filter_products(products, params):
+    search = params.get('search')
+    if search:
+        products = search_index.filter_queryset(products, 'product', search, (
+            Q(name__icontains=search) |
+            Q(sku__icontains=search) |
+            Q(category__name__icontains=search) |
+            Q(brand__name__icontains=search)
+        ))
+
+    category_id = params.get('category')
+    if category_id:
+        products = products.filter(category_id=category_id)
+
+    status = params.get('status')
+    if status == 'active':
+        products = products.filter(is_active=True)
+    elif status == 'inactive':
+        products = products.filter(is_active=False)
+
+    stock = params.get('stock')
+    if stock == 'in':
+        products = products.filter(total_stock__gt=0)
+    elif stock == 'out':
+        products = products.filter(total_stock__lte=0)
+    return products
+
+
+def filter_customers(customers, params):
+    search = params.get('search')
+    if search:
+        customers = search_index.filter_queryset(customers, 'customer', search, (
+            Q(first_name__icontains=search) |
+            Q(last_name__icontains=search) |
+            Q(email__icontains=search) |
+            Q(phone__icontains=search) |
+            Q(city__icontains=search)
+        ), substring=Q(phone__icontains=search))
+
+    status = params.get('status')
+    if status == 'active':
+        customers = customers.filter(is_active=True)
+    elif status == 'inactive':
+        customers = customers.filter(is_active=False)
+
+    segment = params.get('segment')
+    if segment:
+        customers = customers.filter(rfm_segment=segment)
+    return customers
+
+
+def filter_orders(orders, params):
+    status = params.get('status')
+    if status:
+        orders = orders.filter(status=status)
+
+    search = params.get('search')
+    if search:
+        orders = search_index.filter_queryset(orders, 'order', search, (
+            Q(order_number__icontains=search) |
+            Q(customer__first_name__icontains=search) |
+            Q(customer__last_name__icontains=search) |
+            Q(customer__email__icontains=search)
+        ), substring=Q(order_number__icontains=search))
+    return orders
+
+
+def filter_inventory(variants, params):
+    if params.get('low_stock'):
+        variants = variants.filter(low_stock=True)
+
+    search = params.get('search')
+    if search:
+        variants = variants.filter(
+            Q(product__name__icontains=search) |
+            Q(product__sku__icontains=search) |
+            Q(size__name__icontains=search) |
+            Q(color__name__icontains=search)
+        )
+    return variants
+
+
+def filter_transactions(transactions, params):
+    transaction_type = params.get('type')
+    if transaction_type:
+        transactions = transactions.filter(transaction_type=transaction_type)
+
+    search = params.get('search')
+    if search:
+        transactions = search_index.filter_queryset(transactions, 'transaction', search, (
+            Q(description__icontains=search) |
+            Q(reference__icontains=search) |
+            Q(order__order_number__icontains=search)
+        ), substring=Q(order__order_number__icontains=search))
+    return transactions
+
+
+def filter_suppliers(suppliers, params):
+    search = params.get('search')
+    if search:
+        suppliers = suppliers.filter(
+            Q(name__icontains=search) |
+            Q(contact_person__icontains=search) |
+            Q(email__icontains=search) |
+            Q(city__icontains=search)
+        )
+
+    status = params.get('status')
+    if status == 'active':
+        suppliers = suppliers.filter(is_active=True)
+    elif status == 'inactive':
+        suppliers = suppliers.filter(is_active=False)
+    return suppliers
@@ -0,0 +1,39 @@
+import contextvars
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+
+from .versions import model_key, version_token
+
+
+ALIAS = 'fragments'
+
+# Counter of the current request's hits and misses, set by the timing middleware.
+request_counts = contextvars.ContextVar('erp_fragment_counts', default=None)
+
+
+def cache():
+    """The ``fragments`` cache when configured, the default cache otherwise."""
+    return caches[ALIAS if ALIAS in settings.CACHES else 'default']
+
+
+def table_version(*models):
+    """
+    Cheap version of everything a table shows: one query for the cache
+    versions of ``models``, which save/delete signals and bulk writes bump,
+    so deletions and related-row changes count as well as edits.
+    """
+    return version_token(*[model_key(model) for model in models])
+
+
+def fragment_key(name, vary_on):
+    return make_template_fragment_key(name, vary_on)
+
+
+def record(hit):
+    """Count a fragment cache hit or miss for the current request's timing log line."""
+    counts = request_counts.get()
+    if counts is not None:
+        counts['hit' if hit else 'miss'] += 1
+
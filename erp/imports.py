@@ -0,0 +1,288 @@
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import search, versions
+from .models import (
+    Brand, Category, Color, Product, ProductVariant, Size, bulk_changed, chunked, refresh_low_stock,
+    refresh_product_stock,
+)
+
+
+BATCH_SIZE = 1000
+
+# Required columns of each file kind; other columns are ignored.
+COLUMNS = {
+    'products': ['sku', 'name', 'category', 'brand', 'price', 'cost_price'],
+    'variants': ['sku', 'size', 'color', 'stock_quantity'],
+    'stock': ['sku', 'size', 'color', 'stock_quantity'],
+}
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'no', 'n'}
+
+
+class RowError(ValueError):
+    pass
+
+
+class StockTakeConflict(Exception):
+    pass
+
+
+class ImportResult:
+    def __init__(self, kind, dry_run):
+        self.kind = kind
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []  # [(line, message)]
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __str__(self):
+        verb = 'would be' if self.dry_run or self.errors else 'were'
+        return (f'{self.rows} {self.kind} rows: {self.created} created, {self.updated} updated, '
+                f'{self.unchanged} unchanged {verb} applied; {len(self.errors)} errors')
+
+
+def name_map(model):
+    return {name.casefold(): pk for pk, name in model.objects.values_list('pk', 'name')}
+
+
+def lookup(mapping, value, label):
+    try:
+        return mapping[value.strip().casefold()]
+    except KeyError:
+        raise RowError(f'unknown {label} {value!r}')
+
+
+def parse_decimal(value, label):
+    try:
+        number = Decimal(value.strip())
+    except InvalidOperation:
+        raise RowError(f'{label} {value!r} is not a number')
+    if number < 0:
+        raise RowError(f'{label} cannot be negative')
+    return number.quantize(Decimal('0.01'))
+
+
+def parse_int(value, label):
+    try:
+        number = int(value.strip())
+    except ValueError:
+        raise RowError(f'{label} {value!r} is not a whole number')
+    if number < 0:
+        raise RowError(f'{label} cannot be negative')
+    return number
+
+
+def parse_bool(value, default=True):
+    value = (value or '').strip().casefold()
+    if not value:
+        return default
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise RowError(f'{value!r} is not yes/no')
+
+
+def read_rows(stream, kind, result):
+    """Yield (line number, row dict) from a CSV stream, checking the header once."""
+    reader = csv.DictReader(stream)
+    missing = [column for column in COLUMNS[kind] if column not in (reader.fieldnames or [])]
+    if missing:
+        result.errors.append((1, f"missing column(s): {', '.join(missing)}"))
+        return
+    for row in reader:
+        result.rows += 1
+        yield reader.line_num, {key: (value or '') for key, value in row.items() if key}
+
+
+def import_file(stream, kind, dry_run=False, batch_size=BATCH_SIZE):
+    """
+    Validate every row of ``stream`` first and only write when the whole
+    file is valid (and ``dry_run`` is off), in one transaction, in batches.
+    """
+    result = ImportResult(kind, dry_run)
+    importer = IMPORTERS[kind]
+    writes = importer(read_rows(stream, kind, result), result)
+    if result.errors or dry_run:
+        return result
+    with transaction.atomic():
+        writes(batch_size)
+    return result
+
+
+def validate_products(rows, result):
+    categories = name_map(Category)
+    brands = name_map(Brand)
+    existing = dict(Product.objects.values_list('sku', 'pk'))
+    products, seen = [], set()
+    now = timezone.now()
+    for line, row in rows:
+        try:
+            sku = row['sku'].strip()
+            if not sku:
+                raise RowError('sku is required')
+            if sku in seen:
+                raise RowError(f'duplicate sku {sku!r} in this file')
+            seen.add(sku)
+            if not row['name'].strip():
+                raise RowError('name is required')
+            products.append(Product(
+                sku=sku,
+                name=row['name'].strip(),
+                description=row.get('description', '').strip(),
+                category_id=lookup(categories, row['category'], 'category'),
+                brand_id=lookup(brands, row['brand'], 'brand'),
+                price=parse_decimal(row['price'], 'price'),
+                cost_price=parse_decimal(row['cost_price'], 'cost_price'),
+                is_active=parse_bool(row.get('is_active')),
+                created_at=now,
+                updated_at=now,
+            ))
+        except RowError as error:
+            result.errors.append((line, str(error)))
+    result.updated = sum(1 for product in products if product.sku in existing)
+    result.created = len(products) - result.updated
+
+    def write(batch_size):
+        for batch in chunked(products, batch_size):
+            Product.objects.bulk_create(
+                batch, update_conflicts=True, unique_fields=['sku'],
+                update_fields=['name', 'description', 'category', 'brand', 'price', 'cost_price', 'is_active',
+                               'updated_at'],
+            )
+        # bulk_create sends no post_save: refresh the search documents and
+        # cache versions the signals would have.
+        for batch in chunked([product.sku for product in products], batch_size):
+            search.reindex_queryset('product', Product.objects.filter(sku__in=batch))
+        versions.bump(versions.model_key(Product))
+    return write
+
+
+def resolve_variants(rows, result):
+    """Resolve (sku, size, color) of every row; returns [(line, row, key)] and the existing variants by key."""
+    sizes = name_map(Size)
+    colors = name_map(Color)
+    skus = {row['sku'].strip() for _, row in rows}
+    products = {}
+    for batch in chunked(skus):
+        products.update(Product.objects.filter(sku__in=batch).values_list('sku', 'pk'))
+    existing = {}
+    for batch in chunked(products.values()):
+        # Named rows rather than model instances: a stock take may touch
+        # every variant in the catalog.
+        for variant in (ProductVariant.objects.filter(product_id__in=batch)
+                        .values_list('pk', 'product_id', 'size_id', 'color_id', 'stock_quantity', 'reserved_quantity',
+                                     'min_stock_level', named=True)):
+            existing[variant.product_id, variant.size_id, variant.color_id] = variant
+
+    resolved, seen = [], set()
+    for line, row in rows:
+        try:
+            sku = row['sku'].strip()
+            if sku not in products:
+                raise RowError(f'unknown sku {sku!r}')
+            key = (products[sku], lookup(sizes, row['size'], 'size'), lookup(colors, row['color'], 'color'))
+            if key in seen:
+                raise RowError(f"duplicate variant {sku} / {row['size']} / {row['color']} in this file")
+            seen.add(key)
+            resolved.append((line, row, key))
+        except RowError as error:
+            result.errors.append((line, str(error)))
+    return resolved, existing
+
+
+def validate_variants(rows, result):
+    resolved, existing = resolve_variants(list(rows), result)
+    variants = []
+    now = timezone.now()
+    for line, row, (product_id, size_id, color_id) in resolved:
+        try:
+            current = existing.get((product_id, size_id, color_id))
+            stock = parse_int(row['stock_quantity'], 'stock_quantity')
+            min_level = row.get('min_stock_level', '').strip()
+            min_level = parse_int(min_level, 'min_stock_level') if min_level else (
+                current.min_stock_level if current else 5)
+            if current and stock < current.reserved_quantity:
+                raise RowError(f'stock {stock} is below the {current.reserved_quantity} already reserved')
+            if current and (current.stock_quantity, current.min_stock_level) == (stock, min_level):
+                result.unchanged += 1
+                continue
+            if current:
+                result.updated += 1
+            else:
+                result.created += 1
+            variants.append(ProductVariant(
+                product_id=product_id, size_id=size_id, color_id=color_id,
+                stock_quantity=stock, min_stock_level=min_level, created_at=now, updated_at=now,
+            ))
+        except RowError as error:
+            result.errors.append((line, str(error)))
+
+    def write(batch_size):
+        for batch in chunked(variants, batch_size):
+            ProductVariant.objects.bulk_create(
+                batch, update_conflicts=True, unique_fields=['product', 'size', 'color'],
+                update_fields=['stock_quantity', 'min_stock_level', 'updated_at'],
+            )
+    return write
+
+
+def validate_stock(rows, result):
+    """A stock take: absolute counts for variants that must already exist."""
+    resolved, existing = resolve_variants(list(rows), result)
+    changed = []
+    now = timezone.now()
+    for line, row, key in resolved:
+        try:
+            current = existing.get(key)
+            if current is None:
+                raise RowError('no such variant; import it with the variants file first')
+            counted = parse_int(row['stock_quantity'], 'stock_quantity')
+            if counted < current.reserved_quantity:
+                raise RowError(f'count {counted} is below the {current.reserved_quantity} already reserved')
+            if counted == current.stock_quantity:
+                result.unchanged += 1
+                continue
+            changed.append((current.pk, current.product_id, counted))
+            result.updated += 1
+        except RowError as error:
+            result.errors.append((line, str(error)))
+
+    def write(batch_size):
+        # One parameterised UPDATE run with executemany: building a
+        # bulk_update() CASE or a bulk_create() upsert costs far more than
+        # the write itself. The reserved_quantity guard is re-checked by the
+        # database so a reservation taken since validation is not undercut.
+        connection = connections[ProductVariant.objects.db]
+        updated_at = connection.ops.adapt_datetimefield_value(now)
+        table = ProductVariant._meta.db_table
+        with connection.cursor() as cursor:
+            for batch in chunked(changed, batch_size):
+                cursor.executemany(
+                    f"UPDATE {table} SET stock_quantity = %s, updated_at = %s "
+                    f"WHERE id = %s AND reserved_quantity <= %s",
+                    [(counted, updated_at, pk, counted) for pk, _, counted in batch],
+                )
+                if cursor.rowcount != len(batch):
+                    raise StockTakeConflict('stock was reserved while the file was being imported; run it again')
+        refresh_product_stock({product_id for _, product_id, _ in changed})
+        refresh_low_stock([pk for pk, _, _ in changed], using=connection.alias)
+        bulk_changed.send(sender=ProductVariant, using=connection.alias, pks=[pk for pk, _, _ in changed])
+    return write
+
+
+IMPORTERS = {
+    'products': validate_products,
+    'variants': validate_variants,
+    'stock': validate_stock,
+}
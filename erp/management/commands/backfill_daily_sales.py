@@ -0,0 +1,50 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from erp.models import Order, rebuild_daily_sales
+
+
+def date_argument(value):
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(value)
+    return day
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyVariantSales fact table from the order items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date_argument, help='First day to rebuild (default: the first order)')
+        parser.add_argument('--end', type=date_argument, help='Last day to rebuild (default: the last order)')
+        parser.add_argument('--chunk-days', type=int, default=31,
+                            help='Days rebuilt per transaction, to bound memory and lock time')
+
+    def handle(self, *args, **options):
+        bounds = Order.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+        if bounds['first'] is None and not (options['start'] and options['end']):
+            self.stdout.write('No orders; nothing to backfill')
+            return
+        start = options['start'] or timezone.localdate(bounds['first'])
+        end = options['end'] or timezone.localdate(bounds['last'])
+        if start > end:
+            raise CommandError('--start is after --end')
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be at least 1')
+
+        started = time.perf_counter()
+        written = 0
+        day = start
+        while day <= end:
+            last = min(day + datetime.timedelta(days=options['chunk_days'] - 1), end)
+            written += rebuild_daily_sales(day, last)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{day} – {last}: {written} rows so far')
+            day = last + datetime.timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rebuilt daily sales from {start} to {end}: {written} rows in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,107 @@
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from erp.sqlite import apply_pragmas, configured_pragmas
+
+
+# The out-of-the-box Django/SQLite behaviour: rollback journal, deferred
+# transactions, Python's 5s lock timeout and a new connection per request.
+BARE = {'pragmas': {}, 'transaction_mode': 'DEFERRED', 'persistent': False}
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent SQLite write throughput with and without the configured connection profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--profile', choices=['bare', 'configured', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        configured = {
+            'pragmas': {'journal_mode': settings.ERP_SQLITE_JOURNAL_MODE, **configured_pragmas()},
+            'transaction_mode': settings.DATABASES['default'].get('OPTIONS', {}).get('transaction_mode') or 'DEFERRED',
+            'persistent': settings.DATABASES['default'].get('CONN_MAX_AGE', 0) != 0,
+        }
+        profiles = {'bare': BARE, 'configured': configured}
+        if options['profile'] != 'both':
+            profiles = {options['profile']: profiles[options['profile']]}
+
+        self.stdout.write(f"{options['threads']} threads, {options['seconds']}s per profile")
+        for name, profile in profiles.items():
+            with tempfile.TemporaryDirectory() as directory:
+                result = self.run(Path(directory) / 'bench.sqlite3', profile, options)
+            self.stdout.write(
+                f"{name:<11} {result['writes'] / options['seconds']:>8.0f} writes/s  "
+                f"errors={result['errors']:<6} p50={result['p50']:.2f}ms p99={result['p99']:.2f}ms  "
+                f"({', '.join(f'{k}={v}' for k, v in profile['pragmas'].items()) or 'no pragmas'}; "
+                f"{profile['transaction_mode']}; {'persistent' if profile['persistent'] else 'per-request'} connections)"
+            )
+
+    def connect(self, path, profile):
+        # isolation_level=None: we issue BEGIN ourselves, like Django does.
+        db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        apply_pragmas(db.cursor(), profile['pragmas'])
+        return db
+
+    def run(self, path, profile, options):
+        db = self.connect(path, profile)
+        db.execute('CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)')
+        db.execute('CREATE TABLE event (id INTEGER PRIMARY KEY, worker INTEGER, value INTEGER, payload TEXT)')
+        db.execute('INSERT INTO counter (id, value) VALUES (1, 0)')
+        db.close()
+
+        lock = threading.Lock()
+        totals = {'writes': 0, 'errors': 0, 'latencies': []}
+        deadline = time.perf_counter() + options['seconds']
+
+        def worker(number):
+            writes, errors, latencies = 0, 0, []
+            db = self.connect(path, profile) if profile['persistent'] else None
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                conn = db or self.connect(path, profile)
+                try:
+                    # A typical request: read something, then write based on it.
+                    conn.execute(f"BEGIN {profile['transaction_mode']}")
+                    value = conn.execute('SELECT value FROM counter WHERE id = 1').fetchone()[0]
+                    conn.execute('UPDATE counter SET value = value + 1 WHERE id = 1')
+                    conn.execute('INSERT INTO event (worker, value, payload) VALUES (?, ?, ?)',
+                                 (number, value, 'x' * 200))
+                    conn.execute('COMMIT')
+                    writes += 1
+                except sqlite3.OperationalError:
+                    # "database is locked": the request would have failed.
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    errors += 1
+                finally:
+                    if db is None:
+                        conn.close()
+                latencies.append((time.perf_counter() - started) * 1000)
+            if db is not None:
+                db.close()
+            with lock:
+                totals['writes'] += writes
+                totals['errors'] += errors
+                totals['latencies'].extend(latencies)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        latencies = sorted(totals['latencies']) or [0]
+        return {
+            'writes': totals['writes'],
+            'errors': totals['errors'],
+            'p50': statistics.median(latencies),
+            'p99': latencies[int(len(latencies) * 0.99) - 1] if len(latencies) > 1 else latencies[0],
+        }
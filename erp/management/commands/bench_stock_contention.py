@@ -0,0 +1,190 @@
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from erp import stock
+from erp.models import *
+
+
+MAX_ATTEMPTS = 500
+
+
+class Command(BaseCommand):
+    help = 'Hammer a few hot variants from many threads and check that no stock update is lost'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--orders', type=int, default=400)
+        parser.add_argument('--variants', type=int, default=3, help='Number of hot variants all orders compete for')
+        parser.add_argument('--stock', type=int, default=1000, help='Initial stock per variant')
+        parser.add_argument('--max-quantity', type=int, default=3)
+        parser.add_argument('--release-ratio', type=float, default=0.2,
+                            help='Share of reserved orders that are cancelled instead of committed')
+        parser.add_argument('--naive', action='store_true',
+                            help='Use a read-modify-write save() instead of the stock service, for comparison')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark rows afterwards')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError('Threads need a file-backed database; an in-memory SQLite database is per connection.')
+
+        self.rng = random.Random(options['seed'])
+        self.lock = threading.Lock()
+        self.committed = Counter()
+        self.stats = Counter()
+
+        fixtures = self.create_fixtures(options)
+        try:
+            orders = list(fixtures['orders'])
+            chunks = [orders[i::options['threads']] for i in range(options['threads'])]
+            worker = self.naive_worker if options['naive'] else self.service_worker
+            threads = [
+                threading.Thread(target=worker, args=(chunk, random.Random(options['seed'] + i), options))
+                for i, chunk in enumerate(chunks)
+            ]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            self.report(fixtures, options, elapsed)
+        finally:
+            if not options['keep']:
+                self.cleanup(fixtures)
+
+    def create_fixtures(self, options):
+        token = uuid.uuid4().hex[:8]
+        category = Category.objects.create(name=f'bench-{token}')
+        brand = Brand.objects.create(name=f'bench-{token}')
+        product = Product.objects.create(
+            name=f'Bench product {token}', description='Stock contention benchmark', category=category,
+            brand=brand, sku=f'BENCH-{token}', price=Decimal('10.00'), cost_price=Decimal('5.00'),
+        )
+        size = Size.objects.create(name=f'B{token}')
+        colors = [Color.objects.create(name=f'bench-{token}-{i}') for i in range(options['variants'])]
+        variants = [
+            ProductVariant.objects.create(product=product, size=size, color=color,
+                                          stock_quantity=options['stock'], min_stock_level=0)
+            for color in colors
+        ]
+        customer = Customer.objects.create(
+            first_name='Bench', last_name=token, email=f'bench-{token}@example.com', phone='0',
+            address='-', city='-', postal_code='-',
+        )
+        orders = Order.objects.bulk_create([
+            Order(order_number=f'B{token}{i:06d}', customer=customer, subtotal=0, total_amount=0)
+            for i in range(options['orders'])
+        ])
+        items = []
+        for order in orders:
+            for variant in self.rng.sample(variants, self.rng.randint(1, len(variants))):
+                quantity = self.rng.randint(1, options['max_quantity'])
+                items.append(OrderItem(order=order, product_variant=variant, quantity=quantity,
+                                       unit_price=Decimal('10.00'), total_price=Decimal('10.00') * quantity))
+        OrderItem.objects.bulk_create(items)
+        self.items = Counter()
+        self.order_items = {}
+        for item in items:
+            self.order_items.setdefault(item.order_id, []).append((item.product_variant_id, item.quantity))
+            self.items[item.product_variant_id] += item.quantity
+        return {
+            'category': category, 'brand': brand, 'product': product, 'size': size, 'colors': colors,
+            'variants': variants, 'customer': customer, 'orders': orders,
+        }
+
+    def retrying(self, operation):
+        # SQLite reports lock conflicts as OperationalError; the failed
+        # transaction has rolled back, so the operation is safe to retry.
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                return operation()
+            except OperationalError:
+                with self.lock:
+                    self.stats['retries'] += 1
+                time.sleep(random.uniform(0, min(0.05, 0.001 * 2 ** attempt)))
+        raise CommandError(f'Gave up after {MAX_ATTEMPTS} attempts')
+
+    def service_worker(self, orders, rng, options):
+        try:
+            for order in orders:
+                try:
+                    self.retrying(lambda: stock.reserve(order))
+                except stock.InsufficientStock:
+                    with self.lock:
+                        self.stats['insufficient'] += 1
+                    continue
+                if rng.random() < options['release_ratio']:
+                    self.retrying(lambda: stock.release(order))
+                    with self.lock:
+                        self.stats['released'] += 1
+                    continue
+                quantities = self.retrying(lambda: stock.commit(order))
+                with self.lock:
+                    self.stats['committed'] += 1
+                    self.committed.update(quantities)
+        finally:
+            connections.close_all()
+
+    def naive_worker(self, orders, rng, options):
+        def decrement(variant_id, quantity):
+            variant = ProductVariant.objects.get(pk=variant_id)
+            if variant.stock_quantity < quantity:
+                return False
+            variant.stock_quantity -= quantity
+            variant.save(update_fields=['stock_quantity'])
+            return True
+
+        try:
+            for order in orders:
+                if rng.random() < options['release_ratio']:
+                    continue
+                for variant_id, quantity in self.order_items.get(order.pk, []):
+                    if self.retrying(lambda: decrement(variant_id, quantity)):
+                        with self.lock:
+                            self.committed[variant_id] += quantity
+                with self.lock:
+                    self.stats['committed'] += 1
+        finally:
+            connections.close_all()
+
+    def report(self, fixtures, options, elapsed):
+        self.stdout.write(f"{'naive save()' if options['naive'] else 'stock service'}: "
+                          f"{options['orders']} orders, {options['threads']} threads, {elapsed:.2f}s "
+                          f"({options['orders'] / elapsed:.0f} orders/s)")
+        self.stdout.write(f"committed={self.stats['committed']} released={self.stats['released']} "
+                          f"insufficient={self.stats['insufficient']} lock retries={self.stats['retries']}")
+
+        lost = 0
+        for variant in ProductVariant.objects.filter(pk__in=[v.pk for v in fixtures['variants']]):
+            expected = options['stock'] - self.committed[variant.pk]
+            difference = variant.stock_quantity - expected
+            lost += abs(difference)
+            self.stdout.write(f"  variant {variant.pk}: stock={variant.stock_quantity} expected={expected} "
+                              f"reserved={variant.reserved_quantity} demand={self.items[variant.pk]}")
+            if variant.stock_quantity < 0 or (not options['naive'] and variant.reserved_quantity != 0):
+                lost += 1
+
+        if lost:
+            message = f'{lost} unit(s) of stock drifted from the expected value'
+            if options['naive']:
+                self.stdout.write(self.style.WARNING(f'⚠️ {message} (lost updates)'))
+            else:
+                raise CommandError(message)
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ No lost updates'))
+
+    def cleanup(self, fixtures):
+        fixtures['customer'].delete()
+        fixtures['product'].delete()
+        fixtures['category'].delete()
+        fixtures['brand'].delete()
+        fixtures['size'].delete()
+        for color in fixtures['colors']:
+            color.delete()
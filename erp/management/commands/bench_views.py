@@ -0,0 +1,199 @@
+import io
+import json
+import logging
+import re
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from erp import urls as erp_urls
+from erp.middleware import QueryTimer, execute_wrapper
+from erp.models import Order
+
+
+# A view regresses when its query count grows at all, or when a timing or
+# memory figure grows by more than --tolerance *and* by more than the
+# noise floor below. p99 is reported but not gated: with a few dozen
+# iterations it is effectively the single slowest request.
+NOISE_FLOOR = {'p50_ms': 2.0, 'p95_ms': 5.0, 'sql_ms': 2.0, 'peak_kb': 256.0}
+
+# Server-sent event streams never end on their own; they are timed up to
+# their first chunk (the connection setup) and then closed.
+SSE_CHUNKS = 1
+
+# The query count RequestTimingMiddleware puts in its Server-Timing header.
+LOGGED_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(samples, pct):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1]
+
+
+class Command(BaseCommand):
+    help = 'Measure latency, query count, SQL time and peak memory of every ERP view and admin changelist'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--scale', type=float,
+                            help='Run against a throwaway test database filled by create_sample_data --scale')
+        parser.add_argument('--orders', type=int, help='Order count for the generated dataset')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the generated test database')
+        parser.add_argument('--cold', action='store_true', help='Clear the caches before every request')
+        parser.add_argument('--only', action='append', default=[], help='Only run views whose name contains this')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='Compare against this JSON file and fail on regressions')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative growth of timings and memory over the baseline')
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        # The timing middleware would log every one of our requests.
+        logging.getLogger('erp.performance').setLevel(logging.CRITICAL)
+        old_name = None
+        try:
+            if options['scale'] is not None:
+                old_name = connection.settings_dict['NAME']
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+                if not Order.objects.exists():
+                    call_command('create_sample_data', scale=options['scale'], orders=options['orders'],
+                                 seed=options['seed'], stdout=io.StringIO())
+            results = self.run(options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self.report(results)
+        if options['output']:
+            path = Path(options['output'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(f'Wrote {path}')
+        if options['baseline']:
+            self.compare(results, json.loads(Path(options['baseline']).read_text()), options['tolerance'])
+
+    def targets(self):
+        targets = [('erp:' + pattern.name, reverse('erp:' + pattern.name)) for pattern in erp_urls.urlpatterns]
+        for model in admin.site._registry:
+            opts = model._meta
+            if opts.app_label == 'erp':
+                name = f'admin:{opts.app_label}_{opts.model_name}_changelist'
+                targets.append((name, reverse(name)))
+        return targets
+
+    def run(self, options):
+        user, _ = User.objects.get_or_create(username='bench-views', defaults={'is_staff': True, 'is_superuser': True})
+        client = Client()
+        client.force_login(user)
+
+        results = {}
+        for name, url in self.targets():
+            if options['only'] and not any(part in name for part in options['only']):
+                continue
+            for _ in range(options['warmup']):
+                self.request(client, url, options['cold'])
+
+            latencies, queries, sql = [], [], []
+            for _ in range(options['iterations']):
+                elapsed, timer = self.request(client, url, options['cold'])
+                latencies.append(elapsed * 1000)
+                queries.append(timer.count)
+                sql.append(timer.seconds * 1000)
+
+            # Memory is measured on a separate request: tracemalloc slows
+            # everything down and would distort the latencies.
+            tracemalloc.start()
+            self.request(client, url, options['cold'])
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results[name] = {
+                'url': url,
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'queries': max(queries),
+                'sql_ms': round(statistics.median(sql), 2),
+                'peak_kb': round(peak / 1024, 1),
+            }
+        return {'iterations': options['iterations'], 'cold': options['cold'], 'views': results}
+
+    def request(self, client, url, cold):
+        """
+        Request ``url`` once; return the elapsed time and a QueryTimer that
+        counted its queries on every database and thread.
+        """
+        if cold:
+            for cache in caches.all():
+                cache.clear()
+        with execute_wrapper(QueryTimer()) as timer:
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                # The test client returns before a streamed body is produced;
+                # read it so its queries, time and memory are counted.
+                if response.is_async:
+                    async_to_sync(self.read_events)(response)
+                else:
+                    for _ in response.streaming_content:
+                        pass
+                response.close()
+            elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise CommandError(f'{url} returned {response.status_code}')
+        self.check_count(url, response, timer)
+        return elapsed, timer
+
+    def check_count(self, url, response, timer):
+        # The production log is only as good as the middleware's count, so
+        # it must see every query the request ran. A streamed body runs its
+        # queries after the middleware has logged the request.
+        logged = int(LOGGED_QUERIES.search(response['Server-Timing']).group(1))
+        if timer.count < logged or (timer.count != logged and not response.streaming):
+            raise CommandError(f'{url}: counted {timer.count} queries, the timing middleware logged {logged}')
+
+    async def read_events(self, response):
+        chunks = 0
+        async for _ in response:
+            chunks += 1
+            if chunks >= SSE_CHUNKS:
+                break
+
+    def report(self, results):
+        self.stdout.write(f"{'view':<40} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8} {'sql':>8} {'peak':>10}")
+        for name, row in results['views'].items():
+            self.stdout.write(
+                f"{name:<40} {row['p50_ms']:>6.1f}ms {row['p95_ms']:>6.1f}ms {row['p99_ms']:>6.1f}ms "
+                f"{row['queries']:>8} {row['sql_ms']:>6.1f}ms {row['peak_kb']:>8.0f}kB"
+            )
+
+    def compare(self, results, baseline, tolerance):
+        regressions = []
+        for name, row in results['views'].items():
+            before = baseline['views'].get(name)
+            if before is None:
+                continue
+            if row['queries'] > before['queries']:
+                regressions.append(f"{name}: queries {before['queries']} -> {row['queries']}")
+            for metric, floor in NOISE_FLOOR.items():
+                limit = max(before[metric] * (1 + tolerance), before[metric] + floor)
+                if row[metric] > limit:
+                    regressions.append(f'{name}: {metric} {before[metric]} -> {row[metric]}')
+        if regressions:
+            raise CommandError('Performance regressions against the baseline:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('✅ No regressions against the baseline'))
@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from erp import reorder
+from erp.models import ProductVariant
+
+
+class Command(BaseCommand):
+    help = 'Set ProductVariant.min_stock_level to a reorder point computed from recent daily demand'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window-days', type=int, default=56, help='Days of demand history to average over')
+        parser.add_argument('--lead-time-days', type=float, default=7, help='Days between reordering and restocking')
+        parser.add_argument('--service-level', type=float, default=0.95,
+                            help='Chance of not running out during the lead time (sets the safety stock)')
+        parser.add_argument('--show', type=int, default=20, help='How many of the largest changes to list')
+        parser.add_argument('--dry-run', action='store_true', help='Report the changes; write nothing')
+
+    def handle(self, *args, **options):
+        if options['window_days'] < 2:
+            raise CommandError('--window-days must be at least 2')
+        if options['lead_time_days'] <= 0:
+            raise CommandError('--lead-time-days must be positive')
+        if not 0 < options['service_level'] < 1:
+            raise CommandError('--service-level must be between 0 and 1')
+
+        started = time.perf_counter()
+        ids, current, mean, std, points = reorder.compute(
+            options['window_days'], options['lead_time_days'], options['service_level'],
+        )
+        computed = time.perf_counter()
+
+        changed = points != current
+        self.stdout.write(
+            f'{len(ids)} variants with {options["window_days"]} days of history: '
+            f'{int((points > current).sum())} raised, {int((points < current).sum())} lowered, '
+            f'{int((~changed).sum())} unchanged'
+        )
+        self.report(ids[changed], current[changed], mean[changed], std[changed], points[changed], options['show'])
+
+        if options['dry_run']:
+            self.stdout.write(f'Dry run: computed in {computed - started:.2f}s; nothing written')
+            return
+        reorder.save(ids[changed], points[changed])
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Computed {len(ids)} reorder points in {computed - started:.2f}s, '
+            f'updated {int(changed.sum())} in {time.perf_counter() - computed:.2f}s'
+        ))
+
+    def report(self, ids, current, mean, std, points, limit):
+        if not len(ids) or limit <= 0:
+            return
+        largest = np.argsort(-np.abs(points - current), kind='stable')[:limit]
+        variants = ProductVariant.objects.select_related('product', 'size', 'color').in_bulk(ids[largest].tolist())
+        self.stdout.write(f"{'variant':<50} {'avg/day':>8} {'std':>8} {'old':>6} {'new':>6}")
+        for i in largest:
+            self.stdout.write(
+                f'{str(variants[int(ids[i])])[:50]:<50} {mean[i]:>8.2f} {std[i]:>8.2f} {current[i]:>6} {points[i]:>6}'
+            )
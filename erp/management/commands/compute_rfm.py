@@ -0,0 +1,33 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from erp import rfm
+from erp.models import Customer
+
+
+class Command(BaseCommand):
+    help = 'Score every customer on recency, frequency and monetary value and assign RFM segments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Compute and report the segments; write nothing')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        ids, recency, frequency, monetary, segment = rfm.compute()
+        computed = time.perf_counter()
+
+        labels = dict(Customer.RFM_SEGMENT_CHOICES)
+        names, counts = np.unique(segment, return_counts=True)
+        sizes = dict(zip(names.tolist(), counts.tolist()))
+        for name, label in Customer.RFM_SEGMENT_CHOICES:
+            self.stdout.write(f'{labels[name]:<20} {sizes.get(name, 0):>10}')
+
+        if options['dry_run']:
+            self.stdout.write(f'Dry run: scored {len(ids)} customers in {computed - started:.2f}s; nothing written')
+            return
+        updated = rfm.save(ids, recency, frequency, monetary, segment)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Scored {len(ids)} customers in {computed - started:.2f}s, '
+            f'updated {updated} in {time.perf_counter() - computed:.2f}s'
+        ))
@@ -1,199 +1,366 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
 from erp.models import *
+from erp import search, versions
+from contextlib import contextmanager
 from decimal import Decimal
+from datetime import datetime, time, timedelta
+import bisect
+import itertools
+import math
 import random
-from datetime import datetime, timedelta
-import uuid
+
+
+# Row counts at --scale 1; every count scales linearly.
+BASE_COUNTS = {
+    'products': 10,
+    'customers': 8,
+    'suppliers': 3,
+    'orders': 20,
+    'transactions': 50,
+}
+
+CATEGORIES = [
+    'T-Shirts', 'Jeans', 'Dresses', 'Jackets', 'Shoes',
+    'Accessories', 'Underwear', 'Sportswear', 'Formal Wear'
+]
+BRANDS = [
+    'Nike', 'Adidas', 'Zara', 'H&M', 'Uniqlo',
+    'Levi\'s', 'Calvin Klein', 'Tommy Hilfiger', 'Gap'
+]
+SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+COLORS = [
+    ('Black', '#000000'), ('White', '#FFFFFF'), ('Red', '#FF0000'),
+    ('Blue', '#0000FF'), ('Green', '#008000'), ('Yellow', '#FFFF00'),
+    ('Pink', '#FFC0CB'), ('Gray', '#808080'), ('Brown', '#A52A2A'),
+    ('Navy', '#000080')
+]
+PRODUCTS = [
+    ('Classic Cotton T-Shirt', 'T-Shirts', 'Nike', 29.99, 15.00),
+    ('Slim Fit Jeans', 'Jeans', 'Levi\'s', 89.99, 45.00),
+    ('Summer Dress', 'Dresses', 'Zara', 59.99, 30.00),
+    ('Leather Jacket', 'Jackets', 'Calvin Klein', 199.99, 100.00),
+    ('Running Shoes', 'Shoes', 'Adidas', 129.99, 65.00),
+    ('Casual Sneakers', 'Shoes', 'Nike', 99.99, 50.00),
+    ('Formal Shirt', 'Formal Wear', 'Tommy Hilfiger', 79.99, 40.00),
+    ('Yoga Pants', 'Sportswear', 'Adidas', 49.99, 25.00),
+    ('Winter Coat', 'Jackets', 'H&M', 149.99, 75.00),
+    ('Basic Hoodie', 'T-Shirts', 'Uniqlo', 39.99, 20.00),
+]
+FIRST_NAMES = ['John', 'Jane', 'Mike', 'Sarah', 'David', 'Emily', 'Chris', 'Lisa',
+               'Aziz', 'Dilnoza', 'Timur', 'Malika', 'Anna', 'Omar', 'Nina', 'Paul']
+LAST_NAMES = ['Doe', 'Smith', 'Johnson', 'Williams', 'Brown', 'Davis', 'Miller', 'Wilson',
+              'Karimov', 'Usmonova', 'Rashidov', 'Lee', 'Garcia', 'Novak', 'Khan', 'Silva']
+CITIES = ['New York', 'Los Angeles', 'Chicago', 'Houston', 'Tashkent', 'Samarkand']
+SUPPLIERS = [
+    ('Fashion Wholesale Inc', 'John Manager', 'john@fashionwholesale.com'),
+    ('Textile Suppliers Ltd', 'Sarah Director', 'sarah@textilesuppliers.com'),
+    ('Global Apparel Co', 'Mike Sales', 'mike@globalapparel.com'),
+]
+EXPENSES = ['Inventory Purchase', 'Office Supplies', 'Marketing Expense', 'Utility Bill', 'Equipment Purchase']
+
+# (status, payment_status, weight)
+ORDER_STATUSES = [
+    ('completed', 'paid', 55),
+    ('delivered', 'paid', 10),
+    ('shipped', 'paid', 10),
+    ('processing', 'pending', 8),
+    ('pending', 'pending', 10),
+    ('cancelled', 'refunded', 7),
+]
+SALE_STATUSES = {'completed', 'delivered', 'shipped'}
+ITEMS_PER_ORDER = [(1, 45), (2, 30), (3, 15), (4, 10)]
+ZIPF_EXPONENT = 1.1
+
+
+def cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+def pick(rng, population, cum_weights):
+    return population[bisect.bisect(cum_weights, rng.random() * cum_weights[-1])]
+
+
+def money(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the generated created_at/updated_at values."""
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
 
 
 class Command(BaseCommand):
     help = 'Create sample data for the clothing ERP system'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1,
+                            help='Multiply every base row count (10 products, 8 customers, 20 orders, ...)')
+        parser.add_argument('--seed', type=int, help='Seed for a reproducible dataset')
+        for name in BASE_COUNTS:
+            parser.add_argument(f'--{name}', type=int, help=f'Number of {name} (overrides --scale)')
+        parser.add_argument('--days', type=int, default=365, help='Spread orders over this many past days')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
     def handle(self, *args, **options):
         self.stdout.write('Creating sample data...')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        counts = {
+            name: options[name] if options[name] is not None else max(1, round(base * options['scale']))
+            for name, base in BASE_COUNTS.items()
+        }
 
         # Create superuser if not exists
         if not User.objects.filter(username='admin').exists():
             User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
             self.stdout.write('Created admin user (username: admin, password: admin123)')
 
-        # Create categories
-        categories = [
-            'T-Shirts', 'Jeans', 'Dresses', 'Jackets', 'Shoes',
-            'Accessories', 'Underwear', 'Sportswear', 'Formal Wear'
-        ]
-        for cat_name in categories:
-            Category.objects.get_or_create(name=cat_name)
+        self.create_reference_data()
+        with explicit_timestamps(Product, ProductVariant, Customer, Supplier, Order, Transaction):
+            variants = self.create_products(counts['products'])
+            customers = self.create_customers(counts['customers'], options['days'])
+            self.create_suppliers(counts['suppliers'])
+            self.create_orders(counts['orders'], variants, customers, options['days'])
+            self.create_transactions(counts['transactions'], options['days'])
 
-        # Create brands
-        brands = [
-            'Nike', 'Adidas', 'Zara', 'H&M', 'Uniqlo',
-            'Levi\'s', 'Calvin Klein', 'Tommy Hilfiger', 'Gap'
-        ]
-        for brand_name in brands:
-            Brand.objects.get_or_create(name=brand_name)
+        # The rows above went in through bulk_create on the base managers,
+        # so rebuild everything the signals would have maintained.
+        self.stdout.write('Refreshing denormalized totals and the search index...')
+        Product.objects.all().refresh_stock_totals()
+        ProductVariant.objects.all().refresh_low_stock_flags()
+        Customer.objects.all().refresh_order_totals()
+        call_command('backfill_daily_sales', stdout=self.stdout)
+        for entity in search.ENTITIES:
+            search.rebuild(entity)
+        versions.bump(*[versions.model_key(model) for model in
+                        (Product, ProductVariant, Customer, Supplier, Order, OrderItem, Transaction)])
 
-        # Create sizes
-        sizes = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
-        for size_name in sizes:
-            Size.objects.get_or_create(name=size_name)
-
-        # Create colors
-        colors = [
-            ('Black', '#000000'), ('White', '#FFFFFF'), ('Red', '#FF0000'),
-            ('Blue', '#0000FF'), ('Green', '#008000'), ('Yellow', '#FFFF00'),
-            ('Pink', '#FFC0CB'), ('Gray', '#808080'), ('Brown', '#A52A2A'),
-            ('Navy', '#000080')
-        ]
-        for color_name, hex_code in colors:
+        self.stdout.write(self.style.SUCCESS('✅ Sample data created successfully!'))
+        self.stdout.write('🔑 You can now login with username: admin, password: admin123')
+
+    def create_reference_data(self):
+        for cat_name in CATEGORIES:
+            Category.objects.get_or_create(name=cat_name)
+        for brand_name in BRANDS:
+            Brand.objects.get_or_create(name=brand_name)
+        for sort_order, size_name in enumerate(SIZES):
+            Size.objects.get_or_create(name=size_name, defaults={'sort_order': sort_order})
+        for color_name, hex_code in COLORS:
             Color.objects.get_or_create(name=color_name, defaults={'hex_code': hex_code})
 
-        # Create products
-        products_data = [
-            ('Classic Cotton T-Shirt', 'T-Shirts', 'Nike', 29.99, 15.00),
-            ('Slim Fit Jeans', 'Jeans', 'Levi\'s', 89.99, 45.00),
-            ('Summer Dress', 'Dresses', 'Zara', 59.99, 30.00),
-            ('Leather Jacket', 'Jackets', 'Calvin Klein', 199.99, 100.00),
-            ('Running Shoes', 'Shoes', 'Adidas', 129.99, 65.00),
-            ('Casual Sneakers', 'Shoes', 'Nike', 99.99, 50.00),
-            ('Formal Shirt', 'Formal Wear', 'Tommy Hilfiger', 79.99, 40.00),
-            ('Yoga Pants', 'Sportswear', 'Adidas', 49.99, 25.00),
-            ('Winter Coat', 'Jackets', 'H&M', 149.99, 75.00),
-            ('Basic Hoodie', 'T-Shirts', 'Uniqlo', 39.99, 20.00),
-        ]
+    def timestamps(self, count, days):
+        """
+        ``count`` datetimes over the last ``days`` days with seasonal weight:
+        a yearly wave peaking in late autumn, a December rush, busier
+        weekends and business-hour times of day.
+        """
+        now = timezone.now()
+        first_day = (now - timedelta(days=days)).date()
+        day_weights = []
+        for offset in range(days):
+            day = first_day + timedelta(days=offset + 1)
+            weight = 1 + 0.35 * math.sin(2 * math.pi * (day.timetuple().tm_yday - 220) / 365)
+            if day.month == 12 and day.day <= 24:
+                weight *= 1.8
+            if day.weekday() >= 5:
+                weight *= 1.3
+            day_weights.append(weight)
+        day_cum = cumulative(day_weights)
+        hour_cum = cumulative([1 if hour < 9 or hour > 21 else 6 for hour in range(24)])
+        hours = list(range(24))
+        tz = timezone.get_current_timezone()
+        result = []
+        for _ in range(count):
+            offset = bisect.bisect(day_cum, self.rng.random() * day_cum[-1])
+            day = first_day + timedelta(days=offset + 1)
+            moment = datetime.combine(day, time(pick(self.rng, hours, hour_cum), self.rng.randrange(60),
+                                                self.rng.randrange(60)))
+            result.append(min(timezone.make_aware(moment, tz), now))
+        return result
 
-        for i, (name, cat_name, brand_name, price, cost) in enumerate(products_data):
-            category = Category.objects.get(name=cat_name)
-            brand = Brand.objects.get(name=brand_name)
+    def create_products(self, count):
+        categories = {category.name: category.pk for category in Category.objects.all()}
+        brands = {brand.name: brand.pk for brand in Brand.objects.all()}
+        sizes = list(Size.objects.values_list('pk', flat=True))
+        colors = list(Color.objects.values_list('pk', flat=True))
+        offset = Product.objects.count()
+        now = timezone.now()
 
-            product, created = Product.objects.get_or_create(
+        products = []
+        for i in range(count):
+            name, cat_name, brand_name, price, cost = PRODUCTS[i % len(PRODUCTS)]
+            if offset or i >= len(PRODUCTS):
+                name = f'{name} #{offset + i + 1}'
+            products.append(Product(
                 name=name,
-                defaults={
-                    'description': f'High quality {name.lower()} from {brand_name}',
-                    'category': category,
-                    'brand': brand,
-                    'sku': f'SKU{1000 + i}',
-                    'price': Decimal(str(price)),
-                    'cost_price': Decimal(str(cost)),
-                }
-            )
+                description=f'High quality {name.lower()} from {brand_name}',
+                category_id=categories[cat_name],
+                brand_id=brands[brand_name],
+                sku=f'SKU{1000 + offset + i}',
+                price=Decimal(str(price)),
+                cost_price=Decimal(str(cost)),
+                created_at=now,
+                updated_at=now,
+            ))
+        self.bulk_insert(Product, products)
 
-            if created:
-                sizes_list = Size.objects.all()
-                colors_list = Color.objects.all()
-                for size in random.sample(list(sizes_list), min(3, len(sizes_list))):
-                    for color in random.sample(list(colors_list), min(2, len(colors_list))):
-                        ProductVariant.objects.create(
-                            product=product,
-                            size=size,
-                            color=color,
-                            stock_quantity=random.randint(10, 100),
-                            min_stock_level=5
-                        )
-
-        # Create customers
-        customers_data = [
-            ('John', 'Doe', 'john.doe@email.com', '+1234567890', 'M'),
-            ('Jane', 'Smith', 'jane.smith@email.com', '+1234567891', 'F'),
-            ('Mike', 'Johnson', 'mike.johnson@email.com', '+1234567892', 'M'),
-            ('Sarah', 'Williams', 'sarah.williams@email.com', '+1234567893', 'F'),
-            ('David', 'Brown', 'david.brown@email.com', '+1234567894', 'M'),
-            ('Emily', 'Davis', 'emily.davis@email.com', '+1234567895', 'F'),
-            ('Chris', 'Miller', 'chris.miller@email.com', '+1234567896', 'M'),
-            ('Lisa', 'Wilson', 'lisa.wilson@email.com', '+1234567897', 'F'),
-        ]
+        variants = []
+        for product in products:
+            for size in self.rng.sample(sizes, min(3, len(sizes))):
+                for color in self.rng.sample(colors, min(2, len(colors))):
+                    variants.append(ProductVariant(
+                        product_id=product.pk,
+                        size_id=size,
+                        color_id=color,
+                        stock_quantity=self.rng.randint(10, 100),
+                        min_stock_level=5,
+                        created_at=now,
+                        updated_at=now,
+                    ))
+        self.bulk_insert(ProductVariant, variants)
+        self.stdout.write(f'Created {len(products)} products with {len(variants)} variants')
+        prices = {product.pk: product.price for product in products}
+        return [(variant.pk, prices[variant.product_id]) for variant in variants]
+
+    def create_customers(self, count, days):
+        offset = Customer.objects.count()
+        joined = self.timestamps(count, days)
+        customers = []
+        for i in range(count):
+            first = FIRST_NAMES[i % len(FIRST_NAMES)]
+            last = LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+            number = offset + i
+            customers.append(Customer(
+                first_name=first,
+                last_name=last,
+                email=f'{first}.{last}.{number}@email.com'.lower(),
+                phone=f'+1234{number:07d}',
+                gender=self.rng.choice(['M', 'F']),
+                address=f'{self.rng.randint(100, 999)} Main St',
+                city=self.rng.choice(CITIES),
+                postal_code=f'{self.rng.randint(10000, 99999)}',
+                created_at=joined[i],
+                updated_at=joined[i],
+            ))
+        self.bulk_insert(Customer, customers)
+        self.stdout.write(f'Created {len(customers)} customers')
+        return [(customer.pk, customer.created_at) for customer in customers]
 
-        for first, last, email, phone, gender in customers_data:
-            Customer.objects.get_or_create(
+    def create_suppliers(self, count):
+        offset = Supplier.objects.count()
+        now = timezone.now()
+        suppliers = []
+        for i in range(count):
+            name, contact, email = SUPPLIERS[i % len(SUPPLIERS)]
+            if offset or i >= len(SUPPLIERS):
+                name = f'{name} #{offset + i + 1}'
+                email = email.replace('@', f'+{offset + i + 1}@')
+            suppliers.append(Supplier(
+                name=name,
+                contact_person=contact,
                 email=email,
-                defaults={
-                    'first_name': first,
-                    'last_name': last,
-                    'phone': phone,
-                    'gender': gender,
-                    'address': f'{random.randint(100, 999)} Main St',
-                    'city': random.choice(['New York', 'Los Angeles', 'Chicago', 'Houston']),
-                    'postal_code': f'{random.randint(10000, 99999)}',
-                }
-            )
+                phone=f'+1234567{self.rng.randint(100, 999)}',
+                address=f'{self.rng.randint(100, 999)} Business Ave',
+                city=self.rng.choice(CITIES[:3]),
+                created_at=now,
+                updated_at=now,
+            ))
+        self.bulk_insert(Supplier, suppliers)
 
-        # Create suppliers
-        suppliers_data = [
-            ('Fashion Wholesale Inc', 'John Manager', 'john@fashionwholesale.com'),
-            ('Textile Suppliers Ltd', 'Sarah Director', 'sarah@textilesuppliers.com'),
-            ('Global Apparel Co', 'Mike Sales', 'mike@globalapparel.com'),
-        ]
+    def create_orders(self, count, variants, customers, days):
+        # Zipfian popularity: the variant at rank r sells ~1/r^s as often as
+        # the best seller. Customers get a milder skew (loyal regulars).
+        ranked_variants = variants[:]
+        self.rng.shuffle(ranked_variants)
+        variant_cum = cumulative([1 / rank ** ZIPF_EXPONENT for rank in range(1, len(ranked_variants) + 1)])
+        ranked_customers = customers[:]
+        self.rng.shuffle(ranked_customers)
+        customer_cum = cumulative([1 / rank ** 0.8 for rank in range(1, len(ranked_customers) + 1)])
+        status_cum = cumulative([weight for _, _, weight in ORDER_STATUSES])
+        items_cum = cumulative([weight for _, weight in ITEMS_PER_ORDER])
+        item_counts = [n for n, _ in ITEMS_PER_ORDER]
+        offset = Order.objects.count()
 
-        for name, contact, email in suppliers_data:
-            Supplier.objects.get_or_create(
-                email=email,
-                defaults={
-                    'name': name,
-                    'contact_person': contact,
-                    'phone': f'+1234567{random.randint(100, 999)}',
-                    'address': f'{random.randint(100, 999)} Business Ave',
-                    'city': random.choice(['New York', 'Los Angeles', 'Chicago']),
-                }
-            )
+        created = 0
+        while created < count:
+            size = min(self.batch_size, count - created)
+            dates = sorted(self.timestamps(size, days))
+            orders, order_items, sales = [], [], []
+            for i, created_at in enumerate(dates):
+                customer_id, _ = pick(self.rng, ranked_customers, customer_cum)
+                status, payment_status, _ = pick(self.rng, ORDER_STATUSES, status_cum)
+                lines = {}
+                for _ in range(pick(self.rng, item_counts, items_cum)):
+                    variant_id, price = pick(self.rng, ranked_variants, variant_cum)
+                    quantity = lines.get(variant_id, (0, price))[0] + self.rng.randint(1, 3)
+                    lines[variant_id] = (quantity, price)
+                subtotal = sum((price * quantity for quantity, price in lines.values()), Decimal('0'))
+                orders.append(Order(
+                    order_number=f'ORD{created_at:%Y%m%d}{offset + created + i:07d}',
+                    customer_id=customer_id,
+                    status=status,
+                    payment_status=payment_status,
+                    stock_status='committed' if status in SALE_STATUSES else 'none',
+                    subtotal=subtotal,
+                    total_amount=subtotal,
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+                order_items.append(lines)
 
-        # Create sample orders
-        customers = Customer.objects.all()
-        variants = ProductVariant.objects.all()
-
-        def generate_order_number():
-            while True:
-                number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
-                if not Order.objects.filter(order_number=number).exists():
-                    return number
-
-        for _ in range(20):
-            customer = random.choice(customers)
-            order_number = generate_order_number()
-
-            order = Order.objects.create(
-                customer=customer,
-                status=random.choice(['pending', 'processing', 'completed', 'shipped']),
-                payment_status=random.choice(['pending', 'paid']),
-                subtotal=Decimal('0'),
-                total_amount=Decimal('0'),
-                created_at=datetime.now() - timedelta(days=random.randint(1, 90)),
-                order_number=order_number
-            )
+            with transaction.atomic():
+                self.bulk_insert(Order, orders)
+                items = []
+                for order, lines in zip(orders, order_items):
+                    for variant_id, (quantity, price) in lines.items():
+                        items.append(OrderItem(order_id=order.pk, product_variant_id=variant_id, quantity=quantity,
+                                               unit_price=price, total_price=price * quantity))
+                    if order.status in SALE_STATUSES:
+                        sales.append(Transaction(
+                            transaction_type='sale',
+                            amount=order.total_amount,
+                            description='Product Sale',
+                            reference=order.order_number,
+                            order_id=order.pk,
+                            created_at=order.created_at,
+                        ))
+                self.bulk_insert(OrderItem, items)
+                self.bulk_insert(Transaction, sales)
+            created += size
+            self.stdout.write(f'Created {created}/{count} orders')
 
-            # Add order items
-            subtotal = Decimal('0')
-            for _ in range(random.randint(1, 4)):
-                variant = random.choice(variants)
-                quantity = random.randint(1, 3)
-                unit_price = variant.product.price
-                total_price = quantity * unit_price
-
-                OrderItem.objects.create(
-                    order=order,
-                    product_variant=variant,
-                    quantity=quantity,
-                    unit_price=unit_price,
-                    total_price=total_price
-                )
-                subtotal += total_price
-
-            order.subtotal = subtotal
-            order.total_amount = subtotal
-            order.save()
-
-        # Create sample transactions
-        for _ in range(50):
-            Transaction.objects.create(
-                transaction_type=random.choice(['sale', 'purchase', 'expense']),
-                amount=Decimal(str(random.uniform(10, 500))),
-                description=random.choice([
-                    'Product Sale', 'Inventory Purchase', 'Office Supplies',
-                    'Marketing Expense', 'Utility Bill', 'Equipment Purchase'
-                ]),
-                reference=f'REF{random.randint(1000, 9999)}',
-                created_at=datetime.now() - timedelta(days=random.randint(1, 90))
+    def create_transactions(self, count, days):
+        dates = self.timestamps(count, days)
+        transactions = [
+            Transaction(
+                transaction_type=self.rng.choice(['purchase', 'expense']),
+                amount=money(self.rng.randint(1000, 50000)),
+                description=self.rng.choice(EXPENSES),
+                reference=f'REF{self.rng.randint(1000, 9999)}',
+                created_at=created_at,
             )
+            for created_at in dates
+        ]
+        self.bulk_insert(Transaction, transactions)
+        self.stdout.write(f'Created {len(transactions)} purchase/expense transactions')
 
-        self.stdout.write(self.style.SUCCESS('✅ Sample data created successfully!'))
-        self.stdout.write('🔑 You can now login with username: admin, password: admin123')
+    def bulk_insert(self, model, objs):
+        # The base manager skips the per-batch bookkeeping of the custom
+        # querysets; handle() refreshes those totals once at the end.
+        for start in range(0, len(objs), self.batch_size):
+            with transaction.atomic():
+                model._base_manager.bulk_create(objs[start:start + self.batch_size])
@@ -0,0 +1,144 @@
+import io
+import logging
+import re
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from erp import urls as erp_urls
+from erp.middleware import execute_wrapper
+
+
+# Filtered variants of the list views, on top of each view's bare URL.
+SCENARIOS = {
+    'erp:products': ['?status=active', '?stock=out', '?search=shirt'],
+    'erp:customers': ['?status=active', '?search=smith', '?segment=champions'],
+    'erp:orders': ['?status=pending', '?search=smith'],
+    'erp:inventory': ['?low_stock=1'],
+    'erp:transactions': ['?type=sale', '?search=sale'],
+    'admin:erp_order_changelist': ['?status__exact=pending'],
+    'admin:erp_transaction_changelist': ['?transaction_type__exact=sale'],
+}
+
+# Lookup tables small enough that a full scan is the right plan.
+SMALL_TABLES = {
+    'erp_category', 'erp_brand', 'erp_size', 'erp_color', 'erp_supplier', 'erp_cacheversion',
+    'auth_user', 'auth_group', 'auth_permission', 'django_session', 'django_content_type',
+    'django_admin_log', 'auth_user_groups', 'auth_user_user_permissions',
+}
+
+SQLITE_SCAN_RE = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+# Subqueries SQLite runs as co-routines or materializes; scanning those is
+# scanning an intermediate result, not a table.
+SQLITE_SUBQUERY_RE = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\w+)')
+POSTGRES_SCAN_RE = re.compile(r'Seq Scan on (\w+)')
+# Sorted on the primary key alone (API pages, admin changelists): SQLite
+# walks the rowid in order and stops at the page's LIMIT, which the admin
+# only leaves out when the whole table fits on one page. values() queries
+# sort on the column position instead, so "1" counts when that column is
+# the primary key.
+PK_ORDER_RE = re.compile(r'^SELECT (?:"(\w+)"\."id"[, ].*ORDER BY 1|.*ORDER BY "(\w+)"\."id") (?:ASC|DESC)(?: LIMIT \d+)?$',
+                         re.DOTALL)
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the queries of every ERP view and admin changelist and flag full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float,
+                            help='Run against a throwaway test database filled by create_sample_data --scale')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--allow', action='append', default=[],
+                            help='Table allowed to be scanned in full (repeatable)')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not just the flagged ones')
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        logging.getLogger('erp.performance').setLevel(logging.CRITICAL)
+        old_name = None
+        try:
+            if options['scale'] is not None:
+                old_name = connection.settings_dict['NAME']
+                connection.creation.create_test_db(verbosity=0, autoclobber=True)
+                call_command('create_sample_data', scale=options['scale'], seed=options['seed'],
+                             stdout=io.StringIO())
+                # Plans depend on table statistics; give the planner some.
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            queries = self.capture()
+            flagged = self.explain(queries, SMALL_TABLES | set(options['allow']), options['verbose_plans'])
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if flagged:
+            raise CommandError(f'{flagged} quer{"y" if flagged == 1 else "ies"} scan a table without an index')
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(queries)} distinct queries, no unindexed scans'))
+
+    def targets(self):
+        targets = ['erp:' + pattern.name for pattern in erp_urls.urlpatterns]
+        for model in admin.site._registry:
+            opts = model._meta
+            if opts.app_label == 'erp':
+                targets.append(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+        for name in targets:
+            url = reverse(name)
+            yield name, url
+            for query_string in SCENARIOS.get(name, []):
+                yield name, url + query_string
+
+    def capture(self):
+        """
+        Request every target and collect the distinct SELECTs it runs, on
+        any database or thread, with the first URL and database that ran each.
+        """
+        queries = {}
+
+        def collect(execute, sql, params, many, context):
+            if not many and sql.lstrip().upper().startswith('SELECT'):
+                queries.setdefault(sql, (params, current, context['connection'].alias))
+            return execute(sql, params, many, context)
+
+        user, _ = User.objects.get_or_create(username='explain-views', defaults={'is_staff': True, 'is_superuser': True})
+        client = Client()
+        client.force_login(user)
+        for name, current in self.targets():
+            with execute_wrapper(collect):
+                response = client.get(current)
+            if response.status_code != 200:
+                raise CommandError(f'{current} returned {response.status_code}')
+        return queries
+
+    def explain(self, queries, allowed, verbose):
+        flagged = 0
+        for sql, (params, url, alias) in queries.items():
+            with connections[alias].cursor() as cursor:
+                if connections[alias].vendor == 'sqlite':
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                    plan = [row[3] for row in cursor.fetchall()]
+                    subqueries = {m.group(1) for m in map(SQLITE_SUBQUERY_RE.match, plan) if m}
+                    scans = [m.group(1) for m in map(SQLITE_SCAN_RE.match, plan)
+                             if m and m.group(1) not in subqueries and not m.group(1).startswith('sqlite_')]
+                    pk_ordered = PK_ORDER_RE.match(sql)
+                    if pk_ordered and not any('TEMP B-TREE FOR ORDER BY' in line for line in plan):
+                        ordered = pk_ordered.group(1) or pk_ordered.group(2)
+                        scans = [table for table in scans if table != ordered]
+                else:
+                    cursor.execute('EXPLAIN ' + sql, params)
+                    plan = [row[0] for row in cursor.fetchall()]
+                    scans = [m.group(1) for line in plan for m in POSTGRES_SCAN_RE.finditer(line)]
+            bad = [table for table in scans if table not in allowed]
+            if bad or verbose:
+                style = self.style.ERROR if bad else self.style.NOTICE
+                self.stdout.write(style(f"{url}: {'full scan of ' + ', '.join(bad) if bad else 'ok'}"))
+                self.stdout.write(f'  {sql[:300]}')
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+            flagged += bool(bad)
+        return flagged
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from erp import imports
+
+
+class Command(BaseCommand):
+    help = 'Bulk-import products, variants or a stock take from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(imports.IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without writing anything')
+        parser.add_argument('--batch-size', type=int, default=imports.BATCH_SIZE)
+        parser.add_argument('--max-errors', type=int, default=50, help='How many row errors to print')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+            try:
+                result = imports.import_file(stream, options['kind'], options['dry_run'], options['batch_size'])
+            except imports.StockTakeConflict as error:
+                raise CommandError(f'Nothing imported: {error}')
+        for line, message in result.errors[:options['max_errors']]:
+            self.stderr.write(f'line {line}: {message}')
+        if len(result.errors) > options['max_errors']:
+            self.stderr.write(f"... and {len(result.errors) - options['max_errors']} more")
+        summary = f'{result} in {time.perf_counter() - started:.2f}s'
+        if not result.ok:
+            raise CommandError(f'Nothing imported. {summary}')
+        self.stdout.write(self.style.SUCCESS(('Dry run: ' if options['dry_run'] else '✅ ') + summary))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from erp import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for products, customers, orders and transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entity', action='append', choices=sorted(search.ENTITIES),
+                            help='Only rebuild this entity (can be repeated)')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not search.is_supported(using):
+            raise CommandError('The search index needs an SQLite database with FTS5.')
+
+        for entity in options['entity'] or search.ENTITIES:
+            with transaction.atomic(using=using):
+                count = search.rebuild(entity, batch_size=options['batch_size'], using=using)
+            self.stdout.write(f'Indexed {count} {entity} records')
+
+        search.optimize(using)
+        self.stdout.write(self.style.SUCCESS('✅ Search index rebuilt'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from erp.models import Customer
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored lifetime order aggregates on every customer'
+
+    def handle(self, *args, **options):
+        updated = Customer.objects.all().refresh_order_totals()
+        self.stdout.write(self.style.SUCCESS(f'✅ Recomputed order totals for {updated} customers'))
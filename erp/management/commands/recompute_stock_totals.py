@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from erp.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Recompute Product.total_stock and Product.variant_count from the variants'
+
+    def handle(self, *args, **options):
+        updated = Product.objects.all().refresh_stock_totals()
+        self.stdout.write(self.style.SUCCESS(f'✅ Recomputed stock totals for {updated} products'))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from erp import reporting
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary database into the read-only reporting snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Keep running and refresh every this many seconds')
+
+    def handle(self, *args, **options):
+        if reporting.snapshot_path() is None:
+            raise CommandError('The reporting database is not configured as a SQLite snapshot')
+        while True:
+            started = time.perf_counter()
+            path = reporting.refresh_snapshot()
+            self.stdout.write(f'Refreshed {path} in {time.perf_counter() - started:.2f}s')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
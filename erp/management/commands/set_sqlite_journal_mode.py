@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from erp.sqlite import set_journal_mode
+
+
+class Command(BaseCommand):
+    help = 'Set the journal mode (ERP_SQLITE_JOURNAL_MODE) of the SQLite database file; run once per deploy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--mode', help='Journal mode to set instead of the ERP_SQLITE_JOURNAL_MODE setting')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"{options['database']} is not an SQLite database")
+        try:
+            mode = set_journal_mode(connection, options['mode'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        self.stdout.write(self.style.SUCCESS(f"✅ {options['database']} journal mode: {mode}"))
@@ -0,0 +1,92 @@
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from . import concurrency
+from .models import Customer, Order, Product, ProductVariant, Transaction
+from .versions import version_token
+
+
+SNAPSHOT_MODELS = ('erp.order', 'erp.transaction', 'erp.customer', 'erp.product', 'erp.productvariant')
+SNAPSHOT_TIMEOUT = 60 * 60
+
+
+def month_start(now=None):
+    now = now or timezone.now()
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def transaction_totals(since):
+    return Transaction.objects.filter(created_at__gte=since).aggregate(
+        total_sales=Sum('amount', filter=Q(transaction_type='sale')),
+        total_expenses=Sum('amount', filter=Q(transaction_type__in=['purchase', 'expense'])),
+    )
+
+
+def order_counts(since):
+    return Order.objects.filter(Q(created_at__gte=since) | Q(status='pending')).aggregate(
+        total_orders=Count('id', filter=Q(created_at__gte=since)),
+        pending_orders=Count('id', filter=Q(status='pending')),
+        completed_orders=Count('id', filter=Q(status='completed', created_at__gte=since)),
+    )
+
+
+def customer_counts(since):
+    return Customer.objects.aggregate(
+        total_customers=Count('id', filter=Q(is_active=True)),
+        new_customers=Count('id', filter=Q(created_at__gte=since)),
+    )
+
+
+def product_counts(since):
+    return {
+        'total_products': Product.objects.filter(is_active=True).count(),
+    }
+
+
+def low_stock_counts(since):
+    return {
+        'low_stock_count': ProductVariant.objects.filter(low_stock=True).count(),
+    }
+
+
+# Independent queries, run concurrently by acompute_dashboard_metrics.
+METRIC_QUERIES = (transaction_totals, order_counts, customer_counts, product_counts, low_stock_counts)
+
+
+def combine_metrics(parts):
+    metrics = {}
+    for part in parts:
+        metrics.update(part)
+    metrics['total_sales'] = metrics['total_sales'] or 0
+    metrics['total_expenses'] = metrics['total_expenses'] or 0
+    metrics['total_profit'] = metrics['total_sales'] - metrics['total_expenses']
+    return metrics
+
+
+async def acompute_dashboard_metrics(since):
+    """Dashboard counters in five conditional-aggregate queries, running at once on the query pool."""
+    return combine_metrics(await concurrency.gather(*[(query, since) for query in METRIC_QUERIES]))
+
+
+def snapshot_key(since, token):
+    return 'dashboard-metrics:%s:%s' % (since.date().isoformat(), token)
+
+
+async def aget_dashboard_metrics(token=None):
+    """
+    Return the dashboard counters from the cached snapshot. The snapshot is
+    keyed on the current month and the versions of the models it reads,
+    which are bumped from save/delete signals, so any committed change
+    invalidates it and the next request rebuilds it once. Callers that have
+    just read the version token can pass it in.
+    """
+    since = month_start()
+    if token is None:
+        token = await concurrency.run(version_token, *SNAPSHOT_MODELS)
+    key = snapshot_key(since, token)
+    metrics = await cache.aget(key)
+    if metrics is None:
+        metrics = await acompute_dashboard_metrics(since)
+        await cache.aset(key, metrics, SNAPSHOT_TIMEOUT)
+    return metrics
@@ -0,0 +1,181 @@
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+import traceback
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import fragments, templating
+
+
+logger = logging.getLogger('erp.performance')
+slow_sql_logger = logging.getLogger('erp.performance.slow_sql')
+
+_query_timer = contextvars.ContextVar('erp_query_timer', default=None)
+
+
+def query_origin():
+    """The innermost stack frame that belongs to this project rather than Django or a library."""
+    base = str(settings.BASE_DIR)
+    here = str(Path(__file__))
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(base) and frame.filename != here and 'site-packages' not in frame.filename:
+            return f'{Path(frame.filename).relative_to(base)}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+class QueryTimer:
+    """
+    connection.execute_wrapper that counts queries and sums their time.
+    Works with DEBUG=False, unlike connection.queries.
+    """
+
+    def __init__(self, slow_ms=None, parent=None):
+        self.count = 0
+        self.seconds = 0.0
+        self.slow_ms = slow_ms
+        # An enclosing execute wrapper (see execute_wrapper) sees the same queries.
+        self.parent = parent
+        # Queries of one request may run on several threads (erp.concurrency).
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.parent is not None:
+            execute = functools.partial(self.parent, execute)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.seconds += elapsed
+                self.count += 1
+            if self.slow_ms is not None and elapsed * 1000 >= self.slow_ms:
+                slow_sql_logger.warning(json.dumps({
+                    'duration_ms': round(elapsed * 1000, 2),
+                    'database': context['connection'].alias,
+                    'origin': query_origin(),
+                    'sql': sql[:2000],
+                    'many': many,
+                }))
+
+
+@contextlib.contextmanager
+def execute_wrapper(wrapper):
+    """
+    Like connection.execute_wrapper(), but for every query run in this
+    context: on any database, and on the threads the context is copied to.
+    Requests the middleware times inside the block go through both.
+    """
+    token = _query_timer.set(wrapper)
+    try:
+        yield wrapper
+    finally:
+        _query_timer.reset(token)
+
+
+def _timed_execute(execute, sql, params, many, context):
+    timer = _query_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    connection_created receiver adding a permanent execute wrapper that
+    times the connection's queries for whichever request is running in the
+    current context. Connections are per thread, so this also counts the
+    queries a request runs in sync_to_async threads or the query pool.
+    """
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+class RequestTimingMiddleware:
+    """
+    Measure every request: SQL query count and time (on all databases and
+    threads), template render time and the time spent below this
+    middleware. The figures go out in a ``Server-Timing`` header and as one
+    JSON log line on the ``erp.performance`` logger; queries slower than
+    ``ERP_SLOW_QUERY_MS`` are logged with the project line that issued them.
+    The log line also counts the request's fragment cache hits and misses.
+
+    Template time is recorded by the erp.templating backend and includes
+    queries run while rendering, since list pages fetch their rows lazily
+    from the template. Query time is summed over threads, so it can exceed
+    the view time when queries run concurrently. A streamed body (CSV
+    exports, event streams) is produced after the response has left this
+    middleware, so its queries are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'ERP_SLOW_QUERY_MS', None)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer, counters, tokens = self.start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.reset(tokens)
+        return self.finish(request, response, timer, counters, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        timer, counters, tokens = self.start()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.reset(tokens)
+        return self.finish(request, response, timer, counters, time.perf_counter() - started)
+
+    def start(self):
+        timer = QueryTimer(self.slow_ms, parent=_query_timer.get())
+        templates = {'seconds': 0.0, 'depth': 0}
+        cached = Counter()
+        tokens = (_query_timer.set(timer), templating.render_timer.set(templates), fragments.request_counts.set(cached))
+        return timer, (templates, cached), tokens
+
+    def reset(self, tokens):
+        query_token, template_token, fragment_token = tokens
+        _query_timer.reset(query_token)
+        templating.render_timer.reset(template_token)
+        fragments.request_counts.reset(fragment_token)
+
+    def finish(self, request, response, timer, counters, total):
+        templates, cached = counters
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timer.seconds * 1000:.1f};desc="{timer.count} queries"',
+            f'tpl;dur={templates["seconds"] * 1000:.1f}',
+            f'view;dur={total * 1000:.1f}',
+        ])
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': timer.count,
+            'db_ms': round(timer.seconds * 1000, 2),
+            'template_ms': round(templates['seconds'] * 1000, 2),
+            'view_ms': round(total * 1000, 2),
+            'fragment_hits': cached['hit'],
+            'fragment_misses': cached['miss'],
+        }))
+        return response
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS erp_search_index USING fts5("
+        "body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+        # rowid = id << 3 | entity code (1 product, 2 customer, 3 order, 4 transaction)
+        "INSERT INTO erp_search_index (rowid, body) "
+        "SELECT (p.id << 3) | 1, p.name || ' ' || p.sku || ' ' || c.name || ' ' || b.name "
+        "FROM erp_product p JOIN erp_category c ON c.id = p.category_id JOIN erp_brand b ON b.id = p.brand_id",
+        "INSERT INTO erp_search_index (rowid, body) "
+        "SELECT (id << 3) | 2, first_name || ' ' || last_name || ' ' || email || ' ' || phone || ' ' || city "
+        "FROM erp_customer",
+        "INSERT INTO erp_search_index (rowid, body) "
+        "SELECT (o.id << 3) | 3, o.order_number || ' ' || c.first_name || ' ' || c.last_name || ' ' || c.email "
+        "FROM erp_order o JOIN erp_customer c ON c.id = o.customer_id",
+        "INSERT INTO erp_search_index (rowid, body) "
+        "SELECT (t.id << 3) | 4, t.description || ' ' || t.reference || ' ' || COALESCE(o.order_number, '') "
+        "FROM erp_transaction t LEFT JOIN erp_order o ON o.id = t.order_id",
+    ]
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS erp_search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0004_cacheversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
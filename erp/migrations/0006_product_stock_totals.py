@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:34
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_stock_totals(apps, schema_editor):
+    Product = apps.get_model('erp', 'Product')
+    ProductVariant = apps.get_model('erp', 'ProductVariant')
+    variants = ProductVariant.objects.filter(product=OuterRef('pk')).order_by().values('product')
+    Product.objects.update(
+        total_stock=Coalesce(Subquery(variants.annotate(total=Sum('stock_quantity')).values('total')), 0),
+        variant_count=Coalesce(Subquery(variants.annotate(count=Count('pk')).values('count')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='total_stock',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='variant_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_stock_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:35
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def populate_order_totals(apps, schema_editor):
+    Customer = apps.get_model('erp', 'Customer')
+    Order = apps.get_model('erp', 'Order')
+    orders = Order.objects.filter(customer=OuterRef('pk')).order_by().values('customer')
+    Customer.objects.update(
+        order_count=Coalesce(Subquery(orders.annotate(count=Count('pk')).values('count')), 0),
+        total_spent=Coalesce(
+            Subquery(orders.annotate(total=Sum('total_amount', filter=Q(status='completed'))).values('total')),
+            Decimal('0'),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+        first_order_at=Subquery(orders.annotate(first=Min('created_at')).values('first')),
+        last_order_at=Subquery(orders.annotate(last=Max('created_at')).values('last')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0006_product_stock_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='first_order_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='last_order_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='order_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='total_spent',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-total_spent'], name='erp_customer_spent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-last_order_at'], name='erp_customer_last_order_idx'),
+        ),
+        migrations.RunPython(populate_order_totals, migrations.RunPython.noop),
+    ]
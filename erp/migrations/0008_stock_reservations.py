@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:37
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0007_customer_order_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_status',
+            field=models.CharField(choices=[('none', 'Not Reserved'), ('reserved', 'Reserved'), ('committed', 'Committed'), ('released', 'Released')], default='none', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='reserved_quantity',
+            field=models.IntegerField(default=0, editable=False, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservations', to='erp.order')),
+                ('product_variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='erp.productvariant')),
+            ],
+            options={
+                'unique_together': {('order', 'product_variant')},
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, F, Q, Value, When
+
+
+def populate_low_stock(apps, schema_editor):
+    ProductVariant = apps.get_model('erp', 'ProductVariant')
+    ProductVariant.objects.update(
+        low_stock=Case(When(Q(stock_quantity__lte=F('min_stock_level')), then=Value(True)), default=Value(False)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0009_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('enter', 'Became low on stock'), ('leave', 'Back in stock')], max_length=10)),
+                ('stock_quantity', models.IntegerField()),
+                ('min_stock_level', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='productvariant',
+            name='erp_variant_low_stock_idx',
+        ),
+        migrations.AddField(
+            model_name='productvariant',
+            name='low_stock',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(populate_low_stock, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(condition=models.Q(('low_stock', True)), fields=['product'], name='erp_variant_low_flag_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockalert',
+            name='product_variant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='erp.productvariant'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0010_low_stock_flag_and_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyVariantSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('product_variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='erp.productvariant')),
+            ],
+            options={
+                'verbose_name_plural': 'daily variant sales',
+                'constraints': [models.UniqueConstraint(fields=('day', 'product_variant'), name='erp_daily_sales_day_variant_uniq')],
+            },
+        ),
+    ]
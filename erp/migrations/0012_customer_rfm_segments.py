@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp', '0011_daily_variant_sales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='rfm_frequency',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='rfm_monetary',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='rfm_recency',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='rfm_segment',
+            field=models.CharField(blank=True, choices=[('champions', 'Champions'), ('loyal', 'Loyal'), ('potential_loyalist', 'Potential Loyalist'), ('new', 'New'), ('need_attention', 'Need Attention'), ('about_to_sleep', 'About to Sleep'), ('cant_lose', "Can't Lose"), ('at_risk', 'At Risk'), ('hibernating', 'Hibernating'), ('lost', 'Lost')], editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['rfm_segment', '-created_at'], name='erp_customer_segment_idx'),
+        ),
+    ]
@@ -1,8 +1,41 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Max, Min, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.dispatch import Signal
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+import datetime
+
+
+# Sent by the custom querysets after update()/bulk_create()/bulk_update(),
+# which change rows without per-instance post_save signals.
+# Arguments: sender (the model), using, pks (None when not known).
+bulk_changed = Signal()
+
+# Largest number of ids passed to a single ``pk__in`` lookup.
+IN_BATCH_SIZE = 500
+
+
+def chunked(items, size=IN_BATCH_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class LoadedValuesMixin:
+    """
+    Remembers the column values each instance was loaded with (and then
+    saved, see signals.remember_saved_values) in ``_loaded_values``, so
+    signal handlers can see what a save changed.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
 
 class Category(models.Model):
@@ -52,6 +85,16 @@ class Color(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    def refresh_stock_totals(self):
+        """Recompute total_stock and variant_count in a single UPDATE."""
+        variants = ProductVariant.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        return self.update(
+            total_stock=Coalesce(Subquery(variants.annotate(total=Sum('stock_quantity')).values('total')), 0),
+            variant_count=Coalesce(Subquery(variants.annotate(count=Count('pk')).values('count')), 0),
+        )
+
+
 class Product(models.Model):
     name = models.CharField(max_length=200)
     description = models.TextField()
@@ -62,17 +105,25 @@ class Product(models.Model):
     cost_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     image = models.ImageField(upload_to='products/', blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    total_stock = models.IntegerField(default=0, editable=False)
+    variant_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name'], name='erp_product_name_idx'),
+            models.Index(fields=['is_active', 'name'], name='erp_product_active_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
     def get_total_stock(self):
-        return sum(variant.stock_quantity for variant in self.variants.all())
+        return self.total_stock
 
     def get_profit_margin(self):
         if self.cost_price > 0:
@@ -80,18 +131,173 @@ class Product(models.Model):
         return 0
 
 
-class ProductVariant(models.Model):
+def refresh_product_stock(product_ids, using='default'):
+    for batch in chunked(product_ids):
+        Product.objects.using(using).filter(pk__in=batch).refresh_stock_totals()
+
+
+LOW_STOCK = Q(stock_quantity__lte=F('min_stock_level'))
+
+
+def refresh_low_stock(variant_ids, using='default'):
+    """
+    Bring the stored ``low_stock`` flag of these variants in line with their
+    stock and reorder level, and record a StockAlert for each variant that
+    enters or leaves the low-stock set. Costs O(len(variant_ids)), not
+    O(catalog). Returns the alerts.
+    """
+    variants = ProductVariant._base_manager.using(using)
+    alerts = []
+    for batch in chunked(variant_ids):
+        changed = (
+            variants.filter(pk__in=batch)
+            .filter((Q(low_stock=False) & LOW_STOCK) | (Q(low_stock=True) & ~LOW_STOCK))
+            .values_list('pk', 'low_stock', 'stock_quantity', 'min_stock_level')
+        )
+        entering, leaving = [], []
+        for pk, was_low, stock_quantity, min_stock_level in changed:
+            (leaving if was_low else entering).append(pk)
+            alerts.append(StockAlert(
+                product_variant_id=pk,
+                event=StockAlert.LEAVE if was_low else StockAlert.ENTER,
+                stock_quantity=stock_quantity,
+                min_stock_level=min_stock_level,
+            ))
+        if entering:
+            variants.filter(pk__in=entering).update(low_stock=True)
+        if leaving:
+            variants.filter(pk__in=leaving).update(low_stock=False)
+    if alerts:
+        StockAlert.objects.using(using).bulk_create(alerts)
+    return alerts
+
+
+class ParentTotalsQuerySet(models.QuerySet):
+    """
+    Queryset of rows that a parent's stored totals are computed from
+    (variants for Product.total_stock, orders for the Customer totals).
+    update() and bulk_create() refresh the parents of the changed rows,
+    before and after the change, and announce it with bulk_changed;
+    bulk_update() runs each batch as ``filter(pk__in=...).update()``, so it
+    goes through update() too. Only the keys a change needs are read: the distinct
+    parent ids, and the row ids when the parent key or a ``row_fields``
+    field changes, in chunked batches.
+    """
+    # The foreign key to the parent holding the totals.
+    parent_field = None
+    # Changes to these fields move the parent's totals.
+    parent_fields = set()
+    # Changes to these fields need the changed rows' ids (see after_update).
+    row_fields = set()
+
+    def refresh_parents(self, parent_ids):
+        raise NotImplementedError
+
+    def before_update(self, pks, fields):
+        """Called before ``fields`` of rows ``pks`` change; the result is passed to after_update()."""
+        return None
+
+    def after_update(self, pks, fields, state):
+        pass
+
+    def after_create(self, pks):
+        pass
+
+    @property
+    def parent_attname(self):
+        return self.model._meta.get_field(self.parent_field).attname
+
+    @property
+    def parent_keys(self):
+        return {self.parent_field, self.parent_attname}
+
+    def parent_ids(self, pks):
+        """The current parent ids of rows ``pks``."""
+        ids = set()
+        for batch in chunked(pks):
+            ids.update(
+                self.model._base_manager.using(self.db).filter(pk__in=batch).values_list(self.parent_attname, flat=True)
+            )
+        return ids
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            pks = None
+            if (self.parent_keys | self.row_fields).intersection(kwargs):
+                # The update may move the rows out of this queryset's filter.
+                pks = list(self.order_by().values_list('pk', flat=True).iterator(chunk_size=IN_BATCH_SIZE * 10))
+            parent_ids = set()
+            if self.parent_fields.intersection(kwargs):
+                parent_ids.update(
+                    self.order_by().values_list(self.parent_attname, flat=True).distinct()
+                    .iterator(chunk_size=IN_BATCH_SIZE * 10)
+                )
+            state = self.before_update(pks, kwargs)
+            rows = super().update(**kwargs)
+            self.after_update(pks, kwargs, state)
+            if self.parent_fields.intersection(kwargs):
+                if self.parent_keys.intersection(kwargs):
+                    parent_ids |= self.parent_ids(pks)
+                self.refresh_parents(parent_ids)
+            bulk_changed.send(sender=self.model, using=self.db, pks=pks)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            pks = [obj.pk for obj in objs if obj.pk]
+            self.after_create(pks)
+            self.refresh_parents({getattr(obj, self.parent_attname) for obj in objs})
+            bulk_changed.send(sender=self.model, using=self.db, pks=pks)
+        return objs
+
+
+class ProductVariantQuerySet(ParentTotalsQuerySet):
+    # Changes to these fields move Product.total_stock/variant_count.
+    STOCK_FIELDS = {'product', 'product_id', 'stock_quantity'}
+    # Changes to these fields can move a variant in or out of the low-stock set.
+    LOW_STOCK_FIELDS = {'stock_quantity', 'min_stock_level'}
+
+    parent_field = 'product'
+    parent_fields = STOCK_FIELDS
+    row_fields = LOW_STOCK_FIELDS
+
+    def refresh_parents(self, parent_ids):
+        refresh_product_stock(parent_ids, using=self.db)
+
+    def after_update(self, pks, fields, state):
+        if self.LOW_STOCK_FIELDS.intersection(fields):
+            refresh_low_stock(pks, using=self.db)
+
+    def after_create(self, pks):
+        refresh_low_stock(pks, using=self.db)
+
+    def refresh_low_stock_flags(self):
+        """Recompute the stored low_stock flag in a single UPDATE, without alerts (for backfills)."""
+        return models.QuerySet.update(self, low_stock=Case(When(LOW_STOCK, then=Value(True)), default=Value(False)))
+
+
+class ProductVariant(LoadedValuesMixin, models.Model):
     product = models.ForeignKey(Product, related_name='variants', on_delete=models.CASCADE)
     size = models.ForeignKey(Size, on_delete=models.CASCADE)
     color = models.ForeignKey(Color, on_delete=models.CASCADE)
     stock_quantity = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+    reserved_quantity = models.IntegerField(default=0, editable=False, validators=[MinValueValidator(0)])
     min_stock_level = models.IntegerField(default=5, validators=[MinValueValidator(0)])
+    # stock_quantity <= min_stock_level, maintained by refresh_low_stock.
+    low_stock = models.BooleanField(default=False, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductVariantQuerySet.as_manager()
+
     class Meta:
         unique_together = ('product', 'size', 'color')
         ordering = ['product__name', 'size__sort_order', 'color__name']
+        indexes = [
+            # Only the few variants at or below their reorder level.
+            models.Index(fields=['product'], condition=Q(low_stock=True), name='erp_variant_low_flag_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.size} - {self.color}"
@@ -99,14 +305,54 @@ class ProductVariant(models.Model):
     def is_low_stock(self):
         return self.stock_quantity <= self.min_stock_level
 
-
-class Customer(models.Model):
+    @property
+    def available_quantity(self):
+        return self.stock_quantity - self.reserved_quantity
+
+
+class CustomerQuerySet(models.QuerySet):
+    def refresh_order_totals(self):
+        """
+        Recompute the stored lifetime order aggregates in a single UPDATE.
+        The customer lists show them, so the customer cache version is
+        bumped as for any other bulk write.
+        """
+        orders = Order.objects.filter(customer=OuterRef('pk')).order_by().values('customer')
+        rows = self.update(
+            order_count=Coalesce(Subquery(orders.annotate(count=Count('pk')).values('count')), 0),
+            total_spent=Coalesce(
+                Subquery(orders.annotate(total=Sum('total_amount', filter=Q(status='completed'))).values('total')),
+                Decimal('0'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            first_order_at=Subquery(orders.annotate(first=Min('created_at')).values('first')),
+            last_order_at=Subquery(orders.annotate(last=Max('created_at')).values('last')),
+        )
+        bulk_changed.send(sender=self.model, using=self.db, pks=None)
+        return rows
+
+
+class Customer(LoadedValuesMixin, models.Model):
     GENDER_CHOICES = [
         ('M', 'Male'),
         ('F', 'Female'),
         ('O', 'Other'),
     ]
 
+    # Recency/frequency/monetary segments, written by the compute_rfm command.
+    RFM_SEGMENT_CHOICES = [
+        ('champions', 'Champions'),
+        ('loyal', 'Loyal'),
+        ('potential_loyalist', 'Potential Loyalist'),
+        ('new', 'New'),
+        ('need_attention', 'Need Attention'),
+        ('about_to_sleep', 'About to Sleep'),
+        ('cant_lose', "Can't Lose"),
+        ('at_risk', 'At Risk'),
+        ('hibernating', 'Hibernating'),
+        ('lost', 'Lost'),
+    ]
+
     first_name = models.CharField(max_length=50)
     last_name = models.CharField(max_length=50)
     email = models.EmailField(unique=True)
@@ -117,11 +363,30 @@ class Customer(models.Model):
     city = models.CharField(max_length=100)
     postal_code = models.CharField(max_length=20)
     is_active = models.BooleanField(default=True)
+    order_count = models.PositiveIntegerField(default=0, editable=False)
+    total_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    first_order_at = models.DateTimeField(blank=True, null=True, editable=False)
+    last_order_at = models.DateTimeField(blank=True, null=True, editable=False)
+    # Quintile scores, 5 is best; empty until the customer has an order that counts.
+    rfm_recency = models.PositiveSmallIntegerField(blank=True, null=True, editable=False)
+    rfm_frequency = models.PositiveSmallIntegerField(blank=True, null=True, editable=False)
+    rfm_monetary = models.PositiveSmallIntegerField(blank=True, null=True, editable=False)
+    rfm_segment = models.CharField(max_length=20, choices=RFM_SEGMENT_CHOICES, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CustomerQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-total_spent'], name='erp_customer_spent_idx'),
+            models.Index(fields=['-last_order_at'], name='erp_customer_last_order_idx'),
+            models.Index(fields=['-created_at'], name='erp_customer_created_idx'),
+            models.Index(fields=['is_active', '-created_at'], name='erp_customer_active_idx'),
+            models.Index(fields=['city'], name='erp_customer_city_idx'),
+            models.Index(fields=['rfm_segment', '-created_at'], name='erp_customer_segment_idx'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -131,15 +396,41 @@ class Customer(models.Model):
         return f"{self.first_name} {self.last_name}"
 
     def get_total_orders(self):
-        return self.orders.count()
+        return self.order_count
 
     def get_total_spent(self):
-        return self.orders.filter(status='completed').aggregate(
-            total=models.Sum('total_amount')
-        )['total'] or 0
+        return self.total_spent
+
+
+def refresh_customer_totals(customer_ids, using='default'):
+    for batch in chunked(customer_ids):
+        Customer.objects.using(using).filter(pk__in=batch).refresh_order_totals()
+
 
+class OrderQuerySet(ParentTotalsQuerySet):
+    # Changes to these fields move the Customer lifetime aggregates.
+    CUSTOMER_FIELDS = {'customer', 'customer_id', 'status', 'total_amount', 'created_at'}
+    # ... and these the DailyVariantSales rows of the orders' items.
+    SALES_FIELDS = {'status', 'created_at'}
 
-class Order(models.Model):
+    parent_field = 'customer'
+    parent_fields = CUSTOMER_FIELDS
+    row_fields = SALES_FIELDS
+
+    def refresh_parents(self, parent_ids):
+        refresh_customer_totals(parent_ids, using=self.db)
+
+    def before_update(self, pks, fields):
+        if self.SALES_FIELDS.intersection(fields):
+            return order_sales_keys(pks, using=self.db)
+        return None
+
+    def after_update(self, pks, fields, state):
+        if state is not None:
+            refresh_daily_sales(state | order_sales_keys(pks, using=self.db), using=self.db)
+
+
+class Order(LoadedValuesMixin, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('processing', 'Processing'),
@@ -156,10 +447,18 @@ class Order(models.Model):
         ('refunded', 'Refunded'),
     ]
 
+    STOCK_STATUS_CHOICES = [
+        ('none', 'Not Reserved'),
+        ('reserved', 'Reserved'),
+        ('committed', 'Committed'),
+        ('released', 'Released'),
+    ]
+
     order_number = models.CharField(max_length=20, unique=True, blank=True)
     customer = models.ForeignKey(Customer, related_name='orders', on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
+    stock_status = models.CharField(max_length=20, choices=STOCK_STATUS_CHOICES, default='none', editable=False)
     subtotal = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=[MinValueValidator(0)])
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=[MinValueValidator(0)])
@@ -168,8 +467,14 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='erp_order_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='erp_order_status_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.order_number}"
@@ -186,13 +491,57 @@ class Order(models.Model):
         return self.items.aggregate(total=models.Sum('quantity'))['total'] or 0
 
 
-class OrderItem(models.Model):
+class OrderItemQuerySet(models.QuerySet):
+    """
+    update() and bulk_create() keep the DailyVariantSales facts of the
+    changed items; bulk_update() runs each batch as
+    ``filter(pk__in=...).update()``, so it goes through update() too.
+    """
+
+    def daily_sales(self):
+        """These items' totals per order day and variant, leaving out cancelled orders."""
+        return (
+            self.exclude(order__status='cancelled')
+            .annotate(day=TruncDate('order__created_at'))
+            .values('day', 'product_variant_id')
+            .annotate(
+                quantity_sold=Sum('quantity'),
+                revenue=Sum('total_price'),
+                cost=Sum(F('quantity') * F('product_variant__product__cost_price'),
+                         output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+                order_count=Count('order_id', distinct=True),
+            )
+            .order_by()
+        )
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            before = order_item_sales_keys(self.values_list('order_id', 'product_variant_id'), using=self.db)
+            pks = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            after = self.model._base_manager.using(self.db).filter(pk__in=pks).values_list('order_id', 'product_variant_id')
+            refresh_daily_sales(before | order_item_sales_keys(after, using=self.db), using=self.db)
+            bulk_changed.send(sender=self.model, using=self.db, pks=pks)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            items = [(obj.order_id, obj.product_variant_id) for obj in objs]
+            refresh_daily_sales(order_item_sales_keys(items, using=self.db), using=self.db)
+            bulk_changed.send(sender=self.model, using=self.db, pks=[obj.pk for obj in objs if obj.pk])
+        return objs
+
+
+class OrderItem(LoadedValuesMixin, models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     product_variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE)
     quantity = models.IntegerField(validators=[MinValueValidator(1)])
     unit_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     total_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
 
+    objects = OrderItemQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.product_variant} x {self.quantity}"
 
@@ -201,6 +550,103 @@ class OrderItem(models.Model):
         super().save(*args, **kwargs)
 
 
+class DailyVariantSales(models.Model):
+    """
+    Units, revenue and cost sold per variant per day (the order's local
+    date), excluding cancelled orders. Rebuilt for the affected days and
+    variants whenever order items or an order's status or date change, so
+    rankings over any date range read these rows instead of every item.
+    """
+    day = models.DateField()
+    product_variant = models.ForeignKey(ProductVariant, related_name='daily_sales', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # At the product's cost price when the row was last rebuilt.
+    cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'daily variant sales'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product_variant'], name='erp_daily_sales_day_variant_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.product_variant_id} x {self.quantity}"
+
+
+def day_bounds(start, end):
+    """Aware datetimes bounding the local dates ``start`` to ``end`` inclusive."""
+    def aware(day):
+        return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return aware(start), aware(end + datetime.timedelta(days=1))
+
+
+def order_sales_keys(order_ids, using='default'):
+    """The (day, variant id) fact keys the items of ``order_ids`` contribute to."""
+    keys = set()
+    for batch in chunked(order_ids):
+        keys.update(
+            OrderItem.objects.using(using).filter(order_id__in=batch)
+            .annotate(day=TruncDate('order__created_at'))
+            .values_list('day', 'product_variant_id').distinct().order_by()
+        )
+    return keys
+
+
+def order_item_sales_keys(items, using='default'):
+    """The (day, variant id) fact keys of ``(order id, variant id)`` pairs."""
+    items = set(items)
+    days = {}
+    for batch in chunked({order_id for order_id, _ in items}):
+        days.update(
+            Order._base_manager.using(using).filter(pk__in=batch)
+            .annotate(day=TruncDate('created_at')).values_list('pk', 'day')
+        )
+    return {(days[order_id], variant_id) for order_id, variant_id in items if order_id in days}
+
+
+def _sales_facts(items):
+    return [
+        DailyVariantSales(
+            day=row['day'], product_variant_id=row['product_variant_id'], quantity=row['quantity_sold'],
+            revenue=row['revenue'], cost=row['cost'] or 0, order_count=row['order_count'],
+        )
+        for row in items.daily_sales()
+    ]
+
+
+def refresh_daily_sales(keys, using='default'):
+    """Rebuild the DailyVariantSales rows of each (day, variant id) in ``keys``."""
+    variants_by_day = {}
+    for day, variant_id in keys:
+        variants_by_day.setdefault(day, set()).add(variant_id)
+    if not variants_by_day:
+        return
+    facts = DailyVariantSales.objects.using(using)
+    with transaction.atomic(using=using, savepoint=False):
+        for day, variant_ids in variants_by_day.items():
+            start, end = day_bounds(day, day)
+            for batch in chunked(variant_ids):
+                facts.filter(day=day, product_variant_id__in=batch).delete()
+                items = OrderItem.objects.using(using).filter(
+                    order__created_at__gte=start, order__created_at__lt=end, product_variant_id__in=batch,
+                )
+                facts.bulk_create(_sales_facts(items))
+        bulk_changed.send(sender=DailyVariantSales, using=using, pks=[])
+
+
+def rebuild_daily_sales(start, end, using='default'):
+    """Replace every DailyVariantSales row from ``start`` to ``end`` (inclusive); returns the rows written."""
+    lower, upper = day_bounds(start, end)
+    with transaction.atomic(using=using):
+        DailyVariantSales.objects.using(using).filter(day__gte=start, day__lte=end).delete()
+        items = OrderItem.objects.using(using).filter(order__created_at__gte=lower, order__created_at__lt=upper)
+        written = len(DailyVariantSales.objects.using(using).bulk_create(_sales_facts(items), batch_size=IN_BATCH_SIZE))
+        bulk_changed.send(sender=DailyVariantSales, using=using, pks=[])
+    return written
+
+
 class Supplier(models.Model):
     name = models.CharField(max_length=200)
     contact_person = models.CharField(max_length=100)
@@ -236,6 +682,54 @@ class Transaction(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='erp_transaction_created_idx'),
+            models.Index(fields=['transaction_type', '-created_at'], name='erp_transaction_type_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type} - ${self.amount}"
+
+
+class StockReservation(models.Model):
+    order = models.ForeignKey(Order, related_name='stock_reservations', on_delete=models.CASCADE)
+    product_variant = models.ForeignKey(ProductVariant, related_name='reservations', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('order', 'product_variant')
+
+    def __str__(self):
+        return f"{self.order} - {self.product_variant_id} x {self.quantity}"
+
+
+class StockAlert(models.Model):
+    """A variant entering or leaving the low-stock set; streamed to open dashboards."""
+    ENTER = 'enter'
+    LEAVE = 'leave'
+    EVENT_CHOICES = [
+        (ENTER, 'Became low on stock'),
+        (LEAVE, 'Back in stock'),
+    ]
+
+    product_variant = models.ForeignKey(ProductVariant, related_name='stock_alerts', on_delete=models.CASCADE)
+    event = models.CharField(max_length=10, choices=EVENT_CHOICES)
+    stock_quantity = models.IntegerField()
+    min_stock_level = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"{self.product_variant_id} {self.event} ({self.stock_quantity}/{self.min_stock_level})"
+
+
+class CacheVersion(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.transaction_type} - ${self.amount}"
\ No newline at end of file
+        return f"{self.name} v{self.version}"
@@ -0,0 +1,247 @@
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+APPROXIMATE_COUNT_LIMIT = 10000
+# Unfiltered tables estimated above this size skip the exact COUNT(*).
+ESTIMATE_THRESHOLD = 50000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, [_serialize(value) for value in values]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor(token)
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(token)
+    return direction, values
+
+
+def _serialize(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _resolve(obj, path):
+    for attr in path.split('__'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _field(model, path):
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def approximate_count(queryset, limit=APPROXIMATE_COUNT_LIMIT):
+    """
+    Count rows but stop after ``limit`` so the cost stays bounded on big
+    tables. Returns ``(count, is_capped)``.
+    """
+    count = queryset.order_by()[:limit + 1].count()
+    return min(count, limit), count > limit
+
+
+def estimated_row_count(model, using='default'):
+    """
+    Cheap row-count estimate for a whole table: planner statistics where the
+    database keeps them, otherwise the highest primary key.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            if row and row[0] > 0:
+                return row[0]
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                # The first number of each index's stat is its row count;
+                # partial indexes count fewer rows, so take the largest.
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+                counts = [int(row[0].split()[0]) for row in cursor.fetchall()]
+                if counts:
+                    return max(counts)
+    return model._default_manager.using(using).aggregate(top=Max('pk'))['top'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for large admin changelists. An unfiltered table is counted
+    from ``estimated_row_count`` once it is big enough that an exact
+    COUNT(*) would dominate the page; filtered querysets are counted
+    exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate > ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination on a stable sort key. The last key must be unique
+    (normally ``id``/``-id``) so the cursor identifies a single row.
+
+    Unlike OFFSET paging, every page is a bounded range scan starting at the
+    cursor position, so page 1000 costs the same as page 1.
+    """
+
+    def __init__(self, queryset, ordering, per_page=PAGE_SIZE, with_count=False):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.with_count = with_count
+
+    def page(self, cursor=None):
+        direction, values = decode_cursor(cursor) if cursor else ('next', None)
+        if values is not None:
+            values = self.convert(values, cursor)
+        return KeysetPage(self, direction, values)
+
+    def convert(self, values, cursor):
+        """
+        The cursor's values as the sort fields' Python types. A cursor is
+        user input: one that decodes but holds the wrong types is rejected
+        here rather than failing when the page's rows are fetched.
+        """
+        if len(values) != len(self.ordering):
+            raise InvalidCursor(cursor)
+        converted = []
+        for field, value in zip(self.ordering, values):
+            if value is None or isinstance(value, (list, dict)):
+                raise InvalidCursor(cursor)
+            try:
+                converted.append(_field(self.queryset.model, field.lstrip('-')).to_python(value))
+            except (ValueError, TypeError, ValidationError):
+                raise InvalidCursor(cursor)
+        return converted
+
+    def seek(self, queryset, values, direction):
+        """Filter ``queryset`` to rows strictly after (or before) ``values``."""
+        condition = Q()
+        for i, (field, value) in enumerate(zip(self.ordering, values)):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            if direction == 'prev':
+                descending = not descending
+            term = Q(**{'%s__%s' % (name, 'lt' if descending else 'gt'): value})
+            for previous, previous_value in zip(self.ordering[:i], values[:i]):
+                term &= Q(**{previous.lstrip('-'): previous_value})
+            condition |= term
+        return queryset.filter(condition)
+
+    def reversed_ordering(self):
+        return [field[1:] if field.startswith('-') else '-' + field for field in self.ordering]
+
+    def key(self, obj):
+        # Rows of a values() queryset are dicts keyed by the lookup.
+        if isinstance(obj, dict):
+            return [obj[field.lstrip('-')] for field in self.ordering]
+        return [_resolve(obj, field.lstrip('-')) for field in self.ordering]
+
+
+class KeysetPage:
+    """
+    A single page of a ``KeysetPaginator``. Rows are fetched lazily on first
+    access, so a page that is never rendered costs no query.
+    """
+
+    def __init__(self, paginator, direction, values):
+        self.paginator = paginator
+        self.direction = direction
+        self.values = values
+
+    @cached_property
+    def _rows(self):
+        paginator = self.paginator
+        queryset = paginator.queryset
+        if self.direction == 'prev':
+            queryset = queryset.order_by(*paginator.reversed_ordering())
+        else:
+            queryset = queryset.order_by(*paginator.ordering)
+        if self.values is not None:
+            queryset = paginator.seek(queryset, self.values, self.direction)
+        rows = list(queryset[:paginator.per_page + 1])
+        has_more = len(rows) > paginator.per_page
+        rows = rows[:paginator.per_page]
+        if self.direction == 'prev':
+            rows.reverse()
+        return rows, has_more
+
+    @property
+    def object_list(self):
+        return self._rows[0]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        if self.direction == 'prev':
+            return self.values is not None
+        return self._rows[1]
+
+    def has_previous(self):
+        if self.direction == 'prev':
+            return self._rows[1]
+        return self.values is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next() or not self.object_list:
+            return None
+        return encode_cursor('next', self.paginator.key(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous() or not self.object_list:
+            return None
+        return encode_cursor('prev', self.paginator.key(self.object_list[0]))
+
+    @cached_property
+    def approximate_count(self):
+        if not self.paginator.with_count:
+            return None
+        return approximate_count(self.paginator.queryset)
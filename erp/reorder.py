@@ -0,0 +1,77 @@
+import datetime
+import math
+from statistics import NormalDist
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import IN_BATCH_SIZE, DailyVariantSales, ProductVariant, chunked
+
+
+def demand_matrix(variant_ids, start, end):
+    """
+    Units sold per variant per day from ``start`` to ``end`` (inclusive) as
+    a (variants x days) array, rows in ``variant_ids`` order (which must be
+    sorted). Read from the daily sales facts, so cancelled orders do not
+    count and days without sales are zeros.
+    """
+    days = (end - start).days + 1
+    demand = np.zeros((len(variant_ids), days), dtype=np.float64)
+    rows = (
+        DailyVariantSales.objects.filter(day__gte=start, day__lte=end).order_by()
+        .values_list('product_variant_id', 'day', 'quantity')
+    )
+    facts = list(rows.iterator(chunk_size=IN_BATCH_SIZE * 10))
+    if not facts or not len(variant_ids):
+        return demand
+    ids, fact_days, quantities = zip(*facts)
+    ids = np.array(ids, dtype=np.int64)
+    rows_at = np.searchsorted(variant_ids, ids).clip(max=len(variant_ids) - 1)
+    # Facts of variants left out (too new) have no row.
+    found = variant_ids[rows_at] == ids
+    cols_at = np.array([(day - start).days for day in fact_days], dtype=np.int64)
+    np.add.at(demand, (rows_at[found], cols_at[found]), np.array(quantities, dtype=np.float64)[found])
+    return demand
+
+
+def reorder_points(demand, lead_time_days, service_level):
+    """
+    Mean and standard deviation of daily demand per row, and the reorder
+    point covering expected demand over the lead time plus safety stock
+    for the service level: ``mean * L + z * std * sqrt(L)``, rounded up.
+    """
+    mean = demand.mean(axis=1)
+    std = demand.std(axis=1, ddof=1) if demand.shape[1] > 1 else np.zeros(len(demand))
+    z = NormalDist().inv_cdf(service_level)
+    points = np.ceil(mean * lead_time_days + z * std * math.sqrt(lead_time_days) - 1e-9)
+    return mean, std, points.clip(min=0).astype(np.int64)
+
+
+def compute(window_days=56, lead_time_days=7, service_level=0.95, today=None):
+    """
+    Reorder points for every variant with at least ``window_days`` of
+    history, from its daily demand over the last full ``window_days``.
+    Returns (variant ids, current levels, mean, std, new levels) arrays.
+    """
+    end = (today or timezone.localdate()) - datetime.timedelta(days=1)
+    start = end - datetime.timedelta(days=window_days - 1)
+    # Variants created inside the window would look like slow movers.
+    created_before = timezone.make_aware(datetime.datetime.combine(start, datetime.time.min))
+    variants = (
+        ProductVariant.objects.filter(created_at__lt=created_before).order_by('pk')
+        .values_list('pk', 'min_stock_level')
+    )
+    rows = list(variants.iterator(chunk_size=IN_BATCH_SIZE * 10))
+    ids = np.array([pk for pk, _ in rows], dtype=np.int64)
+    current = np.array([level for _, level in rows], dtype=np.int64)
+    mean, std, points = reorder_points(demand_matrix(ids, start, end), lead_time_days, service_level)
+    return ids, current, mean, std, points
+
+
+def save(ids, levels):
+    """Set ``min_stock_level`` on the given variants with bulk_update, which also refreshes their low-stock flags."""
+    variants = [ProductVariant(pk=pk, min_stock_level=level) for pk, level in zip(ids.tolist(), levels.tolist())]
+    with transaction.atomic():
+        for batch in chunked(variants):
+            ProductVariant.objects.bulk_update(batch, ['min_stock_level'])
@@ -0,0 +1,137 @@
+import contextvars
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+
+ALIAS = 'reporting'
+
+# The alias read-only analytic code should read from right now; None means
+# the normal routing (the primary).
+current_alias = contextvars.ContextVar('erp_reporting_alias', default=None)
+
+
+def snapshot_path():
+    """Filesystem path of the SQLite reporting snapshot, or None if it is not a snapshot."""
+    if ALIAS not in connections:
+        return None
+    database = connections[ALIAS].settings_dict
+    if 'sqlite' not in database['ENGINE']:
+        return None
+    name = str(database['NAME'])
+    if name.startswith('file:'):
+        name = name[len('file:'):].split('?', 1)[0]
+    return Path(name)
+
+
+def is_test_mirror():
+    # The test runner points a TEST MIRROR alias at the primary's database.
+    return connections[ALIAS].settings_dict['NAME'] == connections['default'].settings_dict['NAME']
+
+
+def snapshot_age():
+    """Seconds since the snapshot was taken, or None when there is none."""
+    path = snapshot_path()
+    try:
+        return time.time() - path.stat().st_mtime
+    except (AttributeError, OSError):
+        return None
+
+
+def reporting_alias():
+    """
+    The alias to use for a read-only analytic request: the replica when it
+    is configured and fresher than ERP_REPORTING_MAX_STALENESS seconds,
+    otherwise the primary.
+    """
+    if ALIAS not in connections:
+        return 'default'
+    if is_test_mirror() or snapshot_path() is None:
+        return ALIAS
+    max_staleness = getattr(settings, 'ERP_REPORTING_MAX_STALENESS', 0)
+    age = snapshot_age()
+    if age is None or age > max_staleness:
+        return 'default'
+    _close_if_replaced()
+    return ALIAS
+
+
+def _close_if_replaced():
+    # A refresh swaps in a new file; a connection still open on the old one
+    # would keep reading the old snapshot, so reopen it.
+    connection = connections[ALIAS]
+    mtime = snapshot_path().stat().st_mtime
+    if getattr(connection, 'erp_snapshot_mtime', None) != mtime:
+        connection.close()
+        connection.erp_snapshot_mtime = mtime
+
+
+def reopen_if_replaced():
+    """
+    Connections are per thread: a thread that did not pick the alias itself
+    (a query pool worker) checks its own reporting connection here.
+    """
+    if current_alias.get() == ALIAS and snapshot_path() is not None and not is_test_mirror():
+        _close_if_replaced()
+
+
+@contextmanager
+def use_reporting(alias=None):
+    token = current_alias.set(alias or reporting_alias())
+    try:
+        yield current_alias.get()
+    finally:
+        current_alias.reset(token)
+
+
+def reporting_view(view):
+    """Run a read-only view's queries against the reporting database."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            # Picking the alias may close a connection, which Django does
+            # not allow from the event loop.
+            alias = await sync_to_async(reporting_alias)()
+            with use_reporting(alias):
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with use_reporting():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def refresh_snapshot(using='default'):
+    """
+    Copy the primary into the snapshot file with SQLite's online backup API,
+    then swap it in atomically. Readers keep a consistent view throughout:
+    the backup runs in one read transaction on the source, and the old file
+    stays valid until the rename.
+    """
+    path = snapshot_path()
+    if path is None:
+        raise ValueError('The reporting database is not a SQLite snapshot')
+    source = connections[using]
+    source.ensure_connection()
+    temporary = path.with_name(path.name + '.tmp')
+    if temporary.exists():
+        temporary.unlink()
+    target = sqlite3.connect(temporary)
+    try:
+        source.connection.backup(target)
+        # Readers open the snapshot read-only, which needs a rollback
+        # journal rather than WAL.
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target.close()
+    os.replace(temporary, path)
+    return path
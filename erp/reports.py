@@ -0,0 +1,169 @@
+import datetime
+
+from django.db.models import DateField, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Customer, DailyVariantSales, Transaction
+
+
+GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+GRANULARITY_CHOICES = [
+    ('day', 'Daily'),
+    ('week', 'Weekly'),
+    ('month', 'Monthly'),
+]
+LABEL_FORMATS = {
+    'day': '%b %d, %Y',
+    'week': 'Week of %b %d, %Y',
+    'month': '%b %Y',
+}
+MAX_BUCKETS = 1000
+# Typed dates are kept within these, leaving room for the bucket and
+# timezone arithmetic on either side of the range.
+EARLIEST_DAY = datetime.date.min + datetime.timedelta(days=366)
+LATEST_DAY = datetime.date.max - datetime.timedelta(days=366)
+
+# Ranking dimension -> the (id, name) lookups on DailyVariantSales.
+RANKINGS = {
+    'product': ('product_variant__product_id', 'product_variant__product__name'),
+    'category': ('product_variant__product__category_id', 'product_variant__product__category__name'),
+    'brand': ('product_variant__product__brand_id', 'product_variant__product__brand__name'),
+    'size': ('product_variant__size_id', 'product_variant__size__name'),
+    'color': ('product_variant__color_id', 'product_variant__color__name'),
+}
+RANKING_CHOICES = [
+    ('product', 'Product'),
+    ('category', 'Category'),
+    ('brand', 'Brand'),
+    ('size', 'Size'),
+    ('color', 'Color'),
+]
+
+
+def parse_day(value):
+    try:
+        day = parse_date(value or '')
+    except ValueError:
+        return None
+    if day is None:
+        return None
+    return min(max(day, EARLIEST_DAY), LATEST_DAY)
+
+
+def bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, granularity):
+    if granularity == 'week':
+        return day + datetime.timedelta(days=7)
+    if granularity == 'month':
+        return (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return day + datetime.timedelta(days=1)
+
+
+def iter_buckets(start, end, granularity):
+    bucket = bucket_start(start, granularity)
+    while bucket <= end:
+        yield bucket
+        bucket = next_bucket(bucket, granularity)
+
+
+def months_back(day, months):
+    month = day.year * 12 + day.month - 1 - months
+    return datetime.date(month // 12, month % 12 + 1, 1)
+
+
+def clamp_range(start, end, granularity):
+    """Move ``start`` forward so the range holds at most MAX_BUCKETS buckets."""
+    try:
+        if granularity == 'month':
+            earliest = months_back(end, MAX_BUCKETS - 1)
+        elif granularity == 'week':
+            earliest = end - datetime.timedelta(weeks=MAX_BUCKETS - 1)
+        else:
+            earliest = end - datetime.timedelta(days=MAX_BUCKETS - 1)
+    except (OverflowError, ValueError):
+        # The full span would reach before year 1.
+        earliest = EARLIEST_DAY
+    return max(start, earliest, EARLIEST_DAY), end
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def sales_series(start, end, granularity='month'):
+    """
+    Sales, purchases and expenses per bucket between ``start`` and ``end``
+    (inclusive dates) in a single grouped query. Buckets without any
+    transactions are filled with zeros.
+    """
+    trunc = GRANULARITIES[granularity]
+    rows = (
+        Transaction.objects
+        .filter(created_at__gte=_aware(bucket_start(start, granularity)),
+                created_at__lt=_aware(end + datetime.timedelta(days=1)))
+        .annotate(bucket=trunc('created_at', output_field=DateField()))
+        .values('bucket')
+        .annotate(
+            sales=Sum('amount', filter=Q(transaction_type='sale')),
+            purchases=Sum('amount', filter=Q(transaction_type='purchase')),
+            expenses=Sum('amount', filter=Q(transaction_type='expense')),
+        )
+        .order_by('bucket')
+    )
+    totals = {row['bucket']: row for row in rows}
+
+    series = []
+    for bucket in iter_buckets(start, end, granularity):
+        row = totals.get(bucket, {})
+        series.append({
+            'date': bucket.isoformat(),
+            'label': bucket.strftime(LABEL_FORMATS[granularity]),
+            'sales': float(row.get('sales') or 0),
+            'purchases': float(row.get('purchases') or 0),
+            'expenses': float(row.get('expenses') or 0),
+        })
+    return series
+
+
+def sales_ranking(dimension='product', start=None, end=None, limit=10):
+    """
+    Top ``limit`` products, categories, brands, sizes or colors by units
+    sold between ``start`` and ``end`` (inclusive dates, either open), read
+    from the daily sales facts rather than every order item. ``orders``
+    counts an order once per variant it contains.
+    """
+    key, name = RANKINGS[dimension]
+    facts = DailyVariantSales.objects.all()
+    if start:
+        facts = facts.filter(day__gte=start)
+    if end:
+        facts = facts.filter(day__lte=end)
+    return list(
+        facts.values(key)
+        .annotate(id=F(key), name=F(name), total_sold=Sum('quantity'), total_revenue=Sum('revenue'),
+                  total_cost=Sum('cost'), orders=Sum('order_count'))
+        .values('id', 'name', 'total_sold', 'total_revenue', 'total_cost', 'orders')
+        .order_by('-total_sold', 'id')[:limit]
+    )
+
+
+def top_products(limit=10, start=None, end=None):
+    """Best selling products by units sold."""
+    return sales_ranking('product', start, end, limit)
+
+
+def top_customers(limit=10):
+    return list(Customer.objects.filter(total_spent__gt=0).order_by('-total_spent')[:limit])
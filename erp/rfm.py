@@ -0,0 +1,99 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+
+from .models import IN_BATCH_SIZE, Customer, Order, bulk_changed, chunked
+
+
+SCORES = 5
+RFM_FIELDS = ['rfm_recency', 'rfm_frequency', 'rfm_monetary', 'rfm_segment']
+
+# (segment, rule on the recency and frequency score arrays), first match
+# wins. Every (R, F) pair falls in exactly one segment.
+SEGMENT_RULES = [
+    ('champions', lambda r, f: (r >= 4) & (f >= 4)),
+    ('loyal', lambda r, f: (r == 3) & (f >= 4)),
+    ('potential_loyalist', lambda r, f: (r >= 4) & (f >= 2)),
+    ('new', lambda r, f: r >= 4),
+    ('need_attention', lambda r, f: (r == 3) & (f >= 2)),
+    ('about_to_sleep', lambda r, f: r == 3),
+    ('cant_lose', lambda r, f: (r == 1) & (f >= 4)),
+    ('at_risk', lambda r, f: f >= 2),
+    ('hibernating', lambda r, f: r == 2),
+    ('lost', lambda r, f: r == 1),
+]
+
+
+def order_history(chunk_size=10000):
+    """
+    Customer ids and their last order time (epoch seconds), order count and
+    amount ordered as arrays, from one grouped pass over the orders.
+    Cancelled orders do not count.
+    """
+    rows = (
+        Order.objects.exclude(status='cancelled').order_by().values('customer_id')
+        .annotate(last=Max('created_at'), count=Count('id'), spent=Sum('total_amount'))
+        .values_list('customer_id', 'last', 'count', 'spent')
+    )
+    ids, last, count, spent = [], [], [], []
+    for customer_id, last_at, orders, amount in rows.iterator(chunk_size=chunk_size):
+        ids.append(customer_id)
+        last.append(last_at.timestamp())
+        count.append(orders)
+        spent.append(amount)
+    return (np.array(ids, dtype=np.int64), np.array(last, dtype=np.float64),
+            np.array(count, dtype=np.int64), np.array(spent, dtype=np.float64))
+
+
+def quantile_scores(values, scores=SCORES):
+    """
+    Score each value 1..``scores`` by its quantile among ``values``, higher
+    values scoring higher. Ties share the lowest score of their group, so a
+    value only ranks above the values it beats.
+    """
+    if not len(values):
+        return np.zeros(0, dtype=np.int8)
+    below = np.searchsorted(np.sort(values), values, side='left')
+    return np.ceil((below + 1) * scores / len(values)).clip(1, scores).astype(np.int8)
+
+
+def segments(recency, frequency):
+    names = [name for name, _ in SEGMENT_RULES]
+    conditions = [rule(recency, frequency) for _, rule in SEGMENT_RULES]
+    return np.select(conditions, names, default='')
+
+
+def compute():
+    """Customer ids with their recency, frequency and monetary scores and segment."""
+    ids, last, count, spent = order_history()
+    recency, frequency, monetary = quantile_scores(last), quantile_scores(count), quantile_scores(spent)
+    return ids, recency, frequency, monetary, segments(recency, frequency)
+
+
+def save(ids, recency, frequency, monetary, segment, using='default'):
+    """
+    Write the scores back, touching only customers whose scores changed,
+    and clear them on customers no longer scored. There are at most
+    SCORES ** 3 distinct score combinations, so the changed customers are
+    written per combination, in chunked ``UPDATE ... WHERE id IN`` batches,
+    which SQLite runs far faster than a per-row CASE from bulk_update().
+    Returns the number of customers updated.
+    """
+    scored = {
+        pk: (r, f, m, s)
+        for pk, r, f, m, s in zip(ids.tolist(), recency.tolist(), frequency.tolist(), monetary.tolist(), segment.tolist())
+    }
+    changed = {}
+    current = Customer.objects.using(using).order_by().values_list('pk', *RFM_FIELDS)
+    for pk, *values in current.iterator(chunk_size=IN_BATCH_SIZE * 10):
+        new = scored.get(pk, (None, None, None, ''))
+        if tuple(values) != new:
+            changed.setdefault(new, []).append(pk)
+    with transaction.atomic(using=using):
+        for values, pks in changed.items():
+            for batch in chunked(pks):
+                Customer.objects.using(using).filter(pk__in=batch).update(**dict(zip(RFM_FIELDS, values)))
+        pks = [pk for batch in changed.values() for pk in batch]
+        if pks:
+            bulk_changed.send(sender=Customer, using=using, pks=pks)
+    return len(pks)
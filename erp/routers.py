@@ -0,0 +1,23 @@
+from .reporting import ALIAS, current_alias
+
+
+class ReportingRouter:
+    """
+    Send reads made inside ``reporting_view``/``use_reporting`` to the
+    alias chosen for that request; everything else, and every write, goes
+    to the primary. The replica is never migrated: it is a copy.
+    """
+
+    def db_for_read(self, model, **hints):
+        return current_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == ALIAS:
+            return False
+        return None
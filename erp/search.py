@@ -0,0 +1,158 @@
+import re
+
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Customer, Order, Product, Transaction
+
+
+TABLE = 'erp_search_index'
+
+# Each entity shares the one FTS5 table. The rowid packs the object id and
+# the entity code (id << 3 | code) so single rows can be replaced or
+# deleted by rowid without scanning the index.
+ENTITY_BITS = 3
+ENTITIES = {
+    'product': 1,
+    'customer': 2,
+    'order': 3,
+    'transaction': 4,
+}
+MODELS = {
+    'product': Product,
+    'customer': Customer,
+    'order': Order,
+    'transaction': Transaction,
+}
+RELATED = {
+    'product': ('category', 'brand'),
+    'customer': (),
+    'order': ('customer',),
+    'transaction': ('order',),
+}
+
+# Fields of the related object (see RELATED) that each document embeds;
+# changing them means reindexing the documents that embed them.
+EMBEDDED_FIELDS = {
+    'order': ('first_name', 'last_name', 'email'),
+    'transaction': ('order_number',),
+}
+
+MATCH_SQL = (
+    f"SELECT rowid >> {ENTITY_BITS} FROM {TABLE} "
+    f"WHERE {TABLE} MATCH %s AND (rowid & {(1 << ENTITY_BITS) - 1}) = %s"
+)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+DIGIT_RE = re.compile(r'\d')
+
+
+def is_supported(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def rowid(entity, pk):
+    return (pk << ENTITY_BITS) | ENTITIES[entity]
+
+
+def document(entity, obj):
+    if entity == 'product':
+        parts = [obj.name, obj.sku, obj.category.name, obj.brand.name]
+    elif entity == 'customer':
+        parts = [obj.first_name, obj.last_name, obj.email, obj.phone, obj.city]
+    elif entity == 'order':
+        customer = obj.customer
+        parts = [obj.order_number, customer.first_name, customer.last_name, customer.email]
+    else:
+        parts = [obj.description, obj.reference, obj.order.order_number if obj.order_id else '']
+    return ' '.join(part for part in parts if part)
+
+
+def build_query(text):
+    """
+    Turn free text into an FTS5 query where every word must match as a
+    prefix, e.g. ``john.do`` -> ``"john"* "do"*``. Returns None when the
+    text holds no searchable words.
+    """
+    tokens = TOKEN_RE.findall(text or '')
+    if not tokens:
+        return None
+    return ' '.join('"%s"*' % token for token in tokens)
+
+
+def index_objects(entity, objects, using='default'):
+    if not is_supported(using):
+        return
+    rows = [(rowid(entity, obj.pk), document(entity, obj)) for obj in objects]
+    if not rows:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(f"INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)", rows)
+
+
+def remove_objects(entity, pks, using='default'):
+    if not is_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {TABLE} WHERE rowid = %s", [(rowid(entity, pk),) for pk in pks])
+
+
+def reindex_queryset(entity, queryset, batch_size=2000):
+    queryset = queryset.select_related(*RELATED[entity]).order_by('pk')
+    batch = []
+    count = 0
+    for obj in queryset.iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            index_objects(entity, batch, using=queryset.db)
+            count += len(batch)
+            batch = []
+    index_objects(entity, batch, using=queryset.db)
+    return count + len(batch)
+
+
+def rebuild(entity, batch_size=2000, using='default'):
+    if not is_supported(using):
+        return 0
+    # One transaction: in autocommit mode every FTS row would be its own
+    # commit, and readers never see a half-built index.
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE (rowid & {(1 << ENTITY_BITS) - 1}) = %s",
+                [ENTITIES[entity]],
+            )
+        return reindex_queryset(entity, MODELS[entity]._default_manager.using(using), batch_size)
+
+
+def optimize(using='default'):
+    if is_supported(using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+
+def filter_queryset(queryset, entity, text, fallback, substring=None):
+    """
+    Restrict ``queryset`` to rows matching ``text`` through the full-text
+    index. Falls back to the ``fallback`` Q lookup on databases without FTS5.
+
+    The index only matches words by prefix. ``substring`` is a Q lookup on
+    the number-like fields (order numbers, phone numbers) people search by
+    a fragment from the middle; when ``text`` holds a digit, rows matching
+    it are included as well. That lookup scans, so plain-word searches
+    never pay for it.
+
+    Matches keep the queryset's own ordering rather than a relevance rank:
+    the list views page them with keyset cursors on that ordering, and the
+    CSV exports must list the same rows in the same order.
+    """
+    query = build_query(text)
+    if query is None or not is_supported(queryset.db):
+        return queryset.filter(fallback)
+    matches = Q(pk__in=RawSQL(MATCH_SQL, [query, ENTITIES[entity]]))
+    if substring is not None and DIGIT_RE.search(text):
+        matches |= substring
+    return queryset.filter(matches)
+
@@ -0,0 +1,191 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.utils import timezone
+
+from . import middleware, search, sqlite, stock, versions
+from .models import (
+    Brand, Category, Customer, LoadedValuesMixin, Order, OrderItem, OrderQuerySet, Product, ProductVariant,
+    Transaction, bulk_changed,
+    order_item_sales_keys, order_sales_keys, refresh_customer_totals, refresh_daily_sales, refresh_low_stock,
+    refresh_product_stock,
+)
+
+
+SEARCH_ENTITIES = {
+    Product: 'product',
+    Customer: 'customer',
+    Order: 'order',
+    Transaction: 'transaction',
+}
+
+
+def bump_model_version(sender, **kwargs):
+    if kwargs.get('raw'):
+        return
+    versions.bump(versions.model_key(sender))
+
+
+def bump_bulk_model_version(sender, **kwargs):
+    versions.bump(versions.model_key(sender))
+
+
+def embedded_fields_changed(instance, entity, created):
+    """Whether saving ``instance`` changed a field the ``entity`` documents embed."""
+    if created:
+        # Nothing refers to a new row yet.
+        return False
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is None:
+        return True
+    return any(loaded.get(field) != getattr(instance, field) for field in search.EMBEDDED_FIELDS[entity])
+
+
+def index_search_document(sender, instance, raw=False, using='default', created=False, **kwargs):
+    if raw:
+        return
+    search.index_objects(SEARCH_ENTITIES[sender], [instance], using=using)
+    # Documents that embed this object's fields need refreshing too.
+    if sender is Customer and embedded_fields_changed(instance, 'order', created):
+        search.reindex_queryset('order', instance.orders.using(using))
+    elif sender is Order and embedded_fields_changed(instance, 'transaction', created):
+        search.reindex_queryset('transaction', Transaction.objects.using(using).filter(order=instance))
+
+
+def remove_search_document(sender, instance, using='default', **kwargs):
+    search.remove_objects(SEARCH_ENTITIES[sender], [instance.pk], using=using)
+
+
+def reindex_related_products(sender, instance, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    search.reindex_queryset('product', instance.products.using(using))
+
+
+def update_product_stock(sender, instance, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    product_ids = {instance.product_id}
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded and loaded.get('product_id'):
+        product_ids.add(loaded['product_id'])
+    refresh_product_stock(product_ids, using=using)
+
+
+def update_low_stock(sender, instance, raw=False, using='default', update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not {'stock_quantity', 'min_stock_level'}.intersection(update_fields):
+        return
+    refresh_low_stock([instance.pk], using=using)
+    instance.low_stock = instance.is_low_stock()
+
+
+def customer_totals_changed(instance, update_fields):
+    """Whether saving order ``instance`` changed a field its customer's stored totals depend on."""
+    if update_fields is not None and not OrderQuerySet.CUSTOMER_FIELDS.intersection(update_fields):
+        return False
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is None:
+        return True
+    fields = {Order._meta.get_field(name).attname for name in OrderQuerySet.CUSTOMER_FIELDS}
+    return any(loaded.get(field) != getattr(instance, field) for field in fields)
+
+
+def update_customer_totals(sender, instance, raw=False, using='default', created=False, update_fields=None,
+                           **kwargs):
+    # Order.save() writes a new order's number in a second save; that and
+    # edits of other fields (notes, payment status) leave the totals alone.
+    if raw or not (created or customer_totals_changed(instance, update_fields)):
+        return
+    refresh_order_customers(instance, using)
+
+
+def remove_customer_totals(sender, instance, using='default', **kwargs):
+    refresh_order_customers(instance, using)
+
+
+def refresh_order_customers(instance, using):
+    customer_ids = {instance.customer_id}
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded and loaded.get('customer_id'):
+        customer_ids.add(loaded['customer_id'])
+    refresh_customer_totals(customer_ids, using=using)
+
+
+def update_item_sales(sender, instance, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    items = {(instance.order_id, instance.product_variant_id)}
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded and loaded.get('order_id') and loaded.get('product_variant_id'):
+        items.add((loaded['order_id'], loaded['product_variant_id']))
+    refresh_daily_sales(order_item_sales_keys(items, using=using), using=using)
+
+
+def update_order_sales(sender, instance, raw=False, using='default', created=False, **kwargs):
+    # Only cancelling (or un-cancelling) an order or moving its date changes
+    # its items' daily sales; a new order has no items yet.
+    loaded = getattr(instance, '_loaded_values', None)
+    if raw or created or not loaded:
+        return
+    was_cancelled = loaded.get('status') == 'cancelled'
+    if was_cancelled == (instance.status == 'cancelled') and loaded.get('created_at') == instance.created_at:
+        return
+    keys = order_sales_keys([instance.pk], using=using)
+    if loaded.get('created_at') and loaded['created_at'] != instance.created_at:
+        old_day = timezone.localdate(loaded['created_at'])
+        keys |= {(old_day, variant_id) for _, variant_id in keys}
+    refresh_daily_sales(keys, using=using)
+
+
+def remember_saved_values(sender, instance, raw=False, update_fields=None, **kwargs):
+    # The row now holds these values; a later save of the same instance
+    # compares against them.
+    if update_fields is None:
+        fields = [field.attname for field in sender._meta.concrete_fields]
+    else:
+        fields = [sender._meta.get_field(name).attname for name in update_fields]
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    instance._loaded_values = {**loaded, **{field: getattr(instance, field) for field in fields}}
+
+
+def release_order_stock(sender, instance, using='default', **kwargs):
+    # Reservations cascade away with the order; give the stock back first.
+    if instance.stock_status == 'reserved':
+        stock.release(instance, using=using)
+
+
+def connect(app_config):
+    connection_created.connect(sqlite.configure_connection, dispatch_uid='sqlite-profile')
+    connection_created.connect(middleware.install_query_timer, dispatch_uid='request-query-timer')
+
+    for model in app_config.get_models():
+        # The sales facts are only written in bulk; refresh_daily_sales sends
+        # bulk_changed once instead of a signal per row.
+        if model._meta.model_name in ('cacheversion', 'dailyvariantsales'):
+            continue
+        post_save.connect(bump_model_version, sender=model, dispatch_uid=f'bump-{model._meta.label_lower}')
+        post_delete.connect(bump_model_version, sender=model, dispatch_uid=f'bump-delete-{model._meta.label_lower}')
+    bulk_changed.connect(bump_bulk_model_version, dispatch_uid='bump-bulk')
+
+    for model in SEARCH_ENTITIES:
+        post_save.connect(index_search_document, sender=model, dispatch_uid=f'search-{model._meta.label_lower}')
+        post_delete.connect(remove_search_document, sender=model, dispatch_uid=f'search-delete-{model._meta.label_lower}')
+    for model in (Category, Brand):
+        post_save.connect(reindex_related_products, sender=model, dispatch_uid=f'search-{model._meta.label_lower}')
+
+    post_save.connect(update_product_stock, sender=ProductVariant, dispatch_uid='product-stock')
+    post_delete.connect(update_product_stock, sender=ProductVariant, dispatch_uid='product-stock-delete')
+    post_save.connect(update_low_stock, sender=ProductVariant, dispatch_uid='low-stock')
+    pre_delete.connect(release_order_stock, sender=Order, dispatch_uid='release-order-stock')
+    post_save.connect(update_customer_totals, sender=Order, dispatch_uid='customer-totals')
+    post_delete.connect(remove_customer_totals, sender=Order, dispatch_uid='customer-totals-delete')
+    post_save.connect(update_order_sales, sender=Order, dispatch_uid='order-sales')
+    post_save.connect(update_item_sales, sender=OrderItem, dispatch_uid='item-sales')
+    post_delete.connect(update_item_sales, sender=OrderItem, dispatch_uid='item-sales-delete')
+
+    # Connected last: every handler above compares against the values the
+    # instance held before this save.
+    for model in app_config.get_models():
+        if issubclass(model, LoadedValuesMixin):
+            post_save.connect(remember_saved_values, sender=model, dispatch_uid=f'loaded-values-{model._meta.label_lower}')
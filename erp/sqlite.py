@@ -0,0 +1,50 @@
+import re
+
+from django.conf import settings
+
+
+# PRAGMA takes no bound parameters, so only known names and plain values
+# (numbers or keywords such as WAL / NORMAL / MEMORY) are ever sent.
+PRAGMAS = ('journal_mode', 'busy_timeout', 'synchronous', 'mmap_size', 'cache_size', 'temp_store')
+VALUE_RE = re.compile(r'^-?\w+$')
+
+
+def configured_pragmas():
+    """The ERP_SQLITE_PRAGMAS setting without the ones switched off (empty or None)."""
+    pragmas = getattr(settings, 'ERP_SQLITE_PRAGMAS', {})
+    return {name: value for name, value in pragmas.items() if value not in (None, '')}
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        if name not in PRAGMAS or not VALUE_RE.match(str(value)):
+            raise ValueError(f'Unsupported SQLite pragma {name}={value!r}')
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    """
+    connection_created receiver applying the SQLite connection profile.
+    These pragmas only last for the connection; the journal mode is stored
+    in the database file and set by set_journal_mode() instead.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = configured_pragmas()
+    pragmas.pop('journal_mode', None)
+    if connection.is_in_memory_db():
+        pragmas.pop('mmap_size', None)
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas)
+
+
+def set_journal_mode(connection, mode=None):
+    """
+    Switch the database file of ``connection`` to ``mode`` (default: the
+    ERP_SQLITE_JOURNAL_MODE setting) and return the mode SQLite reports.
+    """
+    mode = mode or settings.ERP_SQLITE_JOURNAL_MODE
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, {'journal_mode': mode})
+        cursor.execute('PRAGMA journal_mode')
+        return cursor.fetchone()[0]
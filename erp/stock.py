@@ -0,0 +1,200 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+
+from .models import Order, OrderItem, ProductVariant, StockReservation
+
+
+class StockError(Exception):
+    pass
+
+
+class InsufficientStock(StockError):
+    def __init__(self, shortages=None):
+        # {variant_id: (requested, available)}, filled in once the failed
+        # transaction has rolled back.
+        self.shortages = shortages or {}
+        super().__init__('Not enough stock for %d item(s)' % len(self.shortages) if self.shortages
+                         else 'Not enough stock')
+
+
+class InvalidStockTransition(StockError):
+    pass
+
+
+# Order status -> the stock state the order should end up in.
+RESERVING_STATUSES = ('pending', 'processing')
+COMMITTING_STATUSES = ('shipped', 'delivered', 'completed')
+RELEASING_STATUSES = ('cancelled',)
+
+
+def order_quantities(order, using='default'):
+    rows = (
+        OrderItem.objects.using(using)
+        .filter(order=order)
+        .values('product_variant')
+        .annotate(quantity=Sum('quantity'))
+        .order_by('product_variant')
+    )
+    return {row['product_variant']: row['quantity'] for row in rows}
+
+
+def reserved_quantities(order, using='default'):
+    rows = StockReservation.objects.using(using).filter(order=order).values_list('product_variant', 'quantity')
+    return dict(sorted(rows))
+
+
+def _apply(quantities, guard, changes, using):
+    """
+    Apply a whole order's quantities in one UPDATE. ``guard(qty)`` is the
+    per-variant condition that must hold *at update time* (e.g. enough
+    available stock) and ``changes`` maps a field to +1/-1. If any variant
+    fails its guard the row count comes up short and InsufficientStock is
+    raised, rolling back the caller's transaction.
+    """
+    if not quantities:
+        return
+    condition = Q()
+    for pk, qty in quantities.items():
+        condition |= Q(pk=pk) & guard(qty)
+    values = {
+        field: F(field) + Case(
+            *[When(pk=pk, then=Value(sign * qty)) for pk, qty in quantities.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        for field, sign in changes.items()
+    }
+    updated = ProductVariant.objects.using(using).filter(condition).update(**values)
+    if updated != len(quantities):
+        raise InsufficientStock()
+
+
+def _transition(order, sources, target, using):
+    # The conditional UPDATE doubles as a lock: two workers racing to move
+    # the same order cannot both succeed.
+    moved = Order.objects.using(using).filter(pk=order.pk, stock_status__in=sources).update(stock_status=target)
+    if not moved:
+        raise InvalidStockTransition(f'{order} cannot move to {target!r} stock from its current state')
+    order.stock_status = target
+
+
+def _shortages(quantities, using):
+    available = dict(
+        ProductVariant.objects.using(using)
+        .filter(pk__in=list(quantities))
+        .values_list('pk', F('stock_quantity') - F('reserved_quantity'))
+    )
+    return {
+        pk: (qty, available.get(pk, 0))
+        for pk, qty in quantities.items()
+        if available.get(pk, 0) < qty
+    }
+
+
+def _reserve(order, using):
+    quantities = order_quantities(order, using)
+    _apply(quantities, lambda qty: Q(stock_quantity__gte=F('reserved_quantity') + qty),
+           {'reserved_quantity': 1}, using)
+    StockReservation.objects.using(using).bulk_create([
+        StockReservation(order=order, product_variant_id=pk, quantity=qty)
+        for pk, qty in quantities.items()
+    ])
+    return quantities
+
+
+def _unreserve(order, using, consume):
+    quantities = reserved_quantities(order, using)
+    changes = {'reserved_quantity': -1}
+    if consume:
+        changes['stock_quantity'] = -1
+    _apply(quantities, lambda qty: Q(reserved_quantity__gte=qty, stock_quantity__gte=qty), changes, using)
+    StockReservation.objects.using(using).filter(order=order).delete()
+    return quantities
+
+
+@contextmanager
+def _order_transaction(order, using):
+    """
+    Run a stock operation atomically. On failure the in-memory stock_status
+    is restored, and a shortage is re-raised with the per-variant detail
+    read after the rollback.
+    """
+    previous = order.stock_status
+    try:
+        with transaction.atomic(using=using):
+            yield
+    except InsufficientStock:
+        order.stock_status = previous
+        raise InsufficientStock(_shortages(order_quantities(order, using), using))
+    except BaseException:
+        order.stock_status = previous
+        raise
+
+
+def reserve(order, using='default'):
+    """Hold the order's quantities against available stock."""
+    with _order_transaction(order, using):
+        _transition(order, ('none', 'released'), 'reserved', using)
+        return _reserve(order, using)
+
+
+def commit(order, using='default'):
+    """Turn the order's reservation into a stock decrement."""
+    with _order_transaction(order, using):
+        if order.stock_status in ('none', 'released'):
+            _transition(order, ('none', 'released'), 'reserved', using)
+            _reserve(order, using)
+        _transition(order, ('reserved',), 'committed', using)
+        return _unreserve(order, using, consume=True)
+
+
+def release(order, using='default'):
+    """Give the order's reserved quantities back to available stock."""
+    with _order_transaction(order, using):
+        _transition(order, ('reserved',), 'released', using)
+        return _unreserve(order, using, consume=False)
+
+
+def rereserve(order, using='default'):
+    """Replace a reservation after the order's items changed."""
+    with _order_transaction(order, using):
+        _transition(order, ('reserved',), 'released', using)
+        _unreserve(order, using, consume=False)
+        _transition(order, ('released',), 'reserved', using)
+        return _reserve(order, using)
+
+
+def sync_order(order, items_changed=False, using='default'):
+    """
+    Bring the order's stock state in line with its status: open orders hold
+    a reservation, fulfilled ones consume stock, cancelled ones give their
+    reservation back.
+    """
+    if order.status in RESERVING_STATUSES:
+        if order.stock_status in ('none', 'released'):
+            return reserve(order, using)
+        if order.stock_status == 'reserved' and items_changed:
+            return rereserve(order, using)
+    elif order.status in COMMITTING_STATUSES:
+        if order.stock_status != 'committed':
+            return commit(order, using)
+    elif order.status in RELEASING_STATUSES:
+        if order.stock_status == 'reserved':
+            return release(order, using)
+    return {}
+
+
+def adjust(variant_id, delta, using='default'):
+    """
+    Add ``delta`` to a variant's stock as a single F() update, refusing to
+    drop below what is already reserved.
+    """
+    updated = (
+        ProductVariant.objects.using(using)
+        .filter(pk=variant_id, stock_quantity__gte=F('reserved_quantity') - delta)
+        .update(stock_quantity=F('stock_quantity') + delta)
+    )
+    if not updated:
+        raise InsufficientStock(_shortages({variant_id: -delta}, using))
@@ -0,0 +1,54 @@
+from django.template import Library, Node, TemplateSyntaxError
+
+from erp import fragments
+
+
+register = Library()
+
+
+class FragmentNode(Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        # No version (the view did not supply one): never serve a stale copy.
+        if any(value is None for value in vary_on):
+            return self.nodelist.render(context)
+        cache = fragments.cache()
+        key = fragments.fragment_key(self.name, vary_on)
+        value = cache.get(key)
+        fragments.record(value is not None)
+        if value is None:
+            value = self.nodelist.render(context)
+            cache.set(key, value)
+        return value
+
+
+@register.tag('fragment')
+def do_fragment(parser, token):
+    """
+    Cache a rendered fragment in the ``fragments`` cache, keyed on its name
+    and the values that follow, and count hits and misses::
+
+        {% load erp_fragments %}
+        {% fragment "orders-table" table_version request.GET.urlencode %}
+            ... the whole table ...
+        {% endfragment %}
+
+    For a table the version comes from ``fragments.table_version`` and the
+    query string carries the filters, cursor and page size. The same tag
+    works per row, keyed on what the row shows, e.g.
+    ``{% fragment "order-row" order.pk order.updated_at %}``.
+    """
+    nodelist = parser.parse(('endfragment',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 2:
+        raise TemplateSyntaxError("'%s' tag requires a fragment name." % tokens[0])
+    name = tokens[1]
+    if name[0] in '"\'' and name[-1] == name[0]:
+        name = name[1:-1]
+    return FragmentNode(nodelist, name, [parser.compile_filter(t) for t in tokens[2:]])
@@ -0,0 +1,35 @@
+import contextvars
+import time
+
+from django.template.backends import django as django_backend
+
+
+# {'seconds': ..., 'depth': ...} of the current request, set by the timing middleware.
+render_timer = contextvars.ContextVar('erp_template_timer', default=None)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        timer = render_timer.get()
+        if timer is None:
+            return super().render(context, request)
+        # Nested renders (e.g. {% include %} of a separately loaded template)
+        # are counted once, by the outermost render.
+        timer['depth'] += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timer['depth'] -= 1
+            if not timer['depth']:
+                timer['seconds'] += time.perf_counter() - started
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The Django template backend, with render time recorded for the timing middleware."""
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
@@ -1,3 +1,948 @@
-from django.test import TestCase
+import asyncio
+import base64
+import datetime
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import warnings
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.cache import caches
+from django.db import OperationalError, close_old_connections, connection, connections, router
+from django.db.backends.sqlite3.base import DatabaseWrapper as SqliteDatabaseWrapper
+from django.db.models import Q
+from django.template import engines
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import concurrency, events, imports, metrics, reorder, reporting, rfm, search, sqlite, stock
+from .middleware import QueryTimer, execute_wrapper
+from .filters import filter_customers
+from .models import *
+from .pagination import KeysetPaginator
+
+
+def raw_cursor(direction, values):
+    """A cursor as a client could forge it: any JSON values, encoded the way the paginator does."""
+    payload = json.dumps([direction, values], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def create_catalog(products=3, stock=20):
+    category = Category.objects.create(name='Shirts')
+    brand = Brand.objects.create(name='Acme')
+    size = Size.objects.create(name='M')
+    color = Color.objects.create(name='Blue')
+    variants = []
+    for i in range(products):
+        product = Product.objects.create(
+            name=f'Product {i:02d}', description='', category=category, brand=brand, sku=f'SKU-{i:02d}',
+            price=Decimal('20.00'), cost_price=Decimal('8.00'),
+        )
+        variants.append(ProductVariant.objects.create(product=product, size=size, color=color, stock_quantity=stock,
+                                                      min_stock_level=2))
+    return variants
+
+
+def create_customer(email='ada@example.com', **fields):
+    defaults = {'first_name': 'Ada', 'last_name': 'Lovelace', 'phone': '5550001234', 'address': '1 Main St',
+                'city': 'London', 'postal_code': 'N1'}
+    return Customer.objects.create(email=email, **{**defaults, **fields})
+
+
+def create_order(customer, items=(), status='pending', total=Decimal('0')):
+    order = Order.objects.create(customer=customer, status=status, subtotal=total, total_amount=total)
+    for variant, quantity in items:
+        OrderItem.objects.create(order=order, product_variant=variant, quantity=quantity, unit_price=Decimal('10.00'))
+    return order
+
+
+class ErpTestMixin:
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.user = User.objects.create_superuser('staff', 'staff@example.com', 'password')
+        self.client.force_login(self.user)
+
+
+class ErpTestCase(ErpTestMixin, TestCase):
+    pass
+
+
+class ErpTransactionTestCase(ErpTestMixin, TransactionTestCase):
+    """For views that query from the thread pool, which cannot see a test transaction."""
+    databases = {'default', 'reporting'}
+
+
+class KeysetPaginationTests(ErpTestCase):
+    def test_next_and_previous_round_trip(self):
+        create_catalog(products=7)
+        paginator = KeysetPaginator(Product.objects.all(), ['name', 'id'], per_page=3)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+        self.assertEqual([p.name for p in third], ['Product 06'])
+        self.assertFalse(third.has_next())
+
+        back = paginator.page(third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        self.assertEqual(list(paginator.page(back.previous_cursor)), list(first))
+        self.assertFalse(paginator.page(back.previous_cursor).has_previous())
+
+    def test_descending_datetime_cursor_round_trips(self):
+        customer = create_customer()
+        orders = [create_order(customer) for _ in range(5)]
+        paginator = KeysetPaginator(Order.objects.all(), ['-created_at', '-id'], per_page=2)
+        seen = []
+        page = paginator.page()
+        while True:
+            seen.extend(page)
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+        self.assertEqual([o.pk for o in seen], [o.pk for o in sorted(orders, key=lambda o: (o.created_at, o.pk), reverse=True)])
+
+    def test_cursor_with_wrong_types_falls_back_to_the_first_page(self):
+        create_catalog(products=2)
+        create_order(create_customer())
+        for url in ('/products/', '/orders/', '/customers/', '/inventory/'):
+            for values in (['x', 'y'], [{'a': 1}, 'y'], [['x'], 1], [None, 1], ['x']):
+                response = self.client.get(url, {'cursor': raw_cursor('next', values)})
+                self.assertEqual(response.status_code, 200, (url, values))
+
+    def test_cursor_that_does_not_decode_falls_back_to_the_first_page(self):
+        create_catalog(products=2)
+        response = self.client.get('/products/', {'cursor': 'not-a-cursor!'})
+        self.assertContains(response, 'Product 00')
+
+
+class ApiTests(ErpTestCase):
+    def test_malformed_cursor_is_a_400(self):
+        create_catalog(products=2)
+        create_order(create_customer())
+        for url, values in (
+            ('/api/products/', ['abc']),
+            ('/api/products/', ['x', 'y']),
+            ('/api/orders/', [{'a': 1}, 'y']),
+            ('/api/orders/', ['not a date', 1]),
+            ('/api/customers/', [[1], 2]),
+        ):
+            response = self.client.get(url, {'cursor': raw_cursor('next', values)})
+            self.assertEqual(response.status_code, 400, (url, values))
+            self.assertEqual(response.json(), {'error': 'invalid cursor'})
+
+    def test_cursor_pages_through_every_row_once(self):
+        create_catalog(products=5)
+        ids, cursor = [], None
+        while True:
+            params = {'limit': 2, 'fields': 'id,sku'}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.client.get('/api/products/', params).json()
+            ids.extend(row['id'] for row in body['results'])
+            cursor = body['next']
+            if not cursor:
+                break
+        self.assertEqual(ids, list(Product.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/products/').status_code, 401)
+
+
+class DenormalizedTotalsTests(ErpTestCase):
+    def assertStock(self, product, total_stock, variant_count):
+        product.refresh_from_db()
+        self.assertEqual((product.total_stock, product.variant_count), (total_stock, variant_count))
+
+    def test_variant_save_update_and_bulk_paths_keep_product_stock(self):
+        first, second = create_catalog(products=2, stock=10)
+        self.assertStock(first.product, 10, 1)
+
+        first.stock_quantity = 4
+        first.save()
+        self.assertStock(first.product, 4, 1)
+
+        ProductVariant.objects.filter(pk=first.pk).update(stock_quantity=7)
+        self.assertStock(first.product, 7, 1)
+
+        large = Size.objects.create(name='L')
+        ProductVariant.objects.filter(pk=first.pk).update(product=second.product, size=large)
+        self.assertStock(first.product, 0, 0)
+        self.assertStock(second.product, 17, 2)
+
+        moved = ProductVariant.objects.get(pk=first.pk)
+        moved.product = first.product
+        ProductVariant.objects.bulk_update([moved], ['product'])
+        self.assertStock(first.product, 7, 1)
+        self.assertStock(second.product, 10, 1)
+
+        ProductVariant.objects.bulk_create([
+            ProductVariant(product=first.product, size=first.size, color=first.color, stock_quantity=3),
+        ])
+        self.assertStock(first.product, 10, 2)
+
+    def assertTotals(self, customer, order_count, total_spent):
+        customer.refresh_from_db()
+        self.assertEqual((customer.order_count, customer.total_spent), (order_count, Decimal(total_spent)))
+
+    def test_order_save_update_and_bulk_paths_keep_customer_totals(self):
+        ada, grace = create_customer(), create_customer('grace@example.com', first_name='Grace')
+        order = create_order(ada, status='completed', total=Decimal('30.00'))
+        create_order(ada, status='pending', total=Decimal('5.00'))
+        self.assertTotals(ada, 2, '30.00')
+
+        order.total_amount = Decimal('40.00')
+        order.save()
+        self.assertTotals(ada, 2, '40.00')
+
+        Order.objects.filter(status='pending').update(status='completed')
+        self.assertTotals(ada, 2, '45.00')
+
+        Order.objects.filter(pk=order.pk).update(customer=grace)
+        self.assertTotals(ada, 1, '5.00')
+        self.assertTotals(grace, 1, '40.00')
+
+        order.refresh_from_db()
+        order.customer = ada
+        Order.objects.bulk_update([order], ['customer'])
+        self.assertTotals(ada, 2, '45.00')
+        self.assertTotals(grace, 0, '0.00')
+
+        Order.objects.bulk_create([Order(customer=grace, status='completed', subtotal=Decimal('2.50'),
+                                         total_amount=Decimal('2.50'), order_number='ORD-BULK')])
+        self.assertTotals(grace, 1, '2.50')
+
+        order.delete()
+        self.assertTotals(ada, 1, '5.00')
+
+    def test_order_saves_refresh_the_customer_totals_only_when_they_move(self):
+        customer = create_customer()
+
+        def refreshes():
+            return len([q for q in queries.captured_queries if q['sql'].startswith('UPDATE "erp_customer"')])
+
+        with CaptureQueriesContext(connection) as queries:
+            order = create_order(customer, status='completed', total=Decimal('40.00'))
+        self.assertEqual(refreshes(), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            order.notes = 'Gift wrap'
+            order.save()
+        self.assertEqual(refreshes(), 0)
+
+        for total in ('50.00', '40.00'):
+            order.total_amount = Decimal(total)
+            order.save()
+            self.assertTotals(customer, 1, total)
+
+    def test_order_status_update_moves_the_daily_sales(self):
+        variant, = create_catalog(products=1)
+        order = create_order(create_customer(), items=[(variant, 3)], status='completed')
+        self.assertEqual(DailyVariantSales.objects.get().quantity, 3)
+        Order.objects.filter(pk=order.pk).update(status='cancelled')
+        self.assertFalse(DailyVariantSales.objects.exists())
+        Order.objects.filter(pk=order.pk).update(status='completed')
+        self.assertEqual(DailyVariantSales.objects.get().quantity, 3)
+
+    def test_item_bulk_update_refreshes_the_daily_sales_once(self):
+        variant, = create_catalog(products=1)
+        order = create_order(create_customer(), items=[(variant, 1), (variant, 2)], status='completed')
+        sent = []
+
+        def receiver(sender, **kwargs):
+            sent.append(sender)
+
+        bulk_changed.connect(receiver)
+        self.addCleanup(bulk_changed.disconnect, receiver)
+        items = list(order.items.all())
+        for item in items:
+            item.quantity += 1
+        OrderItem.objects.bulk_update(items, ['quantity'])
+        self.assertEqual(sorted(sender.__name__ for sender in sent), ['DailyVariantSales', 'OrderItem'])
+        self.assertEqual(DailyVariantSales.objects.get().quantity, 5)
+
+    def test_update_of_an_untracked_field_reads_no_rows(self):
+        variant, = create_catalog(products=1)
+        with CaptureQueriesContext(connection) as queries:
+            ProductVariant.objects.filter(pk=variant.pk).update(reserved_quantity=1)
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('SELECT') and 'erp_productvariant' in q['sql']])
+        order = create_order(create_customer())
+        with CaptureQueriesContext(connection) as queries:
+            Order.objects.filter(pk=order.pk).update(notes='Gift wrap')
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('SELECT') and 'erp_order"' in q['sql']])
+
+    def test_low_stock_flag_follows_queryset_updates(self):
+        variant, = create_catalog(products=1, stock=10)
+        ProductVariant.objects.filter(stock_quantity__gt=5).update(stock_quantity=1)
+        variant.refresh_from_db()
+        self.assertTrue(variant.low_stock)
+        self.assertEqual(list(StockAlert.objects.values_list('event', flat=True)), [StockAlert.ENTER])
+
+
+class SearchTests(ErpTestCase):
+    def search(self, entity, text):
+        model = search.MODELS[entity]
+        return list(search.filter_queryset(model.objects.all(), entity, text, Q(pk__in=[])).values_list('pk', flat=True))
+
+    def test_index_follows_saves_and_deletes(self):
+        customer = create_customer()
+        self.assertEqual(self.search('customer', 'lovel'), [customer.pk])
+        customer.last_name = 'Byron'
+        customer.save()
+        self.assertEqual(self.search('customer', 'lovelace'), [])
+        self.assertEqual(self.search('customer', 'byr'), [customer.pk])
+        customer.delete()
+        self.assertEqual(self.search('customer', 'byron'), [])
+
+    def test_renaming_a_customer_reindexes_their_orders(self):
+        customer = create_customer()
+        order = create_order(customer)
+        customer = Customer.objects.get(pk=customer.pk)
+        customer.first_name = 'Augusta'
+        customer.save()
+        self.assertEqual(self.search('order', 'augusta'), [order.pk])
+
+    def test_saving_other_customer_fields_leaves_their_orders_alone(self):
+        customer = create_customer()
+        create_order(customer)
+        customer = Customer.objects.get(pk=customer.pk)
+        customer.city = 'Paris'
+        with CaptureQueriesContext(connection) as queries:
+            customer.save()
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "erp_order"' in q['sql']])
+        self.assertEqual(self.search('customer', 'paris'), [customer.pk])
+
+    def test_number_fragments_match_mid_string(self):
+        customer = create_customer(phone='5550001234')
+        order = create_order(customer)
+        self.assertEqual(list(filter_customers(Customer.objects.all(), {'search': '0001234'})), [customer])
+        self.assertContains(self.client.get('/customers/', {'search': '0001234'}), 'Lovelace')
+        fragment = order.order_number[5:]
+        response = self.client.get('/orders/', {'search': fragment})
+        self.assertContains(response, order.order_number)
+        self.assertNotContains(self.client.get('/orders/', {'search': 'zz' + fragment}), order.order_number)
+
+
+class ImportTests(ErpTestCase):
+    def import_csv(self, kind, text, **options):
+        return imports.import_file(io.StringIO(text), kind, **options)
+
+    def test_products_are_upserted_by_sku(self):
+        Category.objects.create(name='Shirts')
+        Brand.objects.create(name='Acme')
+        header = 'sku,name,category,brand,price,cost_price\n'
+        result = self.import_csv('products', header + 'TEE-1,Tee,shirts,ACME,20,8\nTEE-2,Polo,Shirts,Acme,30,12\n')
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual((result.created, result.updated), (2, 0))
+
+        result = self.import_csv('products', header + 'TEE-1,Long Tee,Shirts,Acme,25,8\nTEE-3,Vest,Shirts,Acme,15,5\n')
+        self.assertEqual((result.created, result.updated), (1, 1))
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(Product.objects.get(sku='TEE-1').price, Decimal('25.00'))
+        self.assertEqual(list(search.filter_queryset(Product.objects.all(), 'product', 'long', Q(pk__in=[]))),
+                         [Product.objects.get(sku='TEE-1')])
+
+    def test_an_invalid_row_writes_nothing(self):
+        Category.objects.create(name='Shirts')
+        Brand.objects.create(name='Acme')
+        result = self.import_csv('products', 'sku,name,category,brand,price,cost_price\n'
+                                             'TEE-1,Tee,Shirts,Acme,20,8\nTEE-2,Polo,Hats,Acme,30,12\n')
+        self.assertEqual(result.errors, [(3, "unknown category 'Hats'")])
+        self.assertFalse(Product.objects.exists())
+
+    def test_variants_and_stock_takes_keep_the_stored_totals(self):
+        variant, = create_catalog(products=1, stock=10)
+        Size.objects.create(name='L')
+        result = self.import_csv('variants', 'sku,size,color,stock_quantity,min_stock_level\n'
+                                             'SKU-00,M,Blue,12,2\nSKU-00,L,Blue,4,5\n')
+        self.assertEqual((result.created, result.updated), (1, 1))
+        product = Product.objects.get()
+        self.assertEqual((product.total_stock, product.variant_count), (16, 2))
+        self.assertTrue(ProductVariant.objects.get(size__name='L').low_stock)
+
+        result = self.import_csv('stock', 'sku,size,color,stock_quantity\nSKU-00,M,Blue,1\nSKU-00,L,Blue,4\n')
+        self.assertEqual((result.updated, result.unchanged), (1, 1))
+        product.refresh_from_db()
+        variant.refresh_from_db()
+        self.assertEqual(product.total_stock, 5)
+        self.assertTrue(variant.low_stock)
+
+    def test_stock_take_below_the_reservations_is_refused(self):
+        variant, = create_catalog(products=1, stock=10)
+        stock.reserve(create_order(create_customer(), items=[(variant, 4)]))
+        result = self.import_csv('stock', 'sku,size,color,stock_quantity\nSKU-00,M,Blue,3\n')
+        self.assertEqual(result.errors, [(2, 'count 3 is below the 4 already reserved')])
+        variant.refresh_from_db()
+        self.assertEqual(variant.stock_quantity, 10)
+
+
+class SegmentationTests(ErpTestCase):
+    def test_quantile_scores(self):
+        self.assertEqual(rfm.quantile_scores(np.array([10, 20, 30, 40, 50])).tolist(), [1, 2, 3, 4, 5])
+        # Ties share the lowest score of their group.
+        self.assertEqual(rfm.quantile_scores(np.array([1, 1, 2])).tolist(), [2, 2, 5])
+        self.assertEqual(len(rfm.quantile_scores(np.array([]))), 0)
+
+    def test_segments(self):
+        recency, frequency = np.array([5, 3, 5, 1, 1, 2]), np.array([5, 5, 1, 5, 1, 1])
+        self.assertEqual(rfm.segments(recency, frequency).tolist(),
+                         ['champions', 'loyal', 'new', 'cant_lose', 'lost', 'hibernating'])
+
+    def test_compute_and_save(self):
+        now = timezone.now()
+        customers = [create_customer(f'c{i}@example.com') for i in range(5)]
+        for i, customer in enumerate(customers):
+            for _ in range(i + 1):
+                order = create_order(customer, status='completed', total=Decimal(10 * (i + 1)))
+                Order.objects.filter(pk=order.pk).update(created_at=now - datetime.timedelta(days=50 - 10 * i))
+        create_order(customers[0], status='cancelled', total=Decimal('1000'))
+        idle = create_customer('idle@example.com')
+
+        ids, recency, frequency, monetary, segment = rfm.compute()
+        self.assertEqual(ids.tolist(), [c.pk for c in customers])
+        self.assertEqual(recency.tolist(), [1, 2, 3, 4, 5])
+        self.assertEqual(frequency.tolist(), [1, 2, 3, 4, 5])
+        self.assertEqual(monetary.tolist(), [1, 2, 3, 4, 5])
+        self.assertEqual(segment.tolist(), ['lost', 'at_risk', 'need_attention', 'champions', 'champions'])
+
+        self.assertEqual(rfm.save(ids, recency, frequency, monetary, segment), 5)
+        self.assertEqual(rfm.save(ids, recency, frequency, monetary, segment), 0)
+        self.assertEqual(Customer.objects.get(pk=customers[4].pk).rfm_segment, 'champions')
+        self.assertEqual(Customer.objects.get(pk=idle.pk).rfm_segment, '')
+
+
+class ReorderTests(ErpTestCase):
+    def test_reorder_points(self):
+        demand = np.array([[2, 2, 2, 2], [0, 4, 0, 4], [0, 0, 0, 0]], dtype=np.float64)
+        mean, std, points = reorder.reorder_points(demand, 7, 0.95)
+        self.assertEqual(mean.tolist(), [2, 2, 0])
+        self.assertEqual(points.tolist(), [14, 25, 0])
+
+    def test_compute_reads_the_daily_sales_and_save_refreshes_the_flags(self):
+        today = timezone.localdate()
+        steady, new = create_catalog(products=2, stock=20)
+        ProductVariant.objects.filter(pk=steady.pk).update(
+            created_at=timezone.now() - datetime.timedelta(days=30))
+        customer = create_customer()
+        for days_ago in (1, 2, 3, 4):
+            order = create_order(customer, items=[(steady, 3)], status='completed')
+            Order.objects.filter(pk=order.pk).update(
+                created_at=timezone.make_aware(datetime.datetime.combine(today - datetime.timedelta(days=days_ago),
+                                                                          datetime.time(12))))
+        create_order(customer, items=[(steady, 50)], status='cancelled')
+
+        ids, current, mean, std, points = reorder.compute(window_days=4, lead_time_days=7, service_level=0.95,
+                                                          today=today)
+        # The variant created inside the window is left out.
+        self.assertEqual(ids.tolist(), [steady.pk])
+        self.assertEqual((mean.tolist(), std.tolist(), points.tolist()), ([3.0], [0.0], [21]))
+
+        reorder.save(ids, points)
+        steady.refresh_from_db()
+        self.assertEqual(steady.min_stock_level, 21)
+        self.assertTrue(steady.low_stock)
+
+
+class LowStockTests(ErpTestCase):
+    def assertLowStock(self, variant, low_stock, events):
+        variant.refresh_from_db()
+        self.assertEqual(variant.low_stock, low_stock)
+        self.assertEqual(
+            list(StockAlert.objects.order_by('id').values_list('event', 'stock_quantity', 'min_stock_level')), events,
+        )
+
+    def test_variants_enter_and_leave_the_low_stock_set_once_per_crossing(self):
+        variant, = create_catalog(products=1, stock=10)
+        self.assertLowStock(variant, False, [])
+
+        variant.stock_quantity = 2
+        variant.save()
+        entered = [(StockAlert.ENTER, 2, 2)]
+        self.assertLowStock(variant, True, entered)
+
+        stock.adjust(variant.pk, -1)
+        self.assertLowStock(variant, True, entered)
+
+        ProductVariant.objects.filter(pk=variant.pk).update(min_stock_level=0)
+        left = entered + [(StockAlert.LEAVE, 1, 0)]
+        self.assertLowStock(variant, False, left)
+
+        variant.min_stock_level = 5
+        variant.save(update_fields=['min_stock_level'])
+        self.assertLowStock(variant, True, left + [(StockAlert.ENTER, 1, 5)])
+
+        variant.stock_quantity = 20
+        ProductVariant.objects.bulk_update([variant], ['stock_quantity'])
+        self.assertLowStock(variant, False, left + [(StockAlert.ENTER, 1, 5), (StockAlert.LEAVE, 20, 5)])
+
+
+class AdminTests(ErpTestCase):
+    def test_every_changelist_loads(self):
+        variant, = create_catalog(products=1, stock=3)
+        customer = create_customer()
+        order = create_order(customer, items=[(variant, 1)], status='completed', total=Decimal('10.00'))
+        Transaction.objects.create(order=order, transaction_type='sale', amount=Decimal('10.00'), description='Sale')
+        ProductVariant.objects.filter(pk=variant.pk).update(stock_quantity=1)
+        self.assertTrue(StockAlert.objects.exists())
+        for model in admin.site._registry:
+            opts = model._meta
+            if opts.app_label != 'erp':
+                continue
+            url = reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+
+    def variant_post(self, variant, **fields):
+        return {'product': variant.product_id, 'size': variant.size_id, 'color': variant.color_id,
+                'stock_quantity': 10, 'initial-stock_quantity': 10, 'min_stock_level': 2, **fields}
+
+    def test_stock_edit_keeps_a_concurrent_adjustment(self):
+        variant, = create_catalog(products=1, stock=10)
+        url = reverse('admin:erp_productvariant_change', args=[variant.pk])
+        self.assertContains(self.client.get(url), 'name="initial-stock_quantity" value="10"')
+
+        stock.adjust(variant.pk, -3)
+        self.client.post(url, self.variant_post(variant, stock_quantity=12))
+        variant.refresh_from_db()
+        self.assertEqual(variant.stock_quantity, 9)
+
+    def test_other_edits_leave_stock_alone(self):
+        variant, = create_catalog(products=1, stock=10)
+        url = reverse('admin:erp_productvariant_change', args=[variant.pk])
+        stock.adjust(variant.pk, -3)
+        self.client.post(url, self.variant_post(variant, min_stock_level=4))
+        variant.refresh_from_db()
+        self.assertEqual((variant.stock_quantity, variant.min_stock_level), (7, 4))
+
+    def test_changelist_edit_keeps_a_concurrent_adjustment(self):
+        variant, = create_catalog(products=1, stock=10)
+        url = reverse('admin:erp_productvariant_changelist')
+        self.assertContains(self.client.get(url), 'name="initial-form-0-stock_quantity"')
+
+        stock.adjust(variant.pk, -3)
+        self.client.post(url, {
+            'form-TOTAL_FORMS': 1, 'form-INITIAL_FORMS': 1, 'form-0-id': variant.pk,
+            'form-0-stock_quantity': 8, 'initial-form-0-stock_quantity': 10, 'form-0-min_stock_level': 2,
+            '_save': 'Save',
+        })
+        variant.refresh_from_db()
+        self.assertEqual(variant.stock_quantity, 5)
+
+    def test_inline_edit_keeps_a_concurrent_adjustment(self):
+        variant, = create_catalog(products=1, stock=10)
+        product = variant.product
+        url = reverse('admin:erp_product_change', args=[product.pk])
+        self.assertContains(self.client.get(url), 'name="initial-variants-0-stock_quantity"')
+
+        stock.adjust(variant.pk, -3)
+        self.client.post(url, {
+            'name': product.name, 'description': 'Soft', 'category': product.category_id,
+            'brand': product.brand_id, 'sku': product.sku, 'price': '20.00', 'cost_price': '8.00',
+            'is_active': 'on',
+            'variants-TOTAL_FORMS': 1, 'variants-INITIAL_FORMS': 1,
+            'variants-0-id': variant.pk, 'variants-0-product': product.pk,
+            'variants-0-size': variant.size_id, 'variants-0-color': variant.color_id,
+            'variants-0-stock_quantity': 15, 'initial-variants-0-stock_quantity': 10,
+            'variants-0-min_stock_level': 2,
+        })
+        variant.refresh_from_db()
+        product.refresh_from_db()
+        self.assertEqual((variant.stock_quantity, product.description), (12, 'Soft'))
+
+
+class ConditionalGetTests(ErpTestCase):
+    def test_unchanged_list_is_a_304(self):
+        create_customer()
+        first = self.client.get('/customers/')
+        again = self.client.get('/customers/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_customer_list_revalidates_when_an_order_moves_the_totals(self):
+        customer = create_customer()
+        first = self.client.get('/customers/')
+        self.assertContains(first, '$0.00')
+
+        create_order(customer, status='completed', total=Decimal('100.00'))
+        customer.refresh_from_db()
+        self.assertEqual((customer.order_count, customer.total_spent), (1, Decimal('100.00')))
+
+        again = self.client.get('/customers/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 200)
+        self.assertContains(again, '$100.00')
+
+    def test_bulk_update_invalidates_the_etag(self):
+        variant, = create_catalog(products=1)
+        first = self.client.get('/inventory/')
+        self.assertEqual(self.client.get('/inventory/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        ProductVariant.objects.filter(pk=variant.pk).update(stock_quantity=7)
+        self.assertEqual(self.client.get('/inventory/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_if_modified_since_is_a_304_until_a_version_bump(self):
+        create_customer()
+        # Last-Modified has one-second resolution: date the current versions
+        # well before the bump below.
+        CacheVersion.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        first = self.client.get('/customers/')
+        since = first['Last-Modified']
+        self.assertEqual(self.client.get('/customers/', HTTP_IF_MODIFIED_SINCE=since).status_code, 304)
+
+        create_customer('grace@example.com', first_name='Grace')
+        again = self.client.get('/customers/', HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(again.status_code, 200)
+        self.assertContains(again, 'grace@example.com')
+
+    def test_large_pages_are_gzipped(self):
+        for number in range(30):
+            create_customer(f'customer{number}@example.com')
+        response = self.client.get('/customers/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_etag_varies_with_the_query_string(self):
+        create_catalog(products=1)
+        first = self.client.get('/products/')
+        other = self.client.get('/products/', {'search': 'Product'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(other.status_code, 200)
+
+
+def get_on_threads(client, url, **params):
+    """GET ``url``; returns the response and the ids of the threads its queries ran on."""
+    threads = set()
+
+    def record(execute, sql, params, many, context):
+        threads.add(threading.get_ident())
+        return execute(sql, params, many, context)
+
+    with execute_wrapper(record):
+        response = client.get(url, params)
+    return response, threads
+
+
+class ReportsTests(ErpTransactionTestCase):
+    def test_dashboard_counters_and_lists_are_fetched_concurrently(self):
+        variant, = create_catalog(products=1, stock=1)
+        order = create_order(create_customer(), items=[(variant, 1)], status='completed', total=Decimal('10.00'))
+        Transaction.objects.create(order=order, transaction_type='sale', amount=Decimal('10.00'), description='Sale')
+
+        response, threads = get_on_threads(self.client, reverse('erp:dashboard'))
+        self.assertEqual(
+            [response.context[name] for name in ('total_customers', 'low_stock_count', 'total_sales')],
+            [1, 1, Decimal('10.00')],
+        )
+        self.assertEqual(len(response.context['recent_transactions']), 1)
+        self.assertEqual([item.pk for item in response.context['low_stock_items']], [variant.pk])
+        self.assertGreater(len(threads), 1)
+
+    def test_reports_aggregates_are_fetched_concurrently(self):
+        variant, = create_catalog(products=1)
+        create_order(create_customer(), items=[(variant, 3)], status='completed', total=Decimal('30.00'))
+
+        response, threads = get_on_threads(self.client, '/reports/', rank='color')
+        self.assertEqual([(row['name'], row['total_sold']) for row in response.context['top_products']],
+                         [('Product 00', 3)])
+        self.assertEqual([(row['name'], row['total_sold']) for row in response.context['ranking']], [('Blue', 3)])
+        self.assertEqual([customer.email for customer in response.context['top_customers']], ['ada@example.com'])
+        self.assertGreater(len(threads), 1)
+
+    def test_dates_at_the_ends_of_the_calendar_are_clamped(self):
+        for params in (
+            {'end': '9999-12-31'},
+            {'start': '0001-01-01', 'end': '0001-01-02', 'granularity': 'week'},
+            {'start': '0001-01-01', 'end': '0001-03-01', 'granularity': 'month'},
+            {'start': '0001-01-01', 'end': '9999-12-31', 'granularity': 'day'},
+        ):
+            self.assertEqual(self.client.get('/reports/', params).status_code, 200, params)
+
+
+class ReportingRoutingTests(ErpTransactionTestCase):
+    def use_snapshot_file(self, directory):
+        """Point the reporting alias at a snapshot file instead of the test mirror, until the test ends."""
+        reporting_connection = connections[reporting.ALIAS]
+        mirror = reporting_connection.settings_dict
+        path = Path(directory) / 'reporting.sqlite3'
+        reporting_connection.settings_dict = {**mirror, 'NAME': f'file:{path}?mode=ro'}
+
+        def restore():
+            reporting_connection.close()
+            reporting_connection.settings_dict = mirror
+
+        self.addCleanup(restore)
+        return path
+
+    def test_router_sends_reads_inside_use_reporting_to_the_replica(self):
+        self.assertEqual(Customer.objects.all().db, 'default')
+        with reporting.use_reporting(reporting.ALIAS):
+            self.assertEqual(Customer.objects.all().db, reporting.ALIAS)
+            self.assertEqual(router.db_for_write(Customer), 'default')
+        self.assertFalse(router.allow_migrate(reporting.ALIAS, 'erp'))
+
+    def test_missing_or_stale_snapshot_falls_back_to_the_primary(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(ERP_REPORTING_MAX_STALENESS=60):
+            path = self.use_snapshot_file(directory)
+            self.assertIsNone(reporting.snapshot_age())
+            self.assertEqual(reporting.reporting_alias(), 'default')
+
+            create_customer()
+            reporting.refresh_snapshot()
+            self.assertEqual(reporting.reporting_alias(), reporting.ALIAS)
+            with reporting.use_reporting():
+                self.assertEqual(list(Customer.objects.values_list('email', flat=True)), ['ada@example.com'])
+
+            an_hour_ago = time.time() - 3600
+            os.utime(path, (an_hour_ago, an_hour_ago))
+            self.assertGreater(reporting.snapshot_age(), 60)
+            self.assertEqual(reporting.reporting_alias(), 'default')
+
+
+class DashboardMetricsTests(ErpTransactionTestCase):
+    def dashboard_metrics(self):
+        """The dashboard counters, and how many queries it took to get them."""
+        with execute_wrapper(QueryTimer()) as timer:
+            result = async_to_sync(metrics.aget_dashboard_metrics)()
+        return result, timer.count
+
+    def test_snapshot_is_rebuilt_only_when_a_version_it_reads_changes(self):
+        create_customer()
+        first, queries = self.dashboard_metrics()
+        self.assertEqual(first['total_customers'], 1)
+        self.assertEqual(queries, 1 + len(metrics.METRIC_QUERIES))
+
+        self.assertEqual(self.dashboard_metrics(), (first, 1))
+        Supplier.objects.create(name='Loom & Co', contact_person='Sam', email='sam@example.com',
+                                phone='5550009999', address='2 Mill Rd', city='Leeds')
+        self.assertEqual(self.dashboard_metrics(), (first, 1))
+
+        create_customer('grace@example.com', first_name='Grace')
+        second, queries = self.dashboard_metrics()
+        self.assertEqual(second['total_customers'], 2)
+        self.assertEqual(queries, 1 + len(metrics.METRIC_QUERIES))
+
+
+class SqliteProfileTests(TestCase):
+    def file_connection(self, directory):
+        settings_dict = {**connection.settings_dict, 'NAME': str(Path(directory) / 'profile.sqlite3')}
+        new = SqliteDatabaseWrapper(settings_dict, alias='profile')
+        self.addCleanup(new.close)
+        return new
+
+    def pragma(self, db, name):
+        with db.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connections_get_the_profile_but_leave_the_journal_mode_alone(self):
+        with tempfile.TemporaryDirectory() as directory:
+            db = self.file_connection(directory)
+            self.assertEqual(
+                [self.pragma(db, name) for name in ('busy_timeout', 'synchronous', 'cache_size', 'temp_store')],
+                [5000, 1, -65536, 2],
+            )
+            self.assertEqual(self.pragma(db, 'journal_mode'), 'delete')
+
+            self.assertEqual(sqlite.set_journal_mode(db), 'wal')
+            self.assertEqual(self.pragma(self.file_connection(directory), 'journal_mode'), 'wal')
+
+
+class RequestTimingTests(ErpTransactionTestCase):
+    def test_queries_on_the_pool_and_the_reporting_database_are_counted(self):
+        create_order(create_customer(), status='completed', total=Decimal('10.00'))
+        for url in (reverse('erp:dashboard'), '/reports/'):
+            with execute_wrapper(QueryTimer()) as timer, CaptureQueriesContext(connection) as this_thread:
+                response = self.client.get(url)
+            logged = int(response['Server-Timing'].split('desc="')[1].split(' ')[0])
+            self.assertEqual(logged, timer.count, url)
+            # Most of these views' queries run on other threads' connections.
+            self.assertGreater(logged, len(this_thread), url)
+
+
+    def test_template_time_is_recorded_by_the_backend(self):
+        create_catalog(products=1)
+        timing = dict(part.strip().split(';', 1) for part in self.client.get('/products/')['Server-Timing'].split(','))
+        self.assertGreater(float(timing['tpl'].split('=')[1]), 0)
+        # Outside a request the backend renders without a timer.
+        self.assertEqual(engines['django'].from_string('{{ value }}').render({'value': 1}), '1')
+
+
+    def test_fragment_cache_hits_and_misses_are_logged(self):
+        create_catalog(products=1)
+        with self.assertLogs('erp.performance', 'INFO') as logs:
+            self.client.get('/products/')
+            self.client.get('/products/')
+        lines = [json.loads(record.getMessage()) for record in logs.records]
+        self.assertEqual([(line['fragment_hits'], line['fragment_misses']) for line in lines], [(0, 1), (1, 0)])
+
+
+def asgi_get(path, cookies):
+    """GET ``path`` through the ASGI handler; returns the ``http.response.*`` messages sent."""
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': [
+            (b'cookie', '; '.join(f'{key}={morsel.value}' for key, morsel in cookies.items()).encode()),
+        ],
+    }
+    messages, requests = [], [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # The client stays connected until the response is sent.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(get_asgi_application()(scope, receive, send))
+    return messages
+
+
+class ExportTests(ErpTransactionTestCase):
+    def test_csv_streams_under_asgi_without_buffering(self):
+        customer = create_customer()
+        for _ in range(3):
+            create_order(customer, status='completed', total=Decimal('12.50'))
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            messages = asgi_get('/orders/export/', self.client.cookies)
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertFalse([w for w in caught if 'consume synchronous iterators' in str(w.message)])
+        body = b''.join(message.get('body', b'') for message in messages[1:]).decode()
+        lines = body.splitlines()
+        self.assertEqual(lines[0].split(',')[0], 'Order number')
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(all(line.endswith(',12.50') for line in lines[1:]))
+
+
+def parse_event(chunk):
+    """The ``event:`` name and decoded ``data:`` of one server-sent event."""
+    fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines() if not line.startswith(':'))
+    return fields.get('event'), json.loads(fields['data']) if 'data' in fields else None
+
+
+class DashboardEventsTests(ErpTransactionTestCase):
+    def test_commits_within_one_poll_coalesce_into_one_update(self):
+        create_customer()
+
+        async def scenario():
+            stream = events.dashboard_events()
+            self.assertTrue((await anext(stream)).startswith('retry:'))
+            name, first = parse_event(await asyncio.wait_for(anext(stream), 5))
+            self.assertEqual((name, first['total_customers']), ('metrics', 1))
+
+            # Right after a poll: all three land before the next one.
+            for number in range(3):
+                await concurrency.run(create_customer, f'customer{number}@example.com')
+            seq = events.broadcaster().seq
+            name, update = parse_event(await asyncio.wait_for(anext(stream), 5))
+            # Only the counters that moved, once, with the final value.
+            self.assertEqual((name, update), ('metrics', {'total_customers': 4, 'new_customers': 4}))
+            self.assertEqual(events.broadcaster().seq, seq + 1)
+            await stream.aclose()
+
+        with self.settings(ERP_SSE_POLL_SECONDS=1):
+            asyncio.run(scenario())
+
+    def test_disconnecting_unsubscribes_and_stops_the_poller(self):
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': reverse('erp:dashboard_stream'), 'query_string': b'',
+            'headers': [(b'cookie', f"sessionid={self.client.cookies['sessionid'].value}".encode())],
+        }
+
+        async def scenario():
+            chunks, first_update = [], asyncio.Event()
+            requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+            async def receive():
+                if requests:
+                    return requests.pop()
+                await first_update.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message.get('body'):
+                    chunks.append(message['body'])
+                # The retry line, then the first counters from the poller.
+                if len(chunks) == 2:
+                    self.assertEqual(events.broadcaster().clients, 1)
+                    first_update.set()
+
+            await asyncio.wait_for(get_asgi_application()(scope, receive, send), 10)
+            hub = events.broadcaster()
+            self.assertEqual((hub.clients, hub.task), (0, None))
+
+        with self.settings(ERP_SSE_POLL_SECONDS=0.1):
+            asyncio.run(scenario())
+
+
+class StockContentionTests(ErpTransactionTestCase):
+    def run_concurrently(self, func, args):
+        """Call ``func(arg)`` for each of ``args`` on its own thread and connection, all at once."""
+        start = threading.Barrier(len(args))
+        outcomes = {}
+
+        def worker(arg):
+            start.wait()
+            try:
+                while True:
+                    try:
+                        outcomes[arg] = func(arg)
+                        break
+                    except OperationalError:
+                        # The in-memory test database locks whole tables
+                        # rather than waiting; try again like a client would.
+                        time.sleep(0.01)
+            except Exception as error:
+                outcomes[arg] = error
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=worker, args=(arg,)) for arg in args]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_reservations_never_oversell(self):
+        variant, = create_catalog(products=1, stock=5)
+        customer = create_customer()
+        orders = [create_order(customer, items=[(variant, 1)]) for _ in range(8)]
+        outcomes = self.run_concurrently(lambda order: stock.reserve(order), orders)
+
+        reserved = [order for order, outcome in outcomes.items() if not isinstance(outcome, Exception)]
+        refused = [outcome for outcome in outcomes.values() if isinstance(outcome, Exception)]
+        self.assertEqual(len(reserved), 5)
+        self.assertTrue(all(isinstance(error, stock.InsufficientStock) for error in refused), refused)
+        variant.refresh_from_db()
+        self.assertEqual((variant.stock_quantity, variant.reserved_quantity), (5, 5))
+        self.assertEqual(StockReservation.objects.count(), 5)
+        self.assertEqual(Order.objects.filter(stock_status='reserved').count(), 5)
+
+    def test_commit_and_release_race_on_one_order(self):
+        variant, = create_catalog(products=1, stock=5)
+        order = create_order(create_customer(), items=[(variant, 2)])
+        stock.reserve(order)
+        # Each worker holds the order as it was loaded, both seeing it reserved.
+        operations = {'commit': stock.commit, 'release': stock.release}
+        loaded = {name: Order.objects.get(pk=order.pk) for name in operations}
+        outcomes = self.run_concurrently(lambda name: operations[name](loaded[name]), list(operations))
+
+        winners = [name for name, outcome in outcomes.items() if not isinstance(outcome, Exception)]
+        self.assertEqual(len(winners), 1, outcomes)
+        loser, = set(operations) - set(winners)
+        self.assertIsInstance(outcomes[loser], stock.InvalidStockTransition)
+        variant.refresh_from_db()
+        expected = (3, 0) if winners == ['commit'] else (5, 0)
+        self.assertEqual((variant.stock_quantity, variant.reserved_quantity), expected)
+        self.assertFalse(StockReservation.objects.exists())
@@ -1,15 +1,26 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'erp'
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
+    path('dashboard/stream/', views.dashboard_stream, name='dashboard_stream'),
     path('products/', views.products, name='products'),
     path('customers/', views.customers, name='customers'),
+    path('customers/export/', views.customers_export, name='customers_export'),
     path('orders/', views.orders, name='orders'),
+    path('orders/export/', views.orders_export, name='orders_export'),
     path('inventory/', views.inventory, name='inventory'),
+    path('inventory/export/', views.inventory_export, name='inventory_export'),
+    path('inventory/alerts/stream/', views.stock_alerts_stream, name='stock_alerts_stream'),
     path('reports/', views.reports, name='reports'),
     path('transactions/', views.transactions, name='transactions'),
+    path('transactions/export/', views.transactions_export, name='transactions_export'),
     path('suppliers/', views.suppliers, name='suppliers'),
+    path('api/products/', api.resource_list, {'resource': 'products'}, name='api_products'),
+    path('api/variants/', api.resource_list, {'resource': 'variants'}, name='api_variants'),
+    path('api/orders/', api.resource_list, {'resource': 'orders'}, name='api_orders'),
+    path('api/customers/', api.resource_list, {'resource': 'customers'}, name='api_customers'),
+    path('api/transactions/', api.resource_list, {'resource': 'transactions'}, name='api_transactions'),
 ]
\ No newline at end of file
@@ -0,0 +1,45 @@
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CacheVersion
+
+
+def model_key(model):
+    return model._meta.label_lower
+
+
+def bump(*names):
+    """
+    Increment the version of each name. Runs inside the caller's transaction,
+    so readers only see the new version once the change itself is committed.
+    """
+    now = timezone.now()
+    for name in names:
+        updated = CacheVersion.objects.filter(name=name).update(version=F('version') + 1, updated_at=now)
+        if not updated:
+            version, created = CacheVersion.objects.get_or_create(name=name, defaults={'version': 1})
+            if not created:
+                CacheVersion.objects.filter(pk=version.pk).update(version=F('version') + 1, updated_at=now)
+
+
+def get_versions(*names):
+    versions = dict.fromkeys(names, 0)
+    versions.update(CacheVersion.objects.filter(name__in=names).values_list('name', 'version'))
+    return versions
+
+
+def version_token(*names):
+    versions = get_versions(*names)
+    return '-'.join(str(versions[name]) for name in names)
+
+
+def version_state(*names):
+    """The version token of ``names`` and when any of them last changed (None if none ever has)."""
+    rows = {
+        name: (version, updated_at)
+        for name, version, updated_at in CacheVersion.objects.filter(name__in=names)
+        .values_list('name', 'version', 'updated_at')
+    }
+    token = '-'.join(str(rows.get(name, (0, None))[0]) for name in names)
+    changed = max((updated_at for _, updated_at in rows.values()), default=None)
+    return token, changed
@@ -1,160 +1,133 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count, Q, Case, When, DecimalField, F
 from django.utils import timezone
-from datetime import timedelta
 from .models import *
+from .metrics import aget_dashboard_metrics
+from .filters import (
+    filter_customers, filter_inventory, filter_orders, filter_products, filter_suppliers, filter_transactions,
+)
+from . import concurrency, events, exports, fragments
+from .exports import stream_csv
+from .conditional import list_conditional
+from .reporting import reporting_view
+from .pagination import InvalidCursor, KeysetPaginator, PAGE_SIZE, MAX_PAGE_SIZE
+from .reports import (
+    GRANULARITIES, GRANULARITY_CHOICES, RANKINGS, RANKING_CHOICES, clamp_range, months_back, parse_day, sales_ranking,
+    sales_series, top_customers, top_products,
+)
+import asyncio
 import json
 
 
-@login_required
-def dashboard(request):
-    current_month = timezone.now().replace(day=1)
-
-    # Financial metrics
-    total_sales = Transaction.objects.filter(
-        transaction_type='sale',
-        created_at__gte=current_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
-
-    total_expenses = Transaction.objects.filter(
-        transaction_type__in=['purchase', 'expense'],
-        created_at__gte=current_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
-
-    total_profit = total_sales - total_expenses
-
-    # Statistics
-    total_orders = Order.objects.filter(created_at__gte=current_month).count()
-    pending_orders = Order.objects.filter(status='pending').count()
-    completed_orders = Order.objects.filter(status='completed', created_at__gte=current_month).count()
-    total_products = Product.objects.filter(is_active=True).count()
-    total_customers = Customer.objects.filter(is_active=True).count()
-    new_customers = Customer.objects.filter(created_at__gte=current_month).count()
-
-    low_stock_count = ProductVariant.objects.filter(
-        stock_quantity__lte=F('min_stock_level')
-    ).count()
+# Models each list page shows: its validators and table fragment follow their versions.
+PRODUCT_TABLE = (Product, Category, Brand, ProductVariant)
+CUSTOMER_TABLE = (Customer,)
+ORDER_TABLE = (Order, Customer)
+INVENTORY_TABLE = (ProductVariant, Product, Category, Size, Color)
+TRANSACTION_TABLE = (Transaction, Order, Customer)
+SUPPLIER_TABLE = (Supplier,)
+
+
+def paginate(request, queryset, ordering):
+    try:
+        per_page = min(max(int(request.GET.get('per_page', PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        per_page = PAGE_SIZE
+    paginator = KeysetPaginator(queryset, ordering, per_page=per_page, with_count=True)
+    try:
+        return paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return paginator.page()
+
 
+@login_required
+@reporting_view
+async def dashboard(request):
     # Recent data
     recent_transactions = Transaction.objects.select_related('order').order_by('-created_at')[:5]
-    low_stock_items = ProductVariant.objects.filter(
-        stock_quantity__lte=F('min_stock_level')
-    ).select_related('product', 'size', 'color')[:5]
+    low_stock_items = ProductVariant.objects.filter(low_stock=True).select_related('product', 'size', 'color')[:5]
+
+    # The counters and both lists are independent: fetch them concurrently.
+    metrics, recent_transactions, low_stock_items = await asyncio.gather(
+        aget_dashboard_metrics(),
+        concurrency.run(list, recent_transactions),
+        concurrency.run(list, low_stock_items),
+    )
 
     context = {
-        'total_sales': total_sales,
-        'total_expenses': total_expenses,
-        'total_profit': total_profit,
-        'total_orders': total_orders,
-        'pending_orders': pending_orders,
-        'completed_orders': completed_orders,
-        'total_products': total_products,
-        'low_stock_count': low_stock_count,
-        'total_customers': total_customers,
-        'new_customers': new_customers,
+        **metrics,
         'recent_transactions': recent_transactions,
         'low_stock_items': low_stock_items,
     }
 
-    return render(request, 'erp/dashboard.html', context)
+    return await sync_to_async(render)(request, 'erp/dashboard.html', context)
 
 
 @login_required
-def products(request):
-    products = Product.objects.select_related('category', 'brand').prefetch_related('variants')
-
-    search = request.GET.get('search')
-    if search:
-        products = products.filter(
-            Q(name__icontains=search) |
-            Q(sku__icontains=search) |
-            Q(category__name__icontains=search) |
-            Q(brand__name__icontains=search)
-        )
-
-    category_id = request.GET.get('category')
-    if category_id:
-        products = products.filter(category_id=category_id)
-
-    status = request.GET.get('status')
-    if status == 'active':
-        products = products.filter(is_active=True)
-    elif status == 'inactive':
-        products = products.filter(is_active=False)
+async def dashboard_stream(request):
+    """Server-sent events with the dashboard's counter changes and low-stock alerts."""
+    return events.event_stream(events.dashboard_events(events.last_event_id(request)))
+
 
+@login_required
+async def stock_alerts_stream(request):
+    """Server-sent events for variants entering or leaving the low-stock set."""
+    return events.event_stream(events.stock_alert_events(events.last_event_id(request)))
+
+
+@login_required
+@list_conditional(*PRODUCT_TABLE)
+def products(request):
+    products = filter_products(Product.objects.select_related('category', 'brand'), request.GET)
     categories = Category.objects.all()
+    page = paginate(request, products, ['name', 'id'])
 
     context = {
-        'products': products,
+        'products': page,
+        'page_obj': page,
+        'table_version': fragments.table_version(*PRODUCT_TABLE),
         'categories': categories,
-        'search': search,
-        'selected_category': category_id,
-        'selected_status': status,
+        'search': request.GET.get('search'),
+        'selected_category': request.GET.get('category'),
+        'selected_status': request.GET.get('status'),
+        'selected_stock': request.GET.get('stock'),
     }
 
     return render(request, 'erp/products.html', context)
 
 
 @login_required
+@list_conditional(*CUSTOMER_TABLE)
 def customers(request):
-    customers = Customer.objects.annotate(
-        order_count=Count('orders'),
-        total_spent=Sum(
-            Case(
-                When(orders__status='completed', then='orders__total_amount'),
-                default=0,
-                output_field=DecimalField(max_digits=10, decimal_places=2)
-            )
-        )
-    ).order_by('-created_at')
-
-    search = request.GET.get('search')
-    if search:
-        customers = customers.filter(
-            Q(first_name__icontains=search) |
-            Q(last_name__icontains=search) |
-            Q(email__icontains=search) |
-            Q(phone__icontains=search) |
-            Q(city__icontains=search)
-        )
-
-    status = request.GET.get('status')
-    if status == 'active':
-        customers = customers.filter(is_active=True)
-    elif status == 'inactive':
-        customers = customers.filter(is_active=False)
+    customers = filter_customers(Customer.objects.order_by('-created_at'), request.GET)
+    page = paginate(request, customers, ['-created_at', '-id'])
 
     context = {
-        'customers': customers,
-        'search': search,
-        'selected_status': status,
+        'customers': page,
+        'page_obj': page,
+        'search': request.GET.get('search'),
+        'selected_status': request.GET.get('status'),
+        'segment_choices': Customer.RFM_SEGMENT_CHOICES,
+        'selected_segment': request.GET.get('segment'),
     }
 
     return render(request, 'erp/customers.html', context)
 
 
 @login_required
+@list_conditional(*ORDER_TABLE)
 def orders(request):
-    orders = Order.objects.select_related('customer').prefetch_related('items__product_variant__product')
-
-    status = request.GET.get('status')
-    if status:
-        orders = orders.filter(status=status)
-
-    search = request.GET.get('search')
-    if search:
-        orders = orders.filter(
-            Q(order_number__icontains=search) |
-            Q(customer__first_name__icontains=search) |
-            Q(customer__last_name__icontains=search) |
-            Q(customer__email__icontains=search)
-        )
+    orders = Order.objects.select_related('customer')
+    orders = filter_orders(orders, request.GET)
+    page = paginate(request, orders, ['-created_at', '-id'])
 
     context = {
-        'orders': orders,
-        'search': search,
-        'selected_status': status,
+        'orders': page,
+        'page_obj': page,
+        'table_version': fragments.table_version(*ORDER_TABLE),
+        'search': request.GET.get('search'),
+        'selected_status': request.GET.get('status'),
         'status_choices': Order.STATUS_CHOICES,
     }
 
@@ -162,99 +135,79 @@ def orders(request):
 
 
 @login_required
+@list_conditional(*INVENTORY_TABLE)
 def inventory(request):
     variants = ProductVariant.objects.select_related('product', 'size', 'color', 'product__category')
-
-    low_stock = request.GET.get('low_stock')
-    if low_stock:
-        variants = variants.filter(stock_quantity__lte=F('min_stock_level'))
-
-    search = request.GET.get('search')
-    if search:
-        variants = variants.filter(
-            Q(product__name__icontains=search) |
-            Q(product__sku__icontains=search) |
-            Q(size__name__icontains=search) |
-            Q(color__name__icontains=search)
-        )
+    variants = filter_inventory(variants, request.GET)
+    page = paginate(request, variants, ['product__name', 'id'])
 
     context = {
-        'variants': variants,
-        'search': search,
-        'low_stock_filter': low_stock,
+        'variants': page,
+        'page_obj': page,
+        'table_version': fragments.table_version(*INVENTORY_TABLE),
+        'search': request.GET.get('search'),
+        'low_stock_filter': request.GET.get('low_stock'),
     }
 
     return render(request, 'erp/inventory.html', context)
 
 
 @login_required
-def reports(request):
-    current_month = timezone.now().replace(day=1)
-
-    # Monthly sales (last 6 months)
-    monthly_sales = []
-    for i in range(6):
-        date = current_month - timedelta(days=30 * i)
-        sales = Transaction.objects.filter(
-            transaction_type='sale',
-            created_at__year=date.year,
-            created_at__month=date.month
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        monthly_sales.append({
-            'month': date.strftime('%b %Y'),
-            'sales': float(sales)
-        })
-    monthly_sales.reverse()
-
-    # Top selling products
-    top_products = OrderItem.objects.values(
-        'product_variant__product__name'
-    ).annotate(
-        total_sold=Sum('quantity'),
-        total_revenue=Sum('total_price')
-    ).order_by('-total_sold')[:10]
-
-    # Top customers
-    top_customers = Customer.objects.annotate(
-        total_spent=Sum(
-            Case(
-                When(orders__status='completed', then='orders__total_amount'),
-                default=0,
-                output_field=DecimalField(max_digits=10, decimal_places=2)
-            )
-        ),
-        order_count=Count('orders')
-    ).filter(total_spent__gt=0).order_by('-total_spent')[:10]
+@reporting_view
+async def reports(request):
+    granularity = request.GET.get('granularity')
+    if granularity not in GRANULARITIES:
+        granularity = 'month'
+
+    today = timezone.localdate()
+    end_date = parse_day(request.GET.get('end')) or today
+    start_date = parse_day(request.GET.get('start')) or months_back(end_date, 5)
+    if start_date > end_date:
+        start_date, end_date = end_date, start_date
+    start_date, end_date = clamp_range(start_date, end_date, granularity)
+    rank = request.GET.get('rank')
+    if rank not in RANKINGS:
+        rank = 'product'
+
+    calls = [
+        (sales_series, start_date, end_date, granularity),
+        (top_products, 10, start_date, end_date),
+        (top_customers,),
+    ]
+    if rank != 'product':
+        calls.append((sales_ranking, rank, start_date, end_date))
+    sales_data, products, customers, *ranking = await concurrency.gather(*calls)
 
     context = {
-        'monthly_sales': json.dumps(monthly_sales),
-        'top_products': top_products,
-        'top_customers': top_customers,
+        'sales_data': json.dumps(sales_data),
+        'start_date': start_date,
+        'end_date': end_date,
+        'granularity': granularity,
+        'granularity_choices': GRANULARITY_CHOICES,
+        'top_products': products,
+        'rank': rank,
+        'rank_label': dict(RANKING_CHOICES)[rank],
+        'rank_choices': RANKING_CHOICES,
+        'ranking': ranking[0] if ranking else products,
+        'top_customers': customers,
     }
 
-    return render(request, 'erp/reports.html', context)
+    return await sync_to_async(render)(request, 'erp/reports.html', context)
 
 
 @login_required
+@list_conditional(*TRANSACTION_TABLE)
 def transactions(request):
     transactions = Transaction.objects.select_related('order', 'order__customer').order_by('-created_at')
-
-    transaction_type = request.GET.get('type')
-    if transaction_type:
-        transactions = transactions.filter(transaction_type=transaction_type)
-
-    search = request.GET.get('search')
-    if search:
-        transactions = transactions.filter(
-            Q(description__icontains=search) |
-            Q(reference__icontains=search) |
-            Q(order__order_number__icontains=search)
-        )
+    transactions = filter_transactions(transactions, request.GET)
+    page = paginate(request, transactions, ['-created_at', '-id'])
 
     context = {
-        'transactions': transactions,
-        'search': search,
-        'selected_type': transaction_type,
+        'transactions': page,
+        'page_obj': page,
+        'table_version': fragments.table_version(*TRANSACTION_TABLE),
+        'search': request.GET.get('search'),
+        'selected_type': request.GET.get('type'),
         'transaction_types': Transaction.TRANSACTION_TYPES,
     }
 
@@ -262,28 +215,40 @@ def transactions(request):
 
 
 @login_required
+@list_conditional(*SUPPLIER_TABLE)
 def suppliers(request):
-    suppliers = Supplier.objects.order_by('name')
-
-    search = request.GET.get('search')
-    if search:
-        suppliers = suppliers.filter(
-            Q(name__icontains=search) |
-            Q(contact_person__icontains=search) |
-            Q(email__icontains=search) |
-            Q(city__icontains=search)
-        )
-
-    status = request.GET.get('status')
-    if status == 'active':
-        suppliers = suppliers.filter(is_active=True)
-    elif status == 'inactive':
-        suppliers = suppliers.filter(is_active=False)
+    suppliers = filter_suppliers(Supplier.objects.order_by('name'), request.GET)
+    page = paginate(request, suppliers, ['name', 'id'])
 
     context = {
-        'suppliers': suppliers,
-        'search': search,
-        'selected_status': status,
+        'suppliers': page,
+        'page_obj': page,
+        'search': request.GET.get('search'),
+        'selected_status': request.GET.get('status'),
     }
 
-    return render(request, 'erp/suppliers.html', context)
\ No newline at end of file
+    return render(request, 'erp/suppliers.html', context)
+
+
+@login_required
+def orders_export(request):
+    orders = filter_orders(Order.objects.order_by('-created_at', '-id'), request.GET)
+    return stream_csv(orders, exports.ORDER_COLUMNS, 'orders')
+
+
+@login_required
+def transactions_export(request):
+    transactions = filter_transactions(Transaction.objects.order_by('-created_at', '-id'), request.GET)
+    return stream_csv(transactions, exports.TRANSACTION_COLUMNS, 'transactions')
+
+
+@login_required
+def inventory_export(request):
+    variants = filter_inventory(ProductVariant.objects.order_by('product__name', 'id'), request.GET)
+    return stream_csv(variants, exports.INVENTORY_COLUMNS, 'inventory')
+
+
+@login_required
+def customers_export(request):
+    customers = filter_customers(Customer.objects.order_by('-created_at', '-id'), request.GET)
+    return stream_csv(customers, exports.CUSTOMER_COLUMNS, 'customers')
@@ -43,5 +43,61 @@ document.addEventListener("DOMContentLoaded", () => {
     })
   })
 
+  // Live dashboard: counter changes and low-stock alerts (server-sent events)
+  const liveDashboard = document.querySelector("[data-live-dashboard]")
+  if (liveDashboard && window.EventSource) {
+    const source = new EventSource(liveDashboard.dataset.liveDashboard)
+
+    source.addEventListener("metrics", (event) => {
+      const changed = JSON.parse(event.data)
+      Object.entries(changed).forEach(([name, value]) => {
+        const element = liveDashboard.querySelector(`[data-metric="${name}"]`)
+        if (element) {
+          element.textContent = "money" in element.dataset ? `$${Number(value || 0).toFixed(2)}` : value
+        }
+      })
+    })
+
+    const stockAlerts = liveDashboard.querySelector("[data-stock-alerts]")
+    if (stockAlerts) {
+      const rows = stockAlerts.querySelector("[data-low-stock-rows]")
+      const emptyRow = rows.querySelector("[data-empty-row]")
+      const maxRows = 5
+      const alertRows = () => rows.querySelectorAll("tr[data-variant-id]")
+
+      source.addEventListener("enter", (event) => {
+        const alert = JSON.parse(event.data)
+        if (rows.querySelector(`tr[data-variant-id="${alert.variant_id}"]`)) {
+          return
+        }
+        const row = document.createElement("tr")
+        row.dataset.variantId = alert.variant_id
+        ;[alert.product, alert.variant, alert.stock_quantity, alert.min_stock_level].forEach((value, index) => {
+          const cell = document.createElement("td")
+          cell.textContent = value
+          if (index === 2) {
+            cell.className = "text-danger"
+          }
+          row.appendChild(cell)
+        })
+        rows.prepend(row)
+        emptyRow.hidden = true
+        const current = alertRows()
+        if (current.length > maxRows) {
+          current[current.length - 1].remove()
+        }
+      })
+
+      source.addEventListener("leave", (event) => {
+        const alert = JSON.parse(event.data)
+        const row = rows.querySelector(`tr[data-variant-id="${alert.variant_id}"]`)
+        if (row) {
+          row.remove()
+        }
+        emptyRow.hidden = alertRows().length > 0
+      })
+    }
+  }
+
   console.log("Fashion Store ERP loaded successfully")
 })